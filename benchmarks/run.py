@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+"""Benchmark ghubby against a local stub of the GitHub API.
+
+Each scenario runs in a fresh process, so caches are cold and the
+peak RSS belongs to the scenario only. Results are printed and,
+with `--output`, saved as JSON to compare them across runs.
+
+    $> python3 -m benchmarks.run --users 5 --latency 0.01 -o results.json
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .server import FakeGitHub
+
+TOKEN = 'benchmark-token'
+
+SCENARIOS = {
+    'default': {},
+    'max-workers': {
+        'ghubby': {'max_workers': 8}
+    },
+    'page-workers': {
+        'ghubby': {'page_workers': 4}
+    },
+    'graphql': {
+        'client': {'repo_resolver': 'graphql'}
+    },
+    'fields': {
+        'fetch': {'fields': ['id', 'type', 'created_at', 'repo.name',
+                             'repo_data.language']}
+    },
+    'cli': {
+        'cli': ['--format', 'ndjson']
+    }
+}
+
+
+def peak_rss_kb(rusage):
+    """Peak RSS in KB; macOS reports it in bytes"""
+
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss // 1024
+    return rusage.ru_maxrss
+
+
+def run_fetch(url, users, scenario):
+    """Fetch the events of the users in this process"""
+
+    from ghubby.ghubby import Ghubby, GhubbyClient
+
+    client = GhubbyClient(None, TOKEN, base_url=url, **scenario.get('client', {}))
+
+    events = 0
+    start = time.perf_counter()
+    for user in users:
+        ghubby = Ghubby(user, TOKEN, client=client, **scenario.get('ghubby', {}))
+        for _ in ghubby.fetch(**scenario.get('fetch', {})):
+            events += 1
+    seconds = time.perf_counter() - start
+
+    return {
+        'events': events,
+        'seconds': seconds,
+        'repo_cache': client.repo_cache.stats(),
+        'peak_rss_kb': peak_rss_kb(resource.getrusage(resource.RUSAGE_SELF))
+    }
+
+
+def run_cli(url, users, args):
+    """Fetch the events of the users with the command line, one
+    process per user"""
+
+    events = 0
+    rss = 0
+    seconds = 0.0
+
+    with tempfile.TemporaryDirectory() as tmp_path:
+        for user in users:
+            output = os.path.join(tmp_path, user)
+            cmd = [sys.executable, '-m', 'ghubby.ghubby', '-u', user, '-t', TOKEN,
+                   '--enterprise-url', url, '-o', output] + args
+
+            start = time.perf_counter()
+            proc = subprocess.Popen(cmd, stderr=subprocess.DEVNULL)
+            _, status, rusage = os.wait4(proc.pid, 0)
+            seconds += time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+            if proc.returncode != 0:
+                raise RuntimeError("ghubby exited with code %i" % proc.returncode)
+
+            with open(output) as f:
+                events += sum(1 for line in f if line.strip())
+            rss = max(rss, peak_rss_kb(rusage))
+
+    return {
+        'events': events,
+        'seconds': seconds,
+        'repo_cache': None,
+        'peak_rss_kb': rss
+    }
+
+
+def run_scenario(server, users, name, scenario):
+    server.reset()
+
+    if 'cli' in scenario:
+        result = run_cli(server.url, users, scenario['cli'])
+    else:
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_fetch, server.url, users, scenario).result()
+
+    requests = dict(server.requests)
+    total = sum(requests.values())
+    events = result['events']
+
+    hit_ratio = None
+    cache = result.pop('repo_cache')
+    if cache and cache['hits'] + cache['misses']:
+        hit_ratio = cache['hits'] / (cache['hits'] + cache['misses'])
+
+    result.update({
+        'scenario': name,
+        'events_per_sec': events / result['seconds'] if result['seconds'] else None,
+        'requests': total,
+        'requests_by_kind': requests,
+        'requests_per_event': total / events if events else None,
+        'cache_hit_ratio': hit_ratio
+    })
+
+    return result
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Benchmark ghubby against a local "
+                                                 "stub of the GitHub API")
+    parser.add_argument('--users', type=int, default=3,
+                        help="number of users fetched")
+    parser.add_argument('--events', type=int, default=300,
+                        help="number of events of each user")
+    parser.add_argument('--fanout', type=int, default=20,
+                        help="number of distinct repos of the events of a user")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds each response is delayed")
+    parser.add_argument('--rate-limit', type=int, default=5000,
+                        help="value of the X-RateLimit-Remaining header")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="comma-separated scenarios to run")
+    parser.add_argument('-o', '--output',
+                        help="file where the results are saved as JSON")
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(sys.argv[1:] if args is None else args)
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit("Unknown scenarios: %s" % ', '.join(unknown))
+
+    users = ['user%i' % i for i in range(args.users)]
+    results = []
+
+    with FakeGitHub(events=args.events, fanout=args.fanout,
+                    latency=args.latency, rate_limit=args.rate_limit) as server:
+        for name in names:
+            result = run_scenario(server, users, name, SCENARIOS[name])
+            results.append(result)
+
+            print("%-14s %8.1f events/s %6.3f requests/event %8s hit ratio %8i KB peak RSS" %
+                  (name, result['events_per_sec'] or 0, result['requests_per_event'] or 0,
+                   '-' if result['cache_hit_ratio'] is None else '%.3f' % result['cache_hit_ratio'],
+                   result['peak_rss_kb']))
+
+    report = {
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'users': args.users,
+            'events': args.events,
+            'fanout': args.fanout,
+            'latency': args.latency,
+            'rate_limit': args.rate_limit
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, sort_keys=True, indent=4)
+
+
+if __name__ == '__main__':
+    main()
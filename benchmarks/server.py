@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import collections
+import copy
+import datetime
+import hashlib
+import http.server
+import json
+import math
+import os
+import threading
+import time
+import urllib.parse
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'tests', 'data')
+
+
+def read_template(filename):
+    with open(os.path.join(DATA_DIR, filename)) as f:
+        return json.load(f)
+
+
+class FakeGitHub:
+    """Local stub of the GitHub API, served as a GitHub Enterprise
+    instance (REST API under `/api/v3`, GraphQL under `/api/graphql`).
+
+    Events and repos are generated from the fixtures in `tests/data`.
+    Each user has `events` public events spread among `fanout` repos;
+    pages honor the `per_page` parameter and are linked with `Link`
+    headers like the real API. Responses carry an `ETag`, so
+    conditional requests get `304 Not Modified`.
+
+    :param events: number of events of each user
+    :param fanout: number of distinct repos of the events of a user
+    :param latency: seconds each response is delayed
+    :param rate_limit: value of the `X-RateLimit-Remaining` header
+    :param host: address where the server listens
+    :param port: port where the server listens; 0 picks a free one
+    """
+    def __init__(self, events=300, fanout=20, latency=0.0, rate_limit=5000,
+                 host='127.0.0.1', port=0):
+        self.events = events
+        self.fanout = fanout
+        self.latency = latency
+        self.rate_limit = rate_limit
+
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+
+        self._event = read_template('events_page_1')[0]
+        self._repo = read_template('repo_1')
+        self._rate_limit = read_template('rate_limit')
+
+        self._server = http.server.ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL of the server, to be used as enterprise URL"""
+
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%i' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def reset(self):
+        """Reset the request counters"""
+
+        with self._lock:
+            self.requests.clear()
+
+    def count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def total_requests(self):
+        with self._lock:
+            return sum(self.requests.values())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def repo_name(self, user, index):
+        return '%s/repo-%i' % (user, index % self.fanout)
+
+    def event(self, user, index):
+        """Generate the `index`-th event of a user, from newest to oldest"""
+
+        event = copy.deepcopy(self._event)
+        created_at = datetime.datetime(2018, 4, 13, 16, 52, 56) - \
+            datetime.timedelta(minutes=index)
+        repo_name = self.repo_name(user, index)
+
+        event['id'] = str(10 ** 10 - index)
+        event['created_at'] = created_at.strftime('%Y-%m-%dT%H:%M:%SZ')
+        event['actor']['login'] = user
+        event['repo'] = {
+            'id': self.repo_id(repo_name),
+            'name': repo_name,
+            'url': urllib.parse.urljoin(self.url, '/api/v3/repos/' + repo_name)
+        }
+        return event
+
+    @staticmethod
+    def repo_id(name):
+        return int(hashlib.md5(name.encode('utf-8')).hexdigest()[:8], 16)
+
+    def repo(self, name):
+        repo = copy.deepcopy(self._repo)
+        owner, short_name = name.split('/', 1)
+
+        repo['id'] = self.repo_id(name)
+        repo['name'] = short_name
+        repo['full_name'] = name
+        repo['owner']['login'] = owner
+        repo['html_url'] = urllib.parse.urljoin(self.url, '/' + name)
+        return repo
+
+    def graphql_repo(self, name):
+        repo = self.repo(name)
+
+        return {
+            'databaseId': repo['id'],
+            'name': repo['name'],
+            'nameWithOwner': repo['full_name'],
+            'owner': {'login': repo['owner']['login'], 'url': None, 'avatarUrl': None},
+            'description': repo['description'],
+            'url': repo['html_url'],
+            'homepageUrl': repo['homepage'],
+            'mirrorUrl': repo['mirror_url'],
+            'isFork': repo['fork'],
+            'isPrivate': repo['private'],
+            'isArchived': repo['archived'],
+            'hasIssuesEnabled': repo['has_issues'],
+            'hasWikiEnabled': repo['has_wiki'],
+            'createdAt': repo['created_at'],
+            'updatedAt': repo['updated_at'],
+            'pushedAt': repo['pushed_at'],
+            'diskUsage': repo['size'],
+            'forkCount': repo['forks_count'],
+            'stargazers': {'totalCount': repo['stargazers_count']},
+            'watchers': {'totalCount': repo['subscribers_count']},
+            'issues': {'totalCount': repo['open_issues_count']},
+            'pullRequests': {'totalCount': 0},
+            'primaryLanguage': {'name': repo['language']},
+            'defaultBranchRef': {'name': repo['default_branch']},
+            'licenseInfo': None
+        }
+
+    def events_page(self, user, page, per_page):
+        """Return the events of a page and the number of pages"""
+
+        last_page = max(1, math.ceil(self.events / per_page))
+        start = (page - 1) * per_page
+        end = min(self.events, start + per_page)
+
+        return [self.event(user, i) for i in range(start, end)], last_page
+
+    def _handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # write the headers and the body at once, so connections
+            # kept alive do not stall on Nagle and delayed ACKs
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(url.query)
+                parts = [part for part in url.path.split('/') if part]
+                headers = {}
+
+                if parts[:2] != ['api', 'v3']:
+                    return self.reply(404, {'message': 'Not Found'})
+                parts = parts[2:]
+
+                if parts == ['rate_limit']:
+                    server.count('rate_limit')
+                    body = server._rate_limit
+                elif len(parts) == 4 and parts[0] == 'users' and parts[2:] == ['events', 'public']:
+                    server.count('events')
+                    user = parts[1]
+                    page = int(query.get('page', ['1'])[0])
+                    per_page = int(query.get('per_page', ['30'])[0])
+                    body, last_page = server.events_page(user, page, per_page)
+                    headers['Link'] = self.links(user, page, per_page, last_page)
+                elif len(parts) == 3 and parts[0] == 'repos':
+                    server.count('repos')
+                    body = server.repo(parts[1] + '/' + parts[2])
+                else:
+                    return self.reply(404, {'message': 'Not Found'})
+
+                self.reply(200, body, headers)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length).decode('utf-8'))
+
+                if self.path.rstrip('/') != '/api/graphql':
+                    return self.reply(404, {'message': 'Not Found'})
+
+                server.count('graphql')
+                variables = request['variables']
+                data = {}
+                i = 0
+                while 'o%i' % i in variables:
+                    name = variables['o%i' % i] + '/' + variables['n%i' % i]
+                    data['r%i' % i] = server.graphql_repo(name)
+                    i += 1
+
+                self.reply(200, {'data': data})
+
+            def links(self, user, page, per_page, last_page):
+                url = server.url + '/api/v3/users/%s/events/public?per_page=%i&page=%i'
+                links = []
+
+                if page < last_page:
+                    links.append('<%s>; rel="next"' % (url % (user, per_page, page + 1)))
+                    links.append('<%s>; rel="last"' % (url % (user, per_page, last_page)))
+
+                return ', '.join(links)
+
+            def reply(self, status, body, headers=None):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                content = json.dumps(body).encode('utf-8')
+                etag = '"%s"' % hashlib.md5(content).hexdigest()
+
+                if status == 200 and self.headers.get('If-None-Match', None) == etag:
+                    status = 304
+                    content = b''
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.send_header('ETag', etag)
+                self.send_header('X-RateLimit-Remaining', str(server.rate_limit))
+                self.send_header('X-RateLimit-Reset', str(int(time.time()) + 3600))
+                for name, value in (headers or {}).items():
+                    if value:
+                        self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import array
+import os
+import sys
+import tempfile
+
+from . import codec
+
+TYPES = 'types'
+REPOS = 'repos'
+DAYS = 'days'
+EVENTS = 'events'
+
+DIMENSIONS = [TYPES, REPOS, DAYS]
+
+# width of the ids of the values in the keys of the counters
+_ID_BITS = 32
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+class _Vocabulary:
+    """Map of the values of a dimension to consecutive ids"""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def id(self, value):
+        value_id = self.ids.get(value, None)
+
+        if value_id is None:
+            value_id = len(self.values)
+            self.ids[value] = value_id
+            self.values.append(value)
+
+        return value_id
+
+
+class ActivityAggregator:
+    """Count the events of users by type, repository and day.
+
+    Counts are updated as events are added, so events do not need to
+    be kept. Users and the values of each dimension are mapped to
+    ids, and the counts are kept in arrays of unsigned integers,
+    indexed by the pair of ids of the user and the value.
+
+    Aggregators of several runs or processes can be merged, and their
+    summary (see `summary`) written to a JSON file and loaded again.
+    Only the fields in `FIELDS` are read from the events, so they can
+    be fetched with them only and without their repository data.
+    """
+    FIELDS = ['type', 'repo.name', 'created_at']
+
+    def __init__(self):
+        self.users = _Vocabulary()
+        self.count = 0
+
+        self._totals = array.array('Q')
+        self._values = {dimension: _Vocabulary() for dimension in DIMENSIONS}
+        self._rows = {dimension: {} for dimension in DIMENSIONS}
+        self._counts = {dimension: array.array('Q') for dimension in DIMENSIONS}
+
+    def add(self, user, event):
+        """Count an event of a user.
+
+        :param user: GitHub user
+        :param event: event with, at least, the fields of `FIELDS`
+        """
+        user_id = self.__user_id(user)
+        self._totals[user_id] += 1
+        self.count += 1
+
+        self.__update(TYPES, user_id, event['type'], 1)
+        self.__update(REPOS, user_id, event['repo']['name'], 1)
+        self.__update(DAYS, user_id, event['created_at'][:10], 1)
+
+    def merge(self, other):
+        """Add the counts of another aggregator.
+
+        :param other: `ActivityAggregator` to merge
+        """
+        user_ids = [self.__user_id(user) for user in other.users.values]
+
+        for other_id, total in enumerate(other._totals):
+            self._totals[user_ids[other_id]] += total
+        self.count += other.count
+
+        for dimension in DIMENSIONS:
+            values = other._values[dimension].values
+            counts = other._counts[dimension]
+
+            for key, row in other._rows[dimension].items():
+                self.__update(dimension, user_ids[key >> _ID_BITS],
+                              values[key & _ID_MASK], counts[row])
+
+    def summary(self):
+        """Return the counts of each user.
+
+        :returns: a dict mapping each user to a dict with the number
+            of `events` and the counts by event type (`types`),
+            repository (`repos`) and day (`days`)
+        """
+        summary = {user: {EVENTS: self._totals[user_id]}
+                   for user_id, user in enumerate(self.users.values)}
+
+        for user in summary.values():
+            for dimension in DIMENSIONS:
+                user[dimension] = {}
+
+        for dimension in DIMENSIONS:
+            values = self._values[dimension].values
+            counts = self._counts[dimension]
+
+            for key, row in self._rows[dimension].items():
+                user = self.users.values[key >> _ID_BITS]
+                summary[user][dimension][values[key & _ID_MASK]] = counts[row]
+
+        return summary
+
+    def dump(self, path=None):
+        """Write the summary to a JSON file.
+
+        The file is replaced atomically, so a summary is never left
+        half written.
+
+        :param path: path of the file; when None, the summary is
+            written to the standard output
+        """
+        content = codec.dumps(self.summary(), sort_keys=True, indent=4)
+
+        if path is None:
+            sys.stdout.write(content + '\n')
+            return
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.ghubby_')
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an aggregator from a summary written by `dump`.
+
+        :param path: path of the JSON file
+        """
+        with open(path, 'r') as f:
+            summary = codec.loads(f.read())
+
+        aggregator = cls()
+
+        for user, counts in summary.items():
+            user_id = aggregator.__user_id(user)
+            aggregator._totals[user_id] += counts[EVENTS]
+            aggregator.count += counts[EVENTS]
+
+            for dimension in DIMENSIONS:
+                for value, count in counts[dimension].items():
+                    aggregator.__update(dimension, user_id, value, count)
+
+        return aggregator
+
+    def __user_id(self, user):
+        user_id = self.users.id(user)
+
+        if user_id == len(self._totals):
+            self._totals.append(0)
+
+        return user_id
+
+    def __update(self, dimension, user_id, value, count):
+        key = (user_id << _ID_BITS) | self._values[dimension].id(value)
+        rows = self._rows[dimension]
+        row = rows.get(key, None)
+
+        if row is None:
+            rows[key] = len(rows)
+            self._counts[dimension].append(count)
+        else:
+            self._counts[dimension][row] += count
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import asyncio
+import concurrent.futures
+import logging
+
+from .ghubby import Ghubby, GhubbyClient
+from .utils import DEFAULT_DATETIME
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class AsyncGhubby:
+    """Collect the events of many GitHub users at the same time
+    using asyncio.
+
+    All the users share one `GhubbyClient`, so they share its HTTP
+    session, its rate limit state and its repo caches. Since the
+    client is blocking, the events of each user are read in a pool
+    of threads; at most `max_concurrency` users are fetched at the
+    same time. The events are streamed as they arrive:
+
+        async for user, event in AsyncGhubby(users, token).fetch():
+            ...
+
+    An error fetching a user does not stop the rest of users; it is
+    kept in the attribute `errors`, which maps each failed user to
+    its exception.
+
+    :param users: list of GitHub users
+    :param api_token: GitHub auth token to access the API
+    :param max_concurrency: maximum number of users fetched at the
+        same time
+    :param repo_cache: cache of the repositories data
+    :param repo_store: persistent cache of the repositories data
+    :param http_cache: cache of the responses used to send
+        conditional requests
+    :param max_workers: number of threads used to fetch the repos
+        of a page of events concurrently
+    :param checkpoints: `CheckpointStore` where the last event seen
+        of each user is kept
+    :param base_url: URL of a GitHub Enterprise instance
+    :param metrics: `Metrics` recording the activity of all the users
+    """
+    DEFAULT_MAX_CONCURRENCY = 10
+
+    def __init__(self, users, api_token, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 repo_cache=None, repo_store=None, http_cache=None, max_workers=1,
+                 checkpoints=None, base_url=None, metrics=None):
+        if max_concurrency < 1:
+            raise ValueError("Maximum concurrency must be greater than 0")
+
+        self.users = list(users)
+        self.api_token = api_token
+        self.max_concurrency = max_concurrency
+        self.max_workers = max_workers
+        self.checkpoints = checkpoints
+        self.errors = {}
+
+        self.client = GhubbyClient(None, api_token, repo_cache=repo_cache,
+                                   repo_store=repo_store, http_cache=http_cache,
+                                   base_url=base_url, metrics=metrics)
+
+    async def fetch(self, from_date=DEFAULT_DATETIME, **kwargs):
+        """Fetch the events of the users from GitHub.
+
+        :param from_date: obtain events since this date
+        :param kwargs: other parameters of `Ghubby.fetch` (e.g.,
+            `short_circuit`, `fields` or `event_types`)
+
+        :returns: an asynchronous generator of (user, event) tuples
+        """
+        self.errors = {}
+
+        queue = asyncio.Queue(maxsize=self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+        tasks = [asyncio.ensure_future(self.__fetch_user(user, from_date, kwargs,
+                                                         queue, semaphore, executor))
+                 for user in self.users]
+        producer = asyncio.ensure_future(self.__wait_users(tasks, queue))
+
+        try:
+            while True:
+                item = await queue.get()
+
+                if item is _DONE:
+                    break
+                elif isinstance(item, Exception):
+                    raise item
+
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            producer.cancel()
+            executor.shutdown(wait=False)
+
+    async def __fetch_user(self, user, from_date, kwargs, queue, semaphore, executor):
+        """Fetch the events of a user, putting them in the queue"""
+
+        loop = asyncio.get_running_loop()
+
+        async with semaphore:
+            ghubby = Ghubby(user, self.api_token, max_workers=self.max_workers,
+                            client=self.client, checkpoints=self.checkpoints)
+            events = ghubby.fetch(from_date=from_date, **kwargs)
+
+            while True:
+                try:
+                    event = await loop.run_in_executor(executor, next, events, _DONE)
+                except Exception as error:
+                    logger.warning("Error fetching the events of %s: %s", user, error)
+                    self.errors[user] = error
+                    break
+
+                if event is _DONE:
+                    break
+
+                await queue.put((user, event))
+
+    @staticmethod
+    async def __wait_users(tasks, queue):
+        """Wait for the users to be fetched, signaling the end or
+        the first error in the queue"""
+
+        try:
+            await asyncio.gather(*tasks)
+        except Exception as error:
+            await queue.put(error)
+        else:
+            await queue.put(_DONE)
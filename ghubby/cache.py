@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import collections
+import sqlite3
+import threading
+import time
+
+from . import codec
+
+
+class LRUCache:
+    """Least recently used cache with an optional time to live.
+
+    The cache keeps at most `max_size` entries; when it is full,
+    the least recently used entry is evicted. Entries older than
+    `ttl` seconds are considered expired and they are evicted when
+    accessed. The counters `hits`, `misses` and `evictions` keep
+    track of the cache usage.
+
+    :param max_size: maximum number of entries; when None the
+        size of the cache is unbounded
+    :param ttl: seconds an entry is valid; when None the entries
+        never expire
+    """
+    DEFAULT_MAX_SIZE = 1000
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=None):
+        if max_size is not None and max_size < 1:
+            raise ValueError("Maximum size must be greater than 0")
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            return entry is not None and not self._is_expired(entry)
+
+    def get(self, key):
+        """Get the value of a key.
+
+        :param key: key to look for
+
+        :returns: the value of the key or None when the key
+            is not found or it is expired
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if self._is_expired(entry):
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def put(self, key, value):
+        """Add or replace the value of a key.
+
+        :param key: key to store
+        :param value: value of the key
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while self.max_size is not None and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all the entries of the cache"""
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the usage counters of the cache"""
+
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def _is_expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry[0] > self.ttl
+
+
+class SQLiteCache:
+    """Persistent cache stored in a SQLite database.
+
+    The entries are kept in a local file, so they are available
+    across runs. Each entry has its own time to live, after which
+    it is considered expired. The database is opened in WAL mode
+    and each thread uses its own connection, thus several threads
+    and processes can share the same file safely. Values must be
+    serializable to JSON.
+
+    :param path: path of the database file
+    :param ttl: default seconds an entry is valid; when None the
+        entries never expire
+    :param timeout: seconds to wait for a lock on the database
+    """
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self, path, ttl=DEFAULT_TTL, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._local = threading.local()
+        self._create_table()
+
+    def __len__(self):
+        cursor = self._connection().execute("SELECT COUNT(*) FROM cache")
+        return cursor.fetchone()[0]
+
+    def get(self, key):
+        """Get the value of a key.
+
+        :param key: key to look for
+
+        :returns: the value of the key or None when the key
+            is not found or it is expired
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?",
+                           (key,)).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = row
+
+        if expires_at is not None and expires_at < time.time():
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires_at = ?",
+                             (key, expires_at))
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return codec.loads(value)
+
+    def put(self, key, value, ttl=None):
+        """Add or replace the value of a key.
+
+        :param key: key to store
+        :param value: value of the key
+        :param ttl: seconds the entry is valid; when None the
+            default time to live is used
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) "
+                         "VALUES (?, ?, ?)",
+                         (key, codec.dumps(value), expires_at))
+
+    def purge(self):
+        """Remove the expired entries of the cache.
+
+        :returns: the number of entries removed
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM cache WHERE expires_at < ?",
+                                  (time.time(),))
+
+        self.evictions += cursor.rowcount
+
+        return cursor.rowcount
+
+    def close(self):
+        """Close the connection of the current thread"""
+
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self):
+        """Return the usage counters of the cache"""
+
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            self._local.conn = conn
+
+        return conn
+
+    def _create_table(self):
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                         "key TEXT PRIMARY KEY, "
+                         "value TEXT NOT NULL, "
+                         "expires_at REAL)")
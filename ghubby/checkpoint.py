@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import codec
+
+
+class CheckpointStore:
+    """Store of the last event seen for each user.
+
+    The checkpoints are saved in a JSON file, where each user is
+    mapped to the id and the creation date of the newest event
+    fetched. The file is rewritten atomically and, where `fcntl`
+    is available, updates are serialized with a lock file, thus
+    several processes can share the same store.
+
+    :param path: path of the JSON file
+    """
+    def __init__(self, path):
+        self.path = path
+        self._checkpoints = self.__read()
+
+    def __len__(self):
+        return len(self._checkpoints)
+
+    def get(self, user):
+        """Get the checkpoint of a user.
+
+        :param user: GitHub user
+
+        :returns: a dict with the keys `id` and `created_at` of the
+            newest event seen or None when the user has no checkpoint
+        """
+        return self._checkpoints.get(user, None)
+
+    def save(self, user, event_id, created_at):
+        """Save the checkpoint of a user.
+
+        The file is read again before writing it, so checkpoints
+        saved by other processes are kept.
+
+        :param user: GitHub user
+        :param event_id: id of the newest event seen
+        :param created_at: creation date of the newest event seen
+        """
+        self.save_many({
+            user: {
+                'id': event_id,
+                'created_at': created_at
+            }
+        })
+
+    def save_many(self, checkpoints):
+        """Save the checkpoints of several users at once.
+
+        The file is read and written once, so saving the checkpoints
+        of many users does not rewrite it for each one.
+
+        :param checkpoints: dict mapping each user to a dict with the
+            keys `id` and `created_at` of the newest event seen
+        """
+        if not checkpoints:
+            return
+
+        with self.__lock():
+            self._checkpoints = self.__read()
+            self._checkpoints.update(checkpoints)
+            self.__write()
+
+    def __read(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        with open(self.path, 'r') as f:
+            content = f.read()
+
+        return codec.loads(content) if content else {}
+
+    def __write(self):
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.ghubby_')
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(codec.dumps(self._checkpoints, sort_keys=True, indent=4))
+
+        os.replace(tmp_path, self.path)
+
+    def __lock(self):
+        return _FileLock(self.path + '.lock')
+
+
+class DeferredCheckpoints:
+    """Checkpoints kept in memory until they are committed.
+
+    Checkpoints are read from `store`, but the new ones are saved in
+    it only when `commit` is called, e.g. once the events they refer
+    to were written somewhere else.
+
+    :param store: `CheckpointStore` where checkpoints are committed
+    """
+    def __init__(self, store):
+        self.store = store
+        self.checkpoints = {}
+
+    def get(self, user):
+        return self.checkpoints.get(user, None) or self.store.get(user)
+
+    def save(self, user, event_id, created_at):
+        self.checkpoints[user] = {
+            'id': event_id,
+            'created_at': created_at
+        }
+
+    def save_many(self, checkpoints):
+        self.checkpoints.update(checkpoints)
+
+    def commit(self):
+        """Save the pending checkpoints in the store"""
+
+        self.store.save_many(self.checkpoints)
+        self.checkpoints = {}
+
+
+class _FileLock:
+    """Exclusive lock on a file, ignored when `fcntl` is not available"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl:
+            self._file = open(self.path, 'w')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
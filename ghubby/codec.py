@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+"""JSON encoding and decoding.
+
+The fastest library installed is used: orjson, ujson or the
+standard json module. Indented documents are always encoded with
+the standard module, so pretty-printed output does not depend on
+the backend.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+ORJSON = 'orjson'
+UJSON = 'ujson'
+STDLIB = 'json'
+
+BACKENDS = [name for name, module in [(ORJSON, orjson), (UJSON, ujson), (STDLIB, json)]
+            if module is not None]
+
+backend = BACKENDS[0]
+
+
+def set_backend(name):
+    """Select the backend used to encode and decode documents"""
+
+    global backend
+
+    if name not in BACKENDS:
+        raise ValueError("JSON backend not available: %s" % name)
+
+    backend = name
+
+
+def loads(data):
+    """Decode a JSON document given as `str` or `bytes`"""
+
+    if backend == ORJSON:
+        return orjson.loads(data)
+    if backend == UJSON:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def dumpb(obj, sort_keys=False, indent=None):
+    """Encode an object as UTF-8 JSON bytes.
+
+    Compact documents have no whitespace and keep non-ASCII
+    characters as they are.
+    """
+    if indent is None and backend == ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    return dumps(obj, sort_keys=sort_keys, indent=indent).encode('utf-8')
+
+
+def dumps(obj, sort_keys=False, indent=None):
+    """Encode an object as a JSON `str`; see `dumpb`"""
+
+    if indent is not None:
+        return json.dumps(obj, sort_keys=sort_keys, indent=indent)
+
+    if backend == ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode('utf-8')
+    if backend == UJSON:
+        return ujson.dumps(obj, sort_keys=sort_keys, ensure_ascii=False,
+                           escape_forward_slashes=False)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'), ensure_ascii=False)
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+import requests
+
+from . import codec
+from .aggregate import ActivityAggregator
+from .cache import LRUCache, SQLiteCache
+from .checkpoint import CheckpointStore, DeferredCheckpoints
+from .ghubby import Ghubby, RESOLVE_LAZY, REST_RESOLVER
+from .output import EventWriter, NDJSON_FORMAT
+from .scheduler import RateLimitScheduler
+from .session import create_session
+from .tokens import TokenPool
+from .utils import DEFAULT_DATETIME
+
+logger = logging.getLogger(__name__)
+
+ShardJob = collections.namedtuple('ShardJob', ['index', 'users', 'path', 'fmt',
+                                               'settings', 'from_date', 'kwargs'])
+ShardResult = collections.namedtuple('ShardResult', ['index', 'users', 'path',
+                                                     'count', 'checkpoints', 'skipped'])
+
+# errors of a user that are not solved by retrying its shard,
+# e.g., 404 and 410 for deleted or renamed users
+RETRYABLE_CLIENT_ERRORS = (401, 403, 408, 429)
+
+# tokens of the worker process, set when the process starts
+_worker_tokens = None
+
+
+class ShardError(Exception):
+    """Raised when a shard fails more times than allowed"""
+
+    def __init__(self, index, error):
+        super().__init__("Shard %i failed: %s" % (index, error))
+        self.index = index
+        self.error = error
+
+
+class ShardedCrawler:
+    """Collect the events of a large list of users with a pool of
+    processes.
+
+    Users are split into shards of `shard_size` consecutive users,
+    which are fetched by `processes` worker processes. The tokens are
+    divided among the processes, so each process sends requests with
+    its own tokens. The repo store, the HTTP cache and the checkpoint
+    store are files on local disk shared by all the workers.
+
+    Each worker writes the events of its shard to a temporary file,
+    and the shards are merged in the order of the users. A shard that
+    fails, or whose process dies, is retried up to `max_retries`
+    times. Checkpoints are saved once the events of the shard are
+    merged, so events of a failed shard are never skipped when it is
+    retried. Users whose requests fail with a client error that can
+    not be solved by retrying (e.g., 404 for a deleted user) are
+    skipped, without saving their checkpoints, and listed in the
+    attribute `skipped_users`.
+
+    :param users: list of GitHub users
+    :param api_tokens: list of GitHub auth tokens
+    :param processes: number of worker processes; when None, the
+        number of CPUs is used
+    :param shard_size: number of users of each shard
+    :param max_retries: number of times a failed shard is retried
+    :param repo_store: path of the SQLite file caching the repos
+    :param repo_store_ttl: seconds a repository is valid in the store
+    :param http_cache: path of the SQLite file caching the responses
+        used to send conditional requests
+    :param checkpoint_file: path of the JSON file keeping the last
+        event seen of each user
+    :param max_workers: number of threads fetching the repos of a
+        page of events in each worker
+    :param page_workers: number of threads fetching the pages of
+        events in each worker
+    :param repo_resolver: backend used to fetch the repos
+    :param base_url: URL of a GitHub Enterprise instance
+    :param pacing: whether the requests of each worker are paced
+        (see `RateLimitScheduler`)
+    """
+    DEFAULT_SHARD_SIZE = 100
+    DEFAULT_MAX_RETRIES = 2
+
+    def __init__(self, users, api_tokens, processes=None, shard_size=DEFAULT_SHARD_SIZE,
+                 max_retries=DEFAULT_MAX_RETRIES, repo_store=None,
+                 repo_store_ttl=SQLiteCache.DEFAULT_TTL, http_cache=None,
+                 checkpoint_file=None, max_workers=1, page_workers=1,
+                 repo_resolver=REST_RESOLVER, base_url=None, pacing=True):
+        processes = processes or os.cpu_count() or 1
+
+        if processes < 1:
+            raise ValueError("Number of processes must be greater than 0")
+        if shard_size < 1:
+            raise ValueError("Shard size must be greater than 0")
+
+        self.users = list(dict.fromkeys(users))
+        self.api_tokens = list(api_tokens) or [None]
+        self.processes = processes
+        self.shard_size = shard_size
+        self.max_retries = max_retries
+        self.checkpoint_file = checkpoint_file
+        self.retries = 0
+        self.skipped_users = []
+
+        self.settings = {
+            'repo_store': repo_store,
+            'repo_store_ttl': repo_store_ttl,
+            'http_cache': http_cache,
+            'checkpoint_file': checkpoint_file,
+            'max_workers': max_workers,
+            'page_workers': page_workers,
+            'repo_resolver': repo_resolver,
+            'base_url': base_url,
+            'pacing': pacing
+        }
+
+    def shards(self):
+        """Split the users into shards"""
+
+        return [self.users[i:i + self.shard_size]
+                for i in range(0, len(self.users), self.shard_size)]
+
+    def token_groups(self):
+        """Divide the tokens among the processes; when there are
+        fewer tokens than processes, tokens are shared"""
+
+        processes = min(self.processes, max(len(self.shards()), 1))
+
+        if len(self.api_tokens) < processes:
+            return [[self.api_tokens[i % len(self.api_tokens)]] for i in range(processes)]
+
+        return [self.api_tokens[i::processes] for i in range(processes)]
+
+    def fetch(self, from_date=DEFAULT_DATETIME, **kwargs):
+        """Fetch the events of the users, in the order of the users.
+
+        :param from_date: obtain events since this date
+        :param kwargs: other parameters of `Ghubby.fetch` (e.g.,
+            `short_circuit`, `fields` or `event_types`)
+
+        :returns: a generator of events
+        """
+        for shard in self.fetch_shards(from_date=from_date, fmt=NDJSON_FORMAT, **kwargs):
+            with open(shard.path, 'rb') as f:
+                for line in f:
+                    yield codec.loads(line)
+
+    def fetch_shards(self, from_date=DEFAULT_DATETIME, fmt=NDJSON_FORMAT, **kwargs):
+        """Fetch the events of the users, shard by shard.
+
+        Each shard is returned, in the order of the users, once it
+        is complete and all the previous ones were returned. Its
+        events are in a temporary file written in the format `fmt`
+        (see `EventWriter`), which is removed when the next shard is
+        requested. The checkpoints of the users of the shard are
+        saved at that moment too.
+
+        :param from_date: obtain events since this date
+        :param fmt: format of the events files
+        :param kwargs: other parameters of `Ghubby.fetch`
+
+        :returns: a generator of `ShardResult`
+        """
+        checkpoints = None
+        if self.checkpoint_file:
+            checkpoints = CheckpointStore(self.checkpoint_file)
+
+        yield from self.__shards(_fetch_shard, from_date, fmt, kwargs, checkpoints)
+
+    def aggregate(self, output=None, from_date=DEFAULT_DATETIME, summaries=None, **kwargs):
+        """Count the events of the users by type, repository and day.
+
+        Each worker counts the events of its shard with an
+        `ActivityAggregator`, so events are not sent to this process,
+        and the counts of the shards are merged as they are
+        completed. The summary is written to `output` and then the
+        checkpoints of the users are saved.
+
+        :param output: path of the summary file; when None, the
+            summary is written to the standard output
+        :param from_date: obtain events since this date
+        :param summaries: paths of summaries of previous runs merged
+            into the output
+        :param kwargs: other parameters of `Ghubby.fetch`, except
+            `fields`, which are set by the aggregator
+
+        :returns: the `ActivityAggregator` of all the users
+        """
+        kwargs['fields'] = ActivityAggregator.FIELDS
+
+        checkpoints = None
+        if self.checkpoint_file:
+            checkpoints = DeferredCheckpoints(CheckpointStore(self.checkpoint_file))
+
+        aggregator = ActivityAggregator()
+
+        for shard in self.__shards(_aggregate_shard, from_date, None, kwargs, checkpoints):
+            aggregator.merge(ActivityAggregator.load(shard.path))
+
+        for path in summaries or []:
+            aggregator.merge(ActivityAggregator.load(path))
+
+        aggregator.dump(output)
+
+        if checkpoints is not None:
+            checkpoints.commit()
+
+        return aggregator
+
+    def __shards(self, func, from_date, fmt, kwargs, checkpoints):
+        """Run `func` on the shards, returning their results in the
+        order of the users; their checkpoints are saved in
+        `checkpoints` when the next shard is requested"""
+
+        if kwargs.get('resolve_repos', None) == RESOLVE_LAZY:
+            raise ValueError("Lazy repos can not be resolved by worker processes")
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_shards_')
+
+        jobs = [ShardJob(index, users, os.path.join(tmp_path, 'shard_%i' % index),
+                         fmt, self.settings, from_date, kwargs)
+                for index, users in enumerate(self.shards())]
+
+        results = {}
+        next_index = 0
+
+        try:
+            for result in self.__run(jobs, func):
+                results[result.index] = result
+
+                while next_index in results:
+                    shard = results.pop(next_index)
+                    self.skipped_users.extend(shard.skipped)
+                    yield shard
+
+                    os.remove(shard.path)
+                    if checkpoints is not None:
+                        checkpoints.save_many(shard.checkpoints)
+                    next_index += 1
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def __run(self, jobs, func):
+        """Run `func` on the jobs in the pool of processes, returning their
+        results as they are completed. Failed jobs are submitted
+        again; when a process dies, the pool is replaced."""
+
+        attempts = collections.Counter()
+        executor = None
+        futures = {}
+
+        try:
+            executor = self.__create_executor()
+            for job in jobs:
+                futures[executor.submit(func, job)] = (job, executor)
+
+            while futures:
+                done, _ = concurrent.futures.wait(futures,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    job, job_executor = futures.pop(future)
+
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        attempts[job.index] += 1
+                        if attempts[job.index] > self.max_retries:
+                            raise ShardError(job.index, error)
+
+                        logger.warning("Shard %i failed (%s); retrying", job.index, error)
+                        self.retries += 1
+
+                        if isinstance(error, BrokenProcessPool) and job_executor is executor:
+                            executor.shutdown(wait=False)
+                            executor = self.__create_executor()
+
+                        futures[executor.submit(func, job)] = (job, executor)
+                        continue
+
+                    yield result
+        finally:
+            for future in futures:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+    def __create_executor(self):
+        token_groups = self.token_groups()
+        slots = multiprocessing.Queue()
+        for group in token_groups:
+            slots.put(group)
+
+        return concurrent.futures.ProcessPoolExecutor(max_workers=len(token_groups),
+                                                      initializer=_init_worker,
+                                                      initargs=(slots,))
+
+
+def _init_worker(slots):
+    """Take the tokens of the worker process"""
+
+    global _worker_tokens
+    _worker_tokens = slots.get()
+
+
+def _fetch_shard(job):
+    """Fetch the events of the users of a shard, writing them to
+    the file of the job"""
+
+    with EventWriter(job.path, fmt=job.fmt) as writer:
+        checkpoints, skipped = _run_shard(job, lambda user, event: writer.write(event))
+
+    logger.debug("Shard %i done: %i users, %i events", job.index, len(job.users), writer.count)
+
+    return ShardResult(job.index, job.users, job.path, writer.count, checkpoints, skipped)
+
+
+def _aggregate_shard(job):
+    """Count the events of the users of a shard, writing the summary
+    to the file of the job"""
+
+    aggregator = ActivityAggregator()
+    checkpoints, skipped = _run_shard(job, aggregator.add)
+    aggregator.dump(job.path)
+
+    logger.debug("Shard %i done: %i users, %i events", job.index, len(job.users), aggregator.count)
+
+    return ShardResult(job.index, job.users, job.path, aggregator.count, checkpoints, skipped)
+
+
+def _run_shard(job, consume):
+    """Fetch the events of the users of a shard, calling `consume`
+    with each user and event; it returns the new checkpoints and
+    the users skipped because of a client error"""
+
+    settings = job.settings
+
+    tokens = TokenPool(_worker_tokens or [None])
+    scheduler = RateLimitScheduler(tokens, pace=settings['pacing'])
+    session = create_session()
+
+    repo_cache = LRUCache()
+    repo_store = None
+    if settings['repo_store']:
+        repo_store = SQLiteCache(settings['repo_store'], ttl=settings['repo_store_ttl'])
+
+    http_cache = None
+    if settings['http_cache']:
+        http_cache = SQLiteCache(settings['http_cache'])
+
+    checkpoints = None
+    if settings['checkpoint_file']:
+        checkpoints = DeferredCheckpoints(CheckpointStore(settings['checkpoint_file']))
+
+    client = None
+    skipped = []
+
+    for user in job.users:
+        ghubby = Ghubby(user, tokens, repo_cache=repo_cache, repo_store=repo_store,
+                        http_cache=http_cache, max_workers=settings['max_workers'],
+                        client=client, checkpoints=checkpoints,
+                        page_workers=settings['page_workers'],
+                        repo_resolver=settings['repo_resolver'],
+                        base_url=settings['base_url'], session=session,
+                        scheduler=scheduler)
+        # the client, and its caches, are shared by the users
+        client = ghubby.client
+
+        try:
+            for event in ghubby.fetch(from_date=job.from_date, **job.kwargs):
+                consume(user, event)
+        except requests.exceptions.HTTPError as error:
+            if not _is_user_error(error):
+                raise
+            logger.warning("Skipping user %s: %s", user, error)
+            skipped.append(user)
+
+    checkpoints = checkpoints.checkpoints if checkpoints is not None else {}
+
+    return checkpoints, skipped
+
+
+def _is_user_error(error):
+    """Whether an HTTP error is a client error that retrying the
+    shard does not solve"""
+
+    status = error.response.status_code if error.response is not None else None
+
+    return status is not None and 400 <= status < 500 and \
+        status not in RETRYABLE_CLIENT_ERRORS
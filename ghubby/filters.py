@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import fnmatch
+
+
+class EventFilter:
+    """Filter of events by type and by repository name.
+
+    An event matches when its type is in `event_types` (if given)
+    and not in `exclude_event_types`, and the name of its repository
+    (owner/name) matches any of the shell-style patterns in `repos`
+    (if given) and none of the patterns in `exclude_repos`. Only the
+    attributes `type` and `repo.name` of the events are checked, so
+    the filter can be applied before fetching any repository data.
+
+    :param event_types: list of event types to include
+    :param exclude_event_types: list of event types to exclude
+    :param repos: list of repo name patterns to include (e.g., `chaoss/*`)
+    :param exclude_repos: list of repo name patterns to exclude
+    """
+    def __init__(self, event_types=None, exclude_event_types=None,
+                 repos=None, exclude_repos=None):
+        self.event_types = set(event_types) if event_types else None
+        self.exclude_event_types = set(exclude_event_types or [])
+        self.repos = list(repos) if repos else None
+        self.exclude_repos = list(exclude_repos or [])
+
+    def __bool__(self):
+        return bool(self.event_types or self.exclude_event_types or
+                    self.repos or self.exclude_repos)
+
+    def match(self, event):
+        """Check whether an event passes the filter.
+
+        :param event: event to check
+
+        :returns: True when the event passes the filter
+        """
+        event_type = event['type']
+
+        if self.event_types is not None and event_type not in self.event_types:
+            return False
+        if event_type in self.exclude_event_types:
+            return False
+
+        repo_name = event['repo']['name']
+
+        if self.repos is not None and \
+                not any(fnmatch.fnmatchcase(repo_name, pattern) for pattern in self.repos):
+            return False
+        if any(fnmatch.fnmatchcase(repo_name, pattern) for pattern in self.exclude_repos):
+            return False
+
+        return True
@@ -21,128 +21,867 @@
 #
 
 import argparse
-import json
+import collections
+import concurrent.futures
 import logging
+import re
+import sys
+import time
 
-from grimoirelab.toolkit.datetime import (datetime_to_utc,
-                                          str_to_datetime)
-from grimoirelab.toolkit.uris import urijoin
-from perceval.backends.core.github import (GitHubClient,
-                                           DEFAULT_DATETIME)
+import requests
+from perceval.client import HttpClient
+
+from . import codec
+from .cache import LRUCache, SQLiteCache
+from .checkpoint import CheckpointStore, DeferredCheckpoints
+from .filters import EventFilter
+from .graphql import GraphQLRepoResolver
+from .metrics import Metrics, JSON_FORMAT as METRICS_JSON_FORMAT
+from .output import EventWriter, NormalizedWriter, JSON_FORMAT
+from .poll import EventsPoll
+from .projection import REPO_DATA, parse_fields, project, repo_fields
+from .scheduler import (NORMAL_PRIORITY,
+                        SECONDARY_RATE_LIMIT,
+                        RateLimitScheduler,
+                        rate_limit_kind,
+                        retry_after)
+from .session import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, create_session
+from .tokens import TokenPool
+from .utils import (DEFAULT_DATETIME,
+                    GITHUB_API_URL,
+                    datetime_to_utc,
+                    str_to_datetime,
+                    urijoin)
 
 logger = logging.getLogger(__name__)
 
+PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+ACCEPT_HEADER = 'application/vnd.github.squirrel-girl-preview'
+
+RESOLVE_EAGER = 'eager'
+RESOLVE_LAZY = 'lazy'
+RESOLVE_NONE = 'none'
+RESOLVE_MODES = [RESOLVE_EAGER, RESOLVE_LAZY, RESOLVE_NONE]
+
+REST_RESOLVER = 'rest'
+GRAPHQL_RESOLVER = 'graphql'
+REPO_RESOLVERS = [REST_RESOLVER, GRAPHQL_RESOLVER]
+
 
 class Ghubby:
     """Ghubby collects the activities within the past 90 days
     of a user on GitHub by querying the API, which is accessed via a token.
-    In case the token rate limit is reached, the program will
-    sleep until rate limit is reset.
+    Once the rate limit of the token runs low, requests are paced
+    to spread it over the time left to its reset (see
+    `RateLimitScheduler`).
 
     :param user: GitHub user
-    :param api_token: GitHub auth token to access the API
+    :param api_token: GitHub auth token to access the API, a list
+        of tokens to spread the requests among them, or a `TokenPool`
+        whose rate limit state is shared with other instances
+    :param repo_cache: cache of the repositories data; when None
+        a `LRUCache` with the default size is used
+    :param repo_store: persistent cache of the repositories data
+        shared across runs (e.g., a `SQLiteCache`)
+    :param http_cache: cache of the responses used to send
+        conditional requests; when None they are not sent
+    :param max_workers: number of threads used to fetch the repos
+        of a page of events concurrently; when it is 1, repos are
+        fetched one by one while events are yielded
+    :param client: `GhubbyClient` shared with other instances; when
+        it is set, the cache and resolver parameters are ignored
+    :param checkpoints: `CheckpointStore` where the last event seen
+        of the user is kept, to fetch only newer events in later runs
+    :param page_workers: number of threads used to fetch the pages of
+        events concurrently; when it is greater than 1, pages hold the
+        maximum number of events
+    :param repo_resolver: backend used to fetch the repos; `rest`
+        fetches each repo with its own request, while `graphql`
+        resolves the repos of a page of events in batched queries
+    :param base_url: URL of a GitHub Enterprise instance; when None,
+        the public GitHub API is used
+    :param metrics: `Metrics` recording the requests, cache lookups,
+        rate limit waits, parsing time and events yielded
+    :param session: HTTP session shared with other instances (see
+        `create_session`), to reuse its pooled connections
+    :param scheduler: `RateLimitScheduler` of the `TokenPool` given
+        as `api_token`, shared with other instances; when None, the
+        client creates its own
+    :param priority: priority of the requests in the scheduler; lower
+        values go first
     """
     version = '0.1.0'
 
-    def __init__(self, user, api_token):
+    def __init__(self, user, api_token, repo_cache=None, repo_store=None,
+                 http_cache=None, max_workers=1, client=None, checkpoints=None,
+                 page_workers=1, repo_resolver=REST_RESOLVER, base_url=None,
+                 metrics=None, session=None, scheduler=None, priority=NORMAL_PRIORITY):
+        if max_workers < 1 or page_workers < 1:
+            raise ValueError("Number of workers must be greater than 0")
+
         self.user = user
         self.api_token = api_token
+        self.max_workers = max_workers
+        self.page_workers = page_workers
+        self.checkpoints = checkpoints
+        self.saved_requests = 0
 
-        self.client = GhubbyClient(user, api_token)
+        if client is None:
+            client = GhubbyClient(user, api_token, repo_cache=repo_cache,
+                                  repo_store=repo_store, http_cache=http_cache,
+                                  repo_resolver=repo_resolver, base_url=base_url,
+                                  metrics=metrics, session=session,
+                                  scheduler=scheduler, priority=priority)
+        self.client = client
 
-    def fetch(self, from_date=DEFAULT_DATETIME):
+    def fetch(self, from_date=DEFAULT_DATETIME, short_circuit=False, fields=None,
+              event_types=None, exclude_event_types=None, repos=None,
+              exclude_repos=None, resolve_repos=RESOLVE_EAGER):
         """Fetch the user events from GitHub.
 
+        Since the events feed is sorted from the newest to the oldest
+        event, when `short_circuit` is set the pagination stops once a
+        page ends with an event older than `from_date`. The number of
+        requests avoided is kept in the attribute `saved_requests`.
+
+        When a checkpoint store is set, only the events newer than
+        the checkpoint of the user are returned, and the pagination
+        stops once a known event is reached. The checkpoint is
+        updated after all the events are consumed.
+
+        When `fields` is set, events only keep the given fields. The
+        fields of `repo_data` (e.g., `repo_data.stargazers_count`)
+        are selected before the repository is cached; if none of them
+        is given, repositories are not fetched at all.
+
+        Events can be filtered by type and by repository name. The
+        filters are checked before fetching any repository data, so
+        filtered out events cost no API calls.
+
+        The repository data of the events is fetched according to
+        `resolve_repos`: `eager` sets `repo_data` before yielding
+        each event; `lazy` yields `LazyEvent` objects, which fetch
+        it the first time `repo_data` is accessed or when they are
+        passed to `resolve_repos`; `none` never fetches it.
+
         :param from_date: obtain events since this date. Note that
         the API returns at most the events within the past 90 days
+        :param short_circuit: stop fetching pages once the events
+            are older than `from_date`
+        :param fields: list of dotted field paths to keep (e.g.,
+            `['type', 'created_at', 'repo.name', 'repo_data.language']`);
+            when None events are returned with all their fields
+        :param event_types: list of event types to return (e.g.,
+            `['PushEvent', 'PullRequestEvent']`)
+        :param exclude_event_types: list of event types to skip
+        :param repos: list of shell-style patterns of the repository
+            names (owner/name) to return (e.g., `['chaoss/*']`)
+        :param exclude_repos: list of patterns of the repository
+            names to skip
+        :param resolve_repos: when the repository data is fetched;
+            `eager`, `lazy` or `none`
 
         :returns: a generator of events
         """
-        if not from_date:
-            from_date = DEFAULT_DATETIME
+        from_date, last_event_id, event_filter = self.__prepare(from_date, resolve_repos,
+                                                                event_types, exclude_event_types,
+                                                                repos, exclude_repos)
 
-        from_date = datetime_to_utc(from_date)
-        items = self.fetch_items(from_date)
+        items = self.fetch_items(from_date, short_circuit=short_circuit,
+                                 last_event_id=last_event_id, fields=fields,
+                                 event_filter=event_filter,
+                                 resolve_repos=resolve_repos)
 
         return items
 
-    def fetch_items(self, from_date):
+    def fetch_items(self, from_date, short_circuit=False, last_event_id=None,
+                    fields=None, event_filter=None, resolve_repos=RESOLVE_EAGER):
         """Fetch the items
 
         :param from_date: obtain events since this date
+        :param short_circuit: stop fetching pages once the events
+            are older than `from_date`
+        :param last_event_id: id of the last event seen; only newer
+            events are returned
+        :param fields: list of dotted field paths to keep
+        :param event_filter: `EventFilter` checked before fetching
+            the repository data of the events
+        :param resolve_repos: when the repository data is fetched;
+            `eager`, `lazy` or `none`
 
         :returns: a generator of items
         """
 
-        items = self.__fetch_events(from_date)
+        items = self.__fetch_events(from_date, short_circuit, last_event_id,
+                                    fields, event_filter, resolve_repos)
         return items
 
-    def __fetch_events(self, from_date):
-        """Fetch the events"""
+    def watch(self, from_date=DEFAULT_DATETIME, fields=None, event_types=None,
+              exclude_event_types=None, repos=None, exclude_repos=None,
+              resolve_repos=RESOLVE_EAGER, poll_interval=None, max_polls=None):
+        """Poll the user events from GitHub, yielding the new ones
+        as soon as they appear.
+
+        The first poll returns the events since `from_date`, or since
+        the checkpoint of the user, like `fetch` does. Later polls
+        request the first page of the feed conditionally, so they
+        cost nothing when there are no new events, and return only
+        the events newer than the last one seen. The pagination
+        stops once a known event is reached. Repos are resolved
+        through the caches of the client, which stay warm across
+        polls.
+
+        Polls are spaced by the interval the API sets in the header
+        `X-Poll-Interval`, or by `poll_interval` when it is longer.
+
+        :param from_date: obtain events since this date
+        :param fields: list of dotted field paths to keep
+        :param event_types: list of event types to return
+        :param exclude_event_types: list of event types to skip
+        :param repos: list of patterns of the repository names to return
+        :param exclude_repos: list of patterns of the repository names to skip
+        :param resolve_repos: when the repository data is fetched;
+            `eager`, `lazy` or `none`
+        :param poll_interval: minimum seconds between polls
+        :param max_polls: number of polls before stopping; when
+            None, the user is polled until the generator is closed
+
+        :returns: a generator of events
+        """
+        from_date, last_event_id, event_filter = self.__prepare(from_date, resolve_repos,
+                                                                event_types, exclude_event_types,
+                                                                repos, exclude_repos)
+
+        poll = EventsPoll(min_interval=poll_interval)
+
+        while max_polls is None or poll.polls < max_polls:
+            poll.wait()
+
+            newest_event = yield from self.__fetch_events(from_date, True, last_event_id,
+                                                          fields, event_filter,
+                                                          resolve_repos, poll=poll)
+            if newest_event:
+                last_event_id = newest_event['id']
+                logger.info("New events of %s up to %s", self.user, last_event_id)
+
+    def resolve_repos(self, events):
+        """Fetch at once the repository data of lazy events.
+
+        The repos not cached are fetched concurrently or in batches,
+        like the eager mode does with a page of events. Events that
+        are not lazy or already resolved are left as they are.
+
+        :param events: iterable of events returned by `fetch`
+
+        :returns: the list of events
+        """
+        events = list(events)
+
+        pending = collections.defaultdict(list)
+        for event in events:
+            if isinstance(event, LazyEvent) and not event.resolved:
+                fields = tuple(event.repo_fields) if event.repo_fields is not None else None
+                pending[fields].append(event)
+
+        for fields, group in pending.items():
+            fields = list(fields) if fields is not None else None
+            repos = self.__fetch_repos((event.repo_name for event in group), fields)
+
+            for event in group:
+                event[REPO_DATA] = repos[event.repo_name]
+
+        return events
+
+    def __prepare(self, from_date, resolve_repos, event_types, exclude_event_types,
+                  repos, exclude_repos):
+        """Check the arguments of `fetch` and `watch`, returning the
+        date to fetch the events from, the id of the last event seen
+        by the checkpoint of the user and the `EventFilter`"""
+
+        if resolve_repos not in RESOLVE_MODES:
+            raise ValueError("Unknown resolve repos mode: %s" % resolve_repos)
 
-        events_groups = self.client.events()
+        from_date = datetime_to_utc(from_date or DEFAULT_DATETIME)
+
+        last_event_id = None
+        checkpoint = None
+        if self.checkpoints is not None:
+            checkpoint = self.checkpoints.get(self.user)
+
+        if checkpoint:
+            from_date = max(from_date, str_to_datetime(checkpoint['created_at']))
+            last_event_id = checkpoint['id']
+            logger.debug("Resuming %s from event %s", self.user, last_event_id)
+
+        event_filter = EventFilter(event_types=event_types,
+                                   exclude_event_types=exclude_event_types,
+                                   repos=repos, exclude_repos=exclude_repos)
+
+        return from_date, last_event_id, event_filter
+
+    def __fetch_events(self, from_date, short_circuit, last_event_id, fields,
+                       event_filter, resolve_repos, poll=None):
+        """Fetch the events; the generator returns the newest event
+        seen, before filtering it"""
+
+        last_id = int(last_event_id) if last_event_id else None
+        newest_event = None
+
+        fields_tree = None
+        repo_data_fields = None
+
+        if fields:
+            fields_tree = parse_fields(fields)
+            repo_data_fields = repo_fields(fields)
+
+            if repo_data_fields == []:
+                resolve_repos = RESOLVE_NONE
+
+            # repos are projected by the client before caching them
+            if resolve_repos != RESOLVE_NONE:
+                fields_tree[REPO_DATA] = None
+
+        events_groups = self.client.events(self.user,
+                                          max_workers=self.page_workers,
+                                          poll=poll)
+
+        metrics = self.client.metrics
 
         for raw_events in events_groups:
-            events = json.loads(raw_events)
-            for event in events:
+            events = self.client.parse(raw_events)
+            new_events = [event for event in events
+                          if str_to_datetime(event['created_at']) >= from_date and
+                          (last_id is None or int(event['id']) > last_id)]
+
+            if new_events and newest_event is None:
+                newest_event = new_events[0]
+
+            if event_filter:
+                new_events = [event for event in new_events if event_filter.match(event)]
+
+            repos = {}
+            if resolve_repos == RESOLVE_EAGER and \
+                    (self.max_workers > 1 or self.client.repo_resolver == GRAPHQL_RESOLVER):
+                repos = self.__fetch_repos((event['repo']['name'] for event in new_events),
+                                           repo_data_fields)
+
+            for event in new_events:
+                repo_name = event['repo']['name']
 
-                if str_to_datetime(event['created_at']) < from_date:
-                    continue
+                if repo_name in repos:
+                    event['repo_data'] = repos[repo_name]
+                elif resolve_repos == RESOLVE_EAGER:
+                    event['repo_data'] = self.__fetch_repo(repo_name, repo_data_fields)
 
-                event['repo_data'] = self.__fetch_repo(event['repo']['name'])
+                if fields_tree:
+                    event = project(event, fields_tree)
+
+                if resolve_repos == RESOLVE_LAZY:
+                    event = LazyEvent(event, self.client, repo_name, repo_data_fields)
+
+                if metrics is not None:
+                    metrics.event(self.user)
 
                 yield event
 
-    def __fetch_repo(self, repo_name):
-        """Fetch repo information"""
+            if last_id is not None and any(int(event['id']) <= last_id for event in events):
+                self.__stop_events(events_groups, "Checkpoint")
+                break
+
+            if short_circuit and events and \
+                    str_to_datetime(events[-1]['created_at']) < from_date:
+                self.__stop_events(events_groups, "Events older than from date")
+                break
+
+        if self.checkpoints is not None and newest_event:
+            self.checkpoints.save(self.user, newest_event['id'],
+                                  newest_event['created_at'])
+
+        return newest_event
+
+    def __stop_events(self, events_groups, reason):
+        """Stop the pagination of the events, logging the reason"""
+
+        skipped = self.client.skipped_requests
+        events_groups.close()
+        saved = self.client.skipped_requests - skipped
+        self.saved_requests += saved
+
+        logger.info("%s reached for %s, %i requests saved",
+                    reason, self.user, saved)
 
-        repo_raw = self.client.repo(repo_name)
-        repo = json.loads(repo_raw)
+    def __fetch_repo(self, repo_name, fields=None):
+        """Fetch repo information. Note that the repo object is
+        shared among the events of the same repository."""
+
+        repo = self.client.repo(repo_name, fields=fields)
 
         return repo
 
+    def __fetch_repos(self, repo_names, fields=None):
+        """Fetch the information of several repos, concurrently or
+        in batches when the GraphQL resolver is used"""
+
+        repo_names = list(dict.fromkeys(repo_names))
+
+        if not repo_names:
+            return {}
+
+        if self.client.repo_resolver == GRAPHQL_RESOLVER:
+            return self.client.repos(repo_names, fields=fields)
+
+        max_workers = min(self.max_workers, len(repo_names))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            repos = executor.map(lambda name: self.client.repo(name, fields=fields),
+                                 repo_names)
+            repos = dict(zip(repo_names, repos))
+
+        return repos
+
 
-class GhubbyClient(GitHubClient):
+class LazyEvent(dict):
+    """Event whose repository data is fetched when it is accessed.
+
+    The attribute `repo_data` is fetched through the client, and so
+    its caches, the first time it is read with `event['repo_data']`
+    or `event.get('repo_data')`. Until then, it is not part of the
+    event (e.g., `'repo_data' in event` is False and it is not
+    serialized). Copies and pickles of the event are plain dicts.
+
+    :param event: event data
+    :param client: `GhubbyClient` used to fetch the repo
+    :param repo_name: full name of the repository (owner/name)
+    :param repo_fields: list of dotted field paths of the repo to keep
+    """
+    def __init__(self, event, client, repo_name, repo_fields=None):
+        super().__init__(event)
+        self.client = client
+        self.repo_name = repo_name
+        self.repo_fields = repo_fields
+
+    @property
+    def resolved(self):
+        """Whether the repository data is already set"""
+
+        return REPO_DATA in self
+
+    def __missing__(self, key):
+        if key != REPO_DATA:
+            raise KeyError(key)
+
+        repo = self.client.repo(self.repo_name, fields=self.repo_fields)
+        self[REPO_DATA] = repo
+
+        return repo
+
+    def get(self, key, default=None):
+        if key == REPO_DATA and not self.resolved:
+            return self[key]
+
+        return super().get(key, default)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class GhubbyClient(HttpClient):
     """Client for retieving information from GitHub API. It
-    leverages on the GitHubClient of grimoirelab-perceval
+    leverages on the HttpClient of grimoirelab-perceval.
+
+    No request is sent when the client is created: the rate limit
+    is learned from the `X-RateLimit-*` headers of the responses,
+    and once it runs low requests are paced by a `RateLimitScheduler`
+    to spread it over the time left to its reset. Requests rejected by the rate
+    limit are retried, after the wait given by the secondary rate
+    limit or until a token is reset.
 
     :param user: GitHub user
-    :param api_token: GitHub auth token to access the API
+    :param api_token: GitHub auth token to access the API, or a list
+        of tokens. Each request is sent with the token with the most
+        remaining requests (see `TokenPool`), and the client sleeps
+        only when all of them are exhausted. A `TokenPool` can be
+        given to share its rate limit state among several clients
+    :param repo_cache: cache of the parsed repositories data; when
+        None a `LRUCache` with the default size is used
+    :param repo_store: persistent cache of the repositories data,
+        checked when a repo is not found in `repo_cache`
+    :param http_cache: cache where the validators (`ETag` and
+        `Last-Modified` headers) and bodies of the responses are
+        stored. When set, requests are sent with the headers
+        `If-None-Match` and `If-Modified-Since` and a `304 Not
+        Modified` response is served with the stored body. These
+        responses do not count against the rate limit.
+    :param repo_resolver: backend used by `repos` to fetch the repos
+        missing from the caches; with `graphql` they are resolved in
+        batched queries (see `GraphQLRepoResolver`), falling back to
+        the REST API for those not resolved
+    :param base_url: URL of a GitHub Enterprise instance, whose API
+        is served under `/api/v3`; when None, the public GitHub API
+        is used
+    :param metrics: `Metrics` where the requests, cache lookups,
+        rate limit waits and parsing time are recorded
+    :param session: HTTP session shared among several clients (see
+        `create_session`); when None, the client creates its own
+    :param scheduler: `RateLimitScheduler` of the `TokenPool` given
+        as `api_token`, to share the pace and the backoffs among
+        several clients; when None, the client creates its own
+    :param priority: priority of the requests of the client in the
+        scheduler, e.g., `HIGH_PRIORITY` for interactive lookups and
+        `LOW_PRIORITY` for bulk crawls
     """
 
-    def __init__(self, user, api_token):
+    MAX_RATE_LIMIT_RETRIES = 5
+
+    def __init__(self, user, api_token, repo_cache=None, repo_store=None,
+                 http_cache=None, repo_resolver=REST_RESOLVER, base_url=None,
+                 metrics=None, session=None, scheduler=None, priority=NORMAL_PRIORITY):
+        # perceval closes the session when the client is deleted,
+        # even if the arguments are not valid
+        self.session = None
+
+        if repo_resolver not in REPO_RESOLVERS:
+            raise ValueError("Unknown repo resolver: %s" % repo_resolver)
+
+        if isinstance(api_token, TokenPool):
+            tokens = api_token
+        elif isinstance(api_token, (list, tuple)):
+            tokens = TokenPool(api_token)
+        else:
+            tokens = TokenPool([api_token])
+
+        if scheduler is None:
+            scheduler = RateLimitScheduler(tokens)
+        elif scheduler.tokens is not tokens:
+            raise ValueError("The scheduler must schedule the given token pool")
+
         self.user = user
-        self.token = api_token
-        self._repos = {}  # internal repos cache
+        self.tokens = tokens
+        self.scheduler = scheduler
+        self.priority = priority
+        self.skipped_requests = 0
+        self.not_modified = 0
+
+        # internal repos cache
+        self._repos = repo_cache if repo_cache is not None else LRUCache()
+        self._repo_store = repo_store
+        self._http_cache = http_cache
+
+        self.repo_resolver = repo_resolver
+        self.metrics = metrics
+        self._shared_session = session
+        self._graphql = GraphQLRepoResolver(self)
+
+        self.token = self.tokens.tokens[0]
+
+        if base_url:
+            base_url = urijoin(base_url, 'api', 'v3')
+        else:
+            base_url = GITHUB_API_URL
+
+        super().__init__(base_url, extra_headers=self._set_extra_headers())
+
+    def _set_extra_headers(self):
+        """Set extra headers for session"""
+
+        headers = {'Accept': ACCEPT_HEADER}
+
+        if self.token:
+            headers['Authorization'] = 'token ' + self.token
+
+        return headers
+
+    def _create_http_session(self):
+        """Use the shared session, if any, instead of creating one"""
+
+        if self._shared_session is None:
+            super()._create_http_session()
+        else:
+            self.session = self._shared_session
 
-        super().__init__("", "", api_token, sleep_for_rate=True)
-        self._init_rate_limit()
+    def events(self, user=None, max_workers=1, poll=None):
+        """Collect the user events
 
-    def events(self):
-        """Collect the user events"""
+        When `max_workers` is greater than 1, events are requested
+        with the maximum page size and, once the first page tells
+        which one is the last, the rest of pages are fetched
+        concurrently, up to `max_workers` pages ahead of the one
+        being read.
+
+        :param user: GitHub user; when None the user of the client is used
+        :param max_workers: number of threads fetching the pages
+        :param poll: `EventsPoll` of the feed; the first page is
+            requested conditionally and no events are returned when
+            it is not modified
+        """
+        user = user or self.user
 
         payload = {
-            'per_page': 30
+            'per_page': PER_PAGE if max_workers == 1 else MAX_PER_PAGE
         }
 
-        path = urijoin("users", self.user, "events", "public")
-        return self.fetch_items(path, payload)
+        path = urijoin("users", user, "events", "public")
+        return self.fetch_items(path, payload, max_workers=max_workers, poll=poll)
+
+    def repo(self, name, fields=None):
+        """Collect repo data, returning the parsed repo object
+
+        :param name: full name of the repository (owner/name)
+        :param fields: list of dotted field paths to keep; the repo
+            is projected before caching it. When None, all the fields
+            are kept
+        """
+        key = self.__repo_key(name, fields)
+        repo = self.__get_repo(key)
+
+        if repo is not None:
+            return repo
+
+        return self.__put_repo(key, self.__fetch_repo(name), fields)
+
+    def repos(self, names, fields=None):
+        """Collect the data of several repos, returning a dict with
+        the parsed repo objects by name.
+
+        With the `graphql` resolver, the repos missing from the caches
+        are resolved in batched queries; those not resolved (e.g., not
+        found) are fetched with the REST API.
+
+        :param names: full names of the repositories (owner/name)
+        :param fields: list of dotted field paths to keep
+        """
+        repos = {}
+        missing = []
+
+        for name in dict.fromkeys(names):
+            repo = self.__get_repo(self.__repo_key(name, fields))
+
+            if repo is not None:
+                repos[name] = repo
+            else:
+                missing.append(name)
+
+        resolved = {}
+        if missing and self.repo_resolver == GRAPHQL_RESOLVER:
+            resolved = self._graphql.resolve(missing)
+
+        for name in missing:
+            repo = resolved.get(name, None)
+
+            if repo is None:
+                repo = self.__fetch_repo(name)
+
+            repos[name] = self.__put_repo(self.__repo_key(name, fields), repo, fields)
+
+        return repos
+
+    @property
+    def repo_cache(self):
+        """Cache of the repositories data"""
+
+        return self._repos
+
+    def __repo_key(self, name, fields):
+        """Key of a repo in the caches; repos resolved with GraphQL
+        have fewer fields than the REST ones, so they are kept apart"""
+
+        key = name
+        if self.repo_resolver == GRAPHQL_RESOLVER:
+            key = GRAPHQL_RESOLVER + ':' + key
+        if fields is not None:
+            key += '?fields=' + ','.join(sorted(fields))
+
+        return key
+
+    def __get_repo(self, key):
+        """Get a repo from the memory cache or the repo store"""
+
+        repo = self._repos.get(key)
+
+        if self.metrics is not None:
+            self.metrics.cache('repo', repo is not None)
+
+        if repo is not None:
+            return repo
+
+        if self._repo_store is not None:
+            repo = self._repo_store.get(key)
+
+            if self.metrics is not None:
+                self.metrics.cache('repo_store', repo is not None)
+
+            if repo is not None:
+                self._repos.put(key, repo)
+
+        return repo
+
+    def __put_repo(self, key, repo, fields):
+        """Project a repo and store it in the caches"""
+
+        if fields is not None:
+            repo = project(repo, parse_fields(fields))
+
+        self._repos.put(key, repo)
 
-    def repo(self, name):
-        """Collect repo data"""
+        if self._repo_store is not None:
+            self._repo_store.put(key, repo)
 
-        if name in self._repos:
-            return self._repos[name]
+        return repo
+
+    def __fetch_repo(self, name):
+        """Fetch a repo with the REST API"""
 
         path = urijoin(self.base_url, "repos", name)
         r = self.fetch(path)
-        repo = r.text
-        self._repos.update({name: repo})
 
-        return repo
+        return self.parse(r.text)
+
+    def parse(self, text):
+        """Parse a JSON document, recording the time spent"""
+
+        start = time.perf_counter()
+        obj = codec.loads(text)
+
+        if self.metrics is not None:
+            self.metrics.parse(time.perf_counter() - start, len(text))
+
+        return obj
+
+    def fetch(self, url, payload=None, headers=None, method=HttpClient.GET,
+              stream=False, verify=True):
+        """Fetch the data from a given URL, sending a conditional
+        request when a previous response of the URL is available.
+
+        :param url: link to the resource
+        :param payload: payload of the request
+        :param headers: headers of the request
+        :param method: type of request call (GET or POST)
+        :param stream: defer downloading the response body until
+            the response content is available
+        :param verify: verifying the SSL certificate
+
+        :returns a response object
+        """
+        if self._http_cache is None or method != HttpClient.GET:
+            return self.__fetch_with_token(url, payload, headers, method, stream, verify)
+
+        key = requests.Request(method, url, params=payload).prepare().url
+        cached = self._http_cache.get(key)
+
+        if cached:
+            headers = dict(headers) if headers else {}
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.__fetch_with_token(url, payload, headers, method, stream, verify)
+
+        if cached and self.metrics is not None:
+            self.metrics.cache('http', response.status_code == 304)
+
+        if cached and response.status_code == 304:
+            logger.debug("Not modified: %s", key)
+            self.not_modified += 1
+            self.__restore_response(response, cached)
+        elif 'ETag' in response.headers or 'Last-Modified' in response.headers:
+            self._http_cache.put(key, {
+                'etag': response.headers.get('ETag', None),
+                'last_modified': response.headers.get('Last-Modified', None),
+                'link': response.headers.get('Link', None),
+                'text': response.text
+            })
+
+        return response
+
+    def __fetch_with_token(self, url, payload, headers, method, stream, verify):
+        """Fetch the data using the token with the most remaining
+        requests, once the scheduler allows it.
+
+        Requests rejected by the secondary rate limit are retried
+        after the scheduler backoff; those rejected by the primary
+        one are retried with another token, or once it is reset.
+        """
+        retries = 0
+
+        while True:
+            waited = self.scheduler.acquire(self.priority)
+            token, slept = self.tokens.take()
+            waited += slept
+
+            # shared sessions do not have the extra headers of the client
+            request_headers = {'Accept': ACCEPT_HEADER}
+            if headers:
+                request_headers.update(headers)
+            if token:
+                request_headers['Authorization'] = 'token ' + token
+
+            start = time.perf_counter()
+            try:
+                response = HttpClient.fetch(self, url, payload, request_headers,
+                                            method, stream, verify)
+            except requests.exceptions.HTTPError as error:
+                self.tokens.update(token, error.response)
+                self.__record_request(url, method, stream, error.response, start, waited)
+
+                kind = rate_limit_kind(error.response)
+                if kind is None or retries == self.MAX_RATE_LIMIT_RETRIES:
+                    raise error
+
+                retries += 1
+                if kind == SECONDARY_RATE_LIMIT:
+                    self.scheduler.backoff(retry_after(error.response))
+                continue
+
+            self.scheduler.succeeded()
+            self.tokens.update(token, response)
+            self.__record_request(url, method, stream, response, start, waited)
+
+            return response
+
+    def __record_request(self, url, method, stream, response, start, waited):
+        if self.metrics is None:
+            return
 
-    def fetch_items(self, path, payload):
-        """Return the items from github API using links pagination"""
+        seconds = time.perf_counter() - start
+
+        # streamed bodies are not read yet
+        if stream:
+            size = int(response.headers.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+
+        if waited > 0:
+            self.metrics.rate_limit_wait(waited)
+
+        self.metrics.request(url, response.status_code, seconds, size, method=method)
+
+    @staticmethod
+    def __restore_response(response, cached):
+        """Fill a not modified response with the cached data"""
+
+        response._content = cached['text'].encode('utf-8')
+        response.encoding = 'utf-8'
+
+        if cached['link'] and 'Link' not in response.headers:
+            response.headers['Link'] = cached['link']
+
+    def fetch_items(self, path, payload, max_workers=1, poll=None):
+        """Return the items from github API using links pagination.
+
+        When the generator is closed before reaching the last page,
+        the number of pages not requested is added to the attribute
+        `skipped_requests`.
+
+        When `max_workers` is greater than 1 and the first page links
+        to the last one, the rest of pages are requested concurrently
+        and yielded in order.
+
+        When `poll` is set, the first page is requested with its
+        conditional headers and nothing is returned when it is not
+        modified.
+        """
 
         page = 0  # current page
         last_page = None  # last page
@@ -150,7 +889,15 @@ class GhubbyClient(GitHubClient):
 
         logger.debug("Get GitHub paginated items from " + url_next)
 
-        response = self.fetch(url_next, payload=payload)
+        if poll is None:
+            response = self.fetch(url_next, payload=payload)
+        else:
+            response = self.fetch(url_next, payload=payload, headers=poll.headers)
+            poll.update(response)
+
+            if not poll.modified:
+                logger.debug("No new items in " + url_next)
+                return
 
         items = response.text
         page += 1
@@ -161,8 +908,19 @@ class GhubbyClient(GitHubClient):
             last_page = int(last_page)
             logger.debug("Page: %i/%i" % (page, last_page))
 
+        if max_workers > 1 and last_page:
+            yield from self.__fetch_pages(items, last_url, last_page,
+                                          payload, max_workers)
+            return
+
         while items:
-            yield items
+            try:
+                yield items
+            except GeneratorExit:
+                # the consumer stopped the pagination
+                if last_page:
+                    self.skipped_requests += last_page - page
+                raise
 
             items = None
 
@@ -174,9 +932,296 @@ class GhubbyClient(GitHubClient):
                 items = response.text
                 logger.debug("Page: %i/%i" % (page, last_page))
 
+    def __fetch_pages(self, items, last_url, last_page, payload, max_workers):
+        """Yield the first page items and fetch the rest concurrently.
+
+        At most `max_workers` pages are requested ahead of the page
+        being consumed, so stopping the pagination saves the requests
+        of the pages not reached yet.
+        """
+        urls = collections.deque(re.sub(r'([?&])page=\d+', r'\g<1>page=%i' % page, last_url)
+                                 for page in range(2, last_page + 1))
+
+        max_workers = min(max_workers, len(urls))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        futures = collections.deque()
+
+        def submit_pages():
+            while urls and len(futures) < max_workers:
+                futures.append(executor.submit(self.fetch, urls.popleft(), payload))
+
+        try:
+            submit_pages()
+            yield items
+
+            page = 1
+            while futures:
+                items = futures.popleft().result().text
+                page += 1
+                logger.debug("Page: %i/%i" % (page, last_page))
+
+                if not items:
+                    break
+
+                submit_pages()
+                yield items
+        except GeneratorExit:
+            # the consumer stopped the pagination
+            self.skipped_requests += len(urls) + sum(future.cancel() for future in futures)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
 
 class GHubbyCommand():
-    """Class to run GHubby from the command line."""
+    """Class to run GHubby from the command line.
+
+    :param args: command line arguments
+    """
+    def __init__(self, *args):
+        parser = self.setup_cmd_parser()
+        self.parsed_args = parser.parse_args(args)
+
+    def run(self):
+        """Fetch the events and write them to the output."""
+
+        args = self.parsed_args
+
+        if args.users_file:
+            self.__run_crawler(args)
+            return
+
+        repo_cache = LRUCache(max_size=args.repo_cache_size,
+                              ttl=args.repo_cache_ttl)
+        repo_store = None
+        if args.repo_store:
+            repo_store = SQLiteCache(args.repo_store, ttl=args.repo_store_ttl)
+
+        http_cache = None
+        if args.http_cache:
+            http_cache = SQLiteCache(args.http_cache)
+
+        checkpoints = None
+        if args.checkpoint_file:
+            checkpoints = CheckpointStore(args.checkpoint_file)
+
+        tokens = self.__read_tokens(args)
+
+        metrics = None
+        if args.metrics_file:
+            metrics = Metrics()
+
+        session = create_session(pool_size=args.http_pool_size,
+                                 timeout=args.http_timeout)
+
+        tokens = TokenPool(tokens or [None])
+        scheduler = RateLimitScheduler(tokens, pace=args.pacing)
+
+        ghubby = Ghubby(user=args.user, api_token=tokens,
+                        repo_cache=repo_cache, repo_store=repo_store,
+                        http_cache=http_cache, max_workers=args.max_workers,
+                        checkpoints=checkpoints,
+                        page_workers=args.page_workers,
+                        repo_resolver=args.repo_resolver,
+                        base_url=args.enterprise_url,
+                        metrics=metrics,
+                        session=session,
+                        scheduler=scheduler)
+
+        from_date = str_to_datetime(args.from_date)
+        filters = self.__filters(args)
+
+        if args.pipeline and args.watch:
+            raise ValueError("--pipeline can not be used with --watch")
+
+        if args.aggregate:
+            aggregator = self.__run_aggregator(args, ghubby, from_date, filters)
+            logger.info("%i events aggregated. Repo cache: %s",
+                        aggregator.count, repo_cache.stats())
+        else:
+            writer = self.__write_events(args, ghubby, from_date, filters)
+            logger.info("%i events written. Repo cache: %s",
+                        writer.count, repo_cache.stats())
+
+        if repo_store is not None:
+            logger.info("Repo store: %s", repo_store.stats())
+        if http_cache is not None:
+            logger.info("Not modified responses: %i", ghubby.client.not_modified)
+        logger.info("Token usage: %s", ghubby.client.tokens.usage())
+
+        if metrics is not None:
+            metrics.dump(args.metrics_file, fmt=args.metrics_format)
+
+    def __write_events(self, args, ghubby, from_date, filters):
+        """Write the events of the user to the output"""
+
+        writer = EventWriter(args.output, fmt=args.format,
+                             compression=args.compress)
+        if args.repos_output:
+            repos_writer = EventWriter(args.repos_output, fmt=args.format,
+                                       compression=args.compress)
+            writer = NormalizedWriter(writer, repos_writer)
+
+        with writer:
+            if args.pipeline:
+                self.__run_pipeline(args, ghubby, writer.write, from_date, filters)
+            elif args.watch:
+                events = ghubby.watch(from_date=from_date,
+                                      poll_interval=args.poll_interval,
+                                      **filters)
+                try:
+                    # watched events are written as soon as they appear
+                    for event in events:
+                        writer.write(event)
+                        writer.flush()
+                except KeyboardInterrupt:
+                    logger.info("Watch of %s stopped", args.user)
+            else:
+                events = ghubby.fetch(from_date=from_date,
+                                      short_circuit=args.short_circuit,
+                                      **filters)
+                for event in events:
+                    writer.write(event)
+
+        return writer
+
+    def __run_aggregator(self, args, ghubby, from_date, filters):
+        """Count the events of the user and write the summary to the
+        output, merged with the summaries of previous runs"""
+
+        from .aggregate import ActivityAggregator
+
+        if args.watch or args.repos_output or args.fields:
+            raise ValueError("--aggregate can not be used with --watch, --repos-output or --fields")
+
+        filters['fields'] = ActivityAggregator.FIELDS
+
+        # the checkpoint is saved once the summary is written
+        checkpoints = None
+        if ghubby.checkpoints is not None:
+            checkpoints = DeferredCheckpoints(ghubby.checkpoints)
+            ghubby.checkpoints = checkpoints
+
+        aggregator = ActivityAggregator()
+
+        def add(event):
+            aggregator.add(ghubby.user, event)
+
+        if args.pipeline:
+            self.__run_pipeline(args, ghubby, add, from_date, filters)
+        else:
+            for event in ghubby.fetch(from_date=from_date,
+                                      short_circuit=args.short_circuit,
+                                      **filters):
+                add(event)
+
+        for path in args.merge_summary or []:
+            aggregator.merge(ActivityAggregator.load(path))
+
+        aggregator.dump(args.output)
+
+        if checkpoints is not None:
+            checkpoints.commit()
+
+        return aggregator
+
+    @staticmethod
+    def __run_pipeline(args, ghubby, sink, from_date, filters):
+        """Fetch, enrich and pass the events to `sink` in concurrent stages"""
+
+        from .pipeline import EventPipeline
+
+        pipeline = EventPipeline(ghubby, sink, from_date=from_date,
+                                 queue_size=args.queue_size or EventPipeline.DEFAULT_QUEUE_SIZE,
+                                 short_circuit=args.short_circuit,
+                                 **filters)
+        try:
+            pipeline.run()
+        finally:
+            logger.info("Pipeline stats: %s", pipeline.stats())
+
+    def __run_crawler(self, args):
+        """Fetch the events of the users of a file with a pool of
+        processes and write them to the output."""
+
+        from .crawler import ShardedCrawler
+
+        if args.user or args.watch or args.repos_output:
+            raise ValueError("--users-file can not be used with --user, --watch or --repos-output")
+
+        with open(args.users_file) as f:
+            users = [line.strip() for line in f if line.strip()]
+
+        crawler = ShardedCrawler(users, self.__read_tokens(args),
+                                 processes=args.processes,
+                                 shard_size=args.shard_size or ShardedCrawler.DEFAULT_SHARD_SIZE,
+                                 repo_store=args.repo_store,
+                                 repo_store_ttl=args.repo_store_ttl,
+                                 http_cache=args.http_cache,
+                                 checkpoint_file=args.checkpoint_file,
+                                 max_workers=args.max_workers,
+                                 page_workers=args.page_workers,
+                                 repo_resolver=args.repo_resolver,
+                                 base_url=args.enterprise_url,
+                                 pacing=args.pacing)
+
+        if args.aggregate:
+            if args.fields:
+                raise ValueError("--aggregate can not be used with --fields")
+
+            aggregator = crawler.aggregate(args.output,
+                                           from_date=str_to_datetime(args.from_date),
+                                           summaries=args.merge_summary,
+                                           short_circuit=args.short_circuit,
+                                           **self.__filters(args))
+
+            logger.info("%i events of %i users aggregated. Shards retried: %i",
+                        aggregator.count, len(crawler.users), crawler.retries)
+            return
+
+        shards = crawler.fetch_shards(from_date=str_to_datetime(args.from_date),
+                                      fmt=args.format,
+                                      short_circuit=args.short_circuit,
+                                      **self.__filters(args))
+
+        with EventWriter(args.output, fmt=args.format,
+                         compression=args.compress) as writer:
+            for shard in shards:
+                writer.copy(shard.path, shard.count)
+
+        logger.info("%i events of %i users written. Shards retried: %i",
+                    writer.count, len(crawler.users), crawler.retries)
+
+    @staticmethod
+    def __read_tokens(args):
+        """Read the tokens of the arguments and of the tokens file"""
+
+        tokens = list(args.api_token or [])
+        if args.api_token_file:
+            with open(args.api_token_file) as f:
+                tokens.extend(line.strip() for line in f if line.strip())
+
+        return tokens
+
+    def __filters(self, args):
+        """Parameters of the fetch that select the events and their fields"""
+
+        fields = self.__split(args.fields)
+
+        # the normalized output refers to the repos by their id
+        if fields and args.repos_output and repo_fields(fields):
+            fields.append(REPO_DATA + '.id')
+
+        return {
+            'fields': fields,
+            'event_types': self.__split(args.event_types),
+            'exclude_event_types': self.__split(args.exclude_event_types),
+            'repos': self.__split(args.repos),
+            'exclude_repos': self.__split(args.exclude_repos),
+            'resolve_repos': args.resolve_repos
+        }
 
     @staticmethod
     def setup_cmd_parser():
@@ -187,26 +1232,188 @@ class GHubbyCommand():
             add_help=False)
         parser.add_argument('-u', '--user',
                             help="GitHub user", dest='user')
-        parser.add_argument('-t', '--api-token',
-                            help="GitHub token", dest='api_token')
+        parser.add_argument('--users-file',
+                            help="file with a GitHub user per line, whose "
+                                 "events are fetched by a pool of processes",
+                            dest='users_file')
+        parser.add_argument('--processes', type=int,
+                            help="number of processes fetching the users of "
+                                 "--users-file; by default, the number of CPUs",
+                            dest='processes')
+        parser.add_argument('--shard-size', type=int,
+                            help="number of users fetched by a process at "
+                                 "once (default 100)",
+                            dest='shard_size')
+        parser.add_argument('-t', '--api-token', action='append',
+                            help="GitHub token; it can be repeated to use "
+                                 "several tokens",
+                            dest='api_token')
+        parser.add_argument('--api-token-file',
+                            help="file with a GitHub token per line",
+                            dest='api_token_file')
         parser.add_argument('-d', '--from-date',
                             default='1970-01-01',
                             help="fetch events updated since this date",
                             dest='from_date')
+        parser.add_argument('--short-circuit', action='store_true',
+                            help="stop fetching pages once the events are "
+                                 "older than from-date",
+                            dest='short_circuit')
+        parser.add_argument('--repo-cache-size', type=int,
+                            default=LRUCache.DEFAULT_MAX_SIZE,
+                            help="maximum number of repositories kept in "
+                                 "the cache",
+                            dest='repo_cache_size')
+        parser.add_argument('--repo-cache-ttl', type=int,
+                            help="seconds a cached repository is valid",
+                            dest='repo_cache_ttl')
+        parser.add_argument('--repo-store',
+                            help="path of the file where repositories are "
+                                 "cached across runs",
+                            dest='repo_store')
+        parser.add_argument('--repo-store-ttl', type=int,
+                            default=SQLiteCache.DEFAULT_TTL,
+                            help="seconds a repository is valid in the "
+                                 "repo store",
+                            dest='repo_store_ttl')
+        parser.add_argument('--http-cache',
+                            help="path of the file where responses are cached "
+                                 "to send conditional requests",
+                            dest='http_cache')
+        parser.add_argument('--max-workers', type=int, default=1,
+                            help="number of threads used to fetch the repos "
+                                 "of a page of events concurrently",
+                            dest='max_workers')
+        parser.add_argument('--page-workers', type=int, default=1,
+                            help="number of threads used to fetch the pages "
+                                 "of events concurrently",
+                            dest='page_workers')
+        parser.add_argument('--repo-resolver', default=REST_RESOLVER,
+                            choices=REPO_RESOLVERS,
+                            help="backend used to fetch the repos; graphql "
+                                 "resolves the repos of a page of events "
+                                 "in batched queries",
+                            dest='repo_resolver')
+        parser.add_argument('--enterprise-url',
+                            help="URL of a GitHub Enterprise instance",
+                            dest='enterprise_url')
+        parser.add_argument('--resolve-repos', default=RESOLVE_EAGER,
+                            choices=[RESOLVE_EAGER, RESOLVE_NONE],
+                            help="whether the repository data of the events "
+                                 "is fetched",
+                            dest='resolve_repos')
+        parser.add_argument('--http-pool-size', type=int,
+                            default=DEFAULT_POOL_SIZE,
+                            help="maximum number of connections kept open "
+                                 "to the API",
+                            dest='http_pool_size')
+        parser.add_argument('--http-timeout', type=float,
+                            default=DEFAULT_TIMEOUT[1],
+                            help="seconds to wait for a response of the API",
+                            dest='http_timeout')
+        parser.add_argument('--watch', action='store_true',
+                            help="keep polling the events of the user and "
+                                 "write the new ones as they appear",
+                            dest='watch')
+        parser.add_argument('--poll-interval', type=int,
+                            help="minimum seconds between polls in watch "
+                                 "mode; the interval set by the API is "
+                                 "honored when it is longer",
+                            dest='poll_interval')
+        parser.add_argument('--pipeline', action='store_true',
+                            help="fetch, enrich and write the events in "
+                                 "concurrent stages connected by bounded "
+                                 "queues",
+                            dest='pipeline')
+        parser.add_argument('--queue-size', type=int,
+                            help="maximum number of events waiting between "
+                                 "two stages of the pipeline",
+                            dest='queue_size')
+        parser.add_argument('--aggregate', action='store_true',
+                            help="write the number of events of each user "
+                                 "by type, repository and day instead of "
+                                 "the events",
+                            dest='aggregate')
+        parser.add_argument('--merge-summary', action='append',
+                            help="summary written by --aggregate in a "
+                                 "previous run, merged into the output; it "
+                                 "can be repeated",
+                            dest='merge_summary')
+        parser.add_argument('--no-pacing', action='store_false',
+                            help="send requests as fast as the rate limit "
+                                 "allows, instead of spreading them until "
+                                 "it is reset once less than 1000 requests "
+                                 "remain",
+                            dest='pacing')
+        parser.add_argument('--metrics-file',
+                            help="file where the metrics of the run are "
+                                 "written",
+                            dest='metrics_file')
+        parser.add_argument('--metrics-format', default=METRICS_JSON_FORMAT,
+                            choices=Metrics.FORMATS,
+                            help="format of the metrics file",
+                            dest='metrics_format')
+        parser.add_argument('--checkpoint-file',
+                            help="file where the last event seen of each user "
+                                 "is kept to fetch only newer events",
+                            dest='checkpoint_file')
+        parser.add_argument('-o', '--output',
+                            help="file where events are written; by default "
+                                 "the standard output",
+                            dest='output')
+        parser.add_argument('--format', default=JSON_FORMAT,
+                            choices=EventWriter.FORMATS,
+                            help="format of the events; pretty-printed JSON "
+                                 "or one compact JSON document per line",
+                            dest='format')
+        parser.add_argument('--compress', choices=EventWriter.COMPRESSIONS,
+                            help="compress the output",
+                            dest='compress')
+        parser.add_argument('--repos-output',
+                            help="file where each repository is written once; "
+                                 "events refer to them by repo_data_id instead "
+                                 "of embedding repo_data",
+                            dest='repos_output')
+        parser.add_argument('--fields',
+                            help="comma-separated list of dotted field paths "
+                                 "to keep (e.g., type,repo.name,"
+                                 "repo_data.language)",
+                            dest='fields')
+        parser.add_argument('--event-types',
+                            help="comma-separated list of event types to fetch",
+                            dest='event_types')
+        parser.add_argument('--exclude-event-types',
+                            help="comma-separated list of event types to skip",
+                            dest='exclude_event_types')
+        parser.add_argument('--repos',
+                            help="comma-separated list of repository name "
+                                 "patterns to fetch (e.g., chaoss/*)",
+                            dest='repos')
+        parser.add_argument('--exclude-repos',
+                            help="comma-separated list of repository name "
+                                 "patterns to skip",
+                            dest='exclude_repos')
 
         return parser
 
+    @staticmethod
+    def __split(value):
+        """Split a comma-separated argument into a list"""
 
-if __name__ == '__main__':
-    logging.info("Looking for events.")
+        if not value:
+            return None
 
-    parser = GHubbyCommand.setup_cmd_parser()
-    args = parser.parse_args()
+        return [item.strip() for item in value.split(',') if item.strip()]
 
-    ghubby = Ghubby(user=args.user, api_token=args.api_token)
 
-    from_date = str_to_datetime(args.from_date)
-    for event in ghubby.fetch(from_date=from_date):
-        print(json.dumps(event, sort_keys=True, indent=4))
+def main():
+    logging.info("Looking for events.")
+
+    cmd = GHubbyCommand(*sys.argv[1:])
+    cmd.run()
 
     logging.info("Events fetched.")
+
+
+if __name__ == '__main__':
+    main()
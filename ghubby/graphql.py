@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import logging
+
+import requests
+from perceval.client import HttpClient
+
+from . import codec
+from .utils import urijoin
+
+logger = logging.getLogger(__name__)
+
+REPO_FRAGMENT = """
+fragment repo on Repository {
+  databaseId
+  name
+  nameWithOwner
+  owner { login url avatarUrl }
+  description
+  url
+  homepageUrl
+  mirrorUrl
+  isFork
+  isPrivate
+  isArchived
+  hasIssuesEnabled
+  hasWikiEnabled
+  createdAt
+  updatedAt
+  pushedAt
+  diskUsage
+  forkCount
+  stargazers { totalCount }
+  watchers { totalCount }
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+  primaryLanguage { name }
+  defaultBranchRef { name }
+  licenseInfo { key name spdxId url }
+}
+"""
+
+
+class GraphQLRepoResolver:
+    """Resolve several repositories with a single request to the
+    GitHub GraphQL API.
+
+    Repositories are queried in batches of aliased `repository`
+    fields, and the results are mapped onto the shape of the REST
+    API (see `to_rest`). Only the subset of REST fields available
+    in GraphQL is set.
+
+    :param client: `GhubbyClient` used to send the requests
+    :param batch_size: maximum number of repositories per query
+    """
+    DEFAULT_BATCH_SIZE = 50
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("Batch size must be greater than 0")
+
+        self.client = client
+        self.batch_size = batch_size
+        self.requests = 0
+
+    @property
+    def url(self):
+        """GraphQL endpoint; GitHub Enterprise serves it in `/api/graphql`"""
+
+        base_url = self.client.base_url.rstrip('/')
+
+        if base_url.endswith('/api/v3'):
+            return base_url[:-len('v3')] + 'graphql'
+
+        return urijoin(base_url, 'graphql')
+
+    def resolve(self, names):
+        """Resolve the given repositories.
+
+        :param names: full names of the repositories (owner/name)
+
+        :returns: a dict with the REST-shaped repos by name; repos
+            that could not be resolved are not included
+        """
+        names = [name for name in dict.fromkeys(names) if '/' in name]
+        repos = {}
+
+        for i in range(0, len(names), self.batch_size):
+            repos.update(self.__resolve_batch(names[i:i + self.batch_size]))
+
+        return repos
+
+    def __resolve_batch(self, names):
+        query, variables = self.build_query(names)
+        payload = codec.dumpb({'query': query, 'variables': variables})
+
+        self.requests += 1
+        try:
+            response = self.client.fetch(self.url, payload=payload,
+                                         headers={'Content-Type': 'application/json'},
+                                         method=HttpClient.POST)
+        except requests.exceptions.HTTPError as error:
+            # the repos not resolved are fetched from the REST API
+            logger.warning("GraphQL query of %i repos failed: %s", len(names), error)
+            return {}
+        result = self.client.parse(response.text)
+
+        for error in result.get('errors', None) or []:
+            logger.debug("GraphQL error: %s", error.get('message', error))
+
+        data = result.get('data', None) or {}
+
+        repos = {}
+        for i, name in enumerate(names):
+            node = data.get('r%i' % i, None)
+
+            if node is not None:
+                repos[name] = self.to_rest(node)
+
+        return repos
+
+    @staticmethod
+    def build_query(names):
+        """Build an aliased query of the given repositories.
+
+        Owners and names are sent as variables, so they do not
+        need to be escaped.
+
+        :returns: a tuple with the query and its variables
+        """
+        params = []
+        fields = []
+        variables = {}
+
+        for i, name in enumerate(names):
+            owner, repo = name.split('/', 1)
+            params.append('$o%i: String!, $n%i: String!' % (i, i))
+            fields.append('r%i: repository(owner: $o%i, name: $n%i) { ...repo }' % (i, i, i))
+            variables['o%i' % i] = owner
+            variables['n%i' % i] = repo
+
+        query = 'query(%s) {\n  %s\n}\n%s' % (', '.join(params),
+                                               '\n  '.join(fields),
+                                               REPO_FRAGMENT)
+
+        return query, variables
+
+    def to_rest(self, node):
+        """Map a GraphQL repository onto the REST API shape"""
+
+        def count(field):
+            value = node.get(field, None)
+            return value['totalCount'] if value else 0
+
+        def attr(field, key):
+            value = node.get(field, None)
+            return value[key] if value else None
+
+        owner = node.get('owner', None) or {}
+        license_info = node.get('licenseInfo', None)
+        stargazers = count('stargazers')
+        open_issues = count('issues') + count('pullRequests')
+
+        repo = {
+            'id': node['databaseId'],
+            'name': node['name'],
+            'full_name': node['nameWithOwner'],
+            'owner': {
+                'login': owner.get('login', None),
+                'html_url': owner.get('url', None),
+                'avatar_url': owner.get('avatarUrl', None)
+            },
+            'description': node['description'],
+            'url': urijoin(self.client.base_url, 'repos', node['nameWithOwner']),
+            'html_url': node['url'],
+            'clone_url': node['url'] + '.git',
+            'homepage': node['homepageUrl'],
+            'mirror_url': node['mirrorUrl'],
+            'fork': node['isFork'],
+            'private': node['isPrivate'],
+            'archived': node['isArchived'],
+            'has_issues': node['hasIssuesEnabled'],
+            'has_wiki': node['hasWikiEnabled'],
+            'created_at': node['createdAt'],
+            'updated_at': node['updatedAt'],
+            'pushed_at': node['pushedAt'],
+            'size': node['diskUsage'],
+            'forks': node['forkCount'],
+            'forks_count': node['forkCount'],
+            'stargazers_count': stargazers,
+            'watchers': stargazers,
+            'watchers_count': stargazers,
+            'subscribers_count': count('watchers'),
+            'open_issues': open_issues,
+            'open_issues_count': open_issues,
+            'language': attr('primaryLanguage', 'name'),
+            'default_branch': attr('defaultBranchRef', 'name'),
+            'license': None
+        }
+
+        if license_info:
+            repo['license'] = {
+                'key': license_info['key'],
+                'name': license_info['name'],
+                'spdx_id': license_info['spdxId'],
+                'url': license_info['url']
+            }
+
+        return repo
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import collections
+import logging
+import threading
+import urllib.parse
+
+from . import codec
+
+logger = logging.getLogger(__name__)
+
+JSON_FORMAT = 'json'
+PROMETHEUS_FORMAT = 'prometheus'
+
+REQUEST = 'request'
+CACHE = 'cache'
+RATE_LIMIT_WAIT = 'rate_limit_wait'
+PARSE = 'parse'
+EVENT = 'event'
+
+
+def request_kind(url):
+    """Classify a GitHub API URL (events, repos, graphql, rate_limit or other)"""
+
+    path = urllib.parse.urlsplit(url).path.rstrip('/')
+
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if path.endswith('/rate_limit'):
+        return 'rate_limit'
+    if '/events' in path:
+        return 'events'
+    if '/repos/' in path:
+        return 'repos'
+    return 'other'
+
+
+class Metrics:
+    """Recorder of the activity of the fetch pipeline.
+
+    It keeps the duration, size and status code of the requests,
+    the hits and misses of the caches, the time spent waiting for
+    the rate limit and parsing JSON documents, and the events
+    yielded by user. The recorder is thread safe.
+
+    Each record is also passed to the hooks added with `add_hook`,
+    called as `hook(name, data)` where `name` is one of `request`,
+    `cache`, `rate_limit_wait`, `parse` and `event`, and `data` a
+    dict with the values of the record.
+
+    :param buckets: upper bounds, in seconds, of the histogram of
+        request durations
+    """
+    FORMATS = [JSON_FORMAT, PROMETHEUS_FORMAT]
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+
+        self.requests = collections.Counter()
+        self.request_seconds = collections.Counter()
+        self.request_buckets = collections.defaultdict(lambda: [0] * len(self.buckets))
+        self.response_bytes = collections.Counter()
+        self.cache_hits = collections.Counter()
+        self.cache_misses = collections.Counter()
+        self.rate_limit_wait_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.parsed_bytes = 0
+        self.events = collections.Counter()
+
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Add a callable invoked with every record"""
+
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def request(self, url, status, seconds, size, method='GET'):
+        """Record a request to the API"""
+
+        kind = request_kind(url)
+
+        with self._lock:
+            self.requests[(kind, status)] += 1
+            self.request_seconds[kind] += seconds
+            self.response_bytes[kind] += size
+
+            counts = self.request_buckets[kind]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+
+        self.__notify(REQUEST, {'url': url, 'method': method, 'kind': kind,
+                                'status': status, 'seconds': seconds, 'bytes': size})
+
+    def cache(self, name, hit):
+        """Record a lookup in the cache `name`"""
+
+        with self._lock:
+            if hit:
+                self.cache_hits[name] += 1
+            else:
+                self.cache_misses[name] += 1
+
+        self.__notify(CACHE, {'cache': name, 'hit': hit})
+
+    def rate_limit_wait(self, seconds):
+        """Record the time waited for the rate limit"""
+
+        with self._lock:
+            self.rate_limit_wait_seconds += seconds
+
+        self.__notify(RATE_LIMIT_WAIT, {'seconds': seconds})
+
+    def parse(self, seconds, size):
+        """Record the parsing of a JSON document of `size` characters"""
+
+        with self._lock:
+            self.parse_seconds += seconds
+            self.parsed_bytes += size
+
+        self.__notify(PARSE, {'seconds': seconds, 'bytes': size})
+
+    def event(self, user):
+        """Record an event yielded for `user`"""
+
+        with self._lock:
+            self.events[user] += 1
+
+        self.__notify(EVENT, {'user': user})
+
+    def as_dict(self):
+        """Return a snapshot of the metrics"""
+
+        with self._lock:
+            requests = collections.defaultdict(dict)
+            for (kind, status), count in self.requests.items():
+                requests[kind][str(status)] = count
+
+            caches = {}
+            for name in set(self.cache_hits) | set(self.cache_misses):
+                caches[name] = {'hits': self.cache_hits[name],
+                                'misses': self.cache_misses[name]}
+
+            return {
+                'requests': {
+                    kind: {
+                        'status': statuses,
+                        'count': sum(statuses.values()),
+                        'seconds': self.request_seconds[kind],
+                        'bytes': self.response_bytes[kind]
+                    }
+                    for kind, statuses in requests.items()
+                },
+                'caches': caches,
+                'rate_limit_wait_seconds': self.rate_limit_wait_seconds,
+                'parse': {'seconds': self.parse_seconds, 'bytes': self.parsed_bytes},
+                'events': dict(self.events)
+            }
+
+    def to_json(self):
+        return codec.dumps(self.as_dict(), sort_keys=True, indent=4)
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format"""
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for suffix, labels, value in samples:
+                lines.append('%s%s%s %s' % (name, suffix, self.__labels(labels), value))
+
+        with self._lock:
+            metric('ghubby_requests_total', 'counter',
+                   "Requests sent to the GitHub API",
+                   [('', {'kind': kind, 'status': status}, count)
+                    for (kind, status), count in sorted(self.requests.items(),
+                                                        key=lambda item: str(item[0]))])
+
+            samples = []
+            for kind in sorted(self.request_buckets):
+                counts = self.request_buckets[kind]
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', {'kind': kind, 'le': repr(bound)}, count))
+                total = sum(count for (k, _), count in self.requests.items() if k == kind)
+                samples.append(('_bucket', {'kind': kind, 'le': '+Inf'}, total))
+                samples.append(('_sum', {'kind': kind}, self.request_seconds[kind]))
+                samples.append(('_count', {'kind': kind}, total))
+            metric('ghubby_request_duration_seconds', 'histogram',
+                   "Duration of the requests to the GitHub API", samples)
+
+            metric('ghubby_response_bytes_total', 'counter',
+                   "Bytes received from the GitHub API",
+                   [('', {'kind': kind}, size)
+                    for kind, size in sorted(self.response_bytes.items())])
+
+            samples = []
+            for name in sorted(set(self.cache_hits) | set(self.cache_misses)):
+                samples.append(('', {'cache': name, 'result': 'hit'}, self.cache_hits[name]))
+                samples.append(('', {'cache': name, 'result': 'miss'}, self.cache_misses[name]))
+            metric('ghubby_cache_lookups_total', 'counter',
+                   "Lookups in the caches", samples)
+
+            metric('ghubby_rate_limit_wait_seconds_total', 'counter',
+                   "Time spent waiting for the rate limit",
+                   [('', {}, self.rate_limit_wait_seconds)])
+            metric('ghubby_parse_seconds_total', 'counter',
+                   "Time spent parsing JSON documents",
+                   [('', {}, self.parse_seconds)])
+            metric('ghubby_parse_bytes_total', 'counter',
+                   "Characters of the JSON documents parsed",
+                   [('', {}, self.parsed_bytes)])
+            metric('ghubby_events_total', 'counter',
+                   "Events yielded by user",
+                   [('', {'user': user}, count)
+                    for user, count in sorted(self.events.items())])
+
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, fmt=JSON_FORMAT):
+        """Write the metrics to a file in the given format"""
+
+        if fmt not in self.FORMATS:
+            raise ValueError("Unknown metrics format: %s" % fmt)
+
+        content = self.to_prometheus() if fmt == PROMETHEUS_FORMAT else self.to_json()
+
+        with open(path, 'w') as f:
+            f.write(content)
+
+    @staticmethod
+    def __labels(labels):
+        if not labels:
+            return ''
+
+        pairs = ['%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                 for key, value in labels.items()]
+        return '{' + ','.join(pairs) + '}'
+
+    def __notify(self, name, data):
+        for hook in self._hooks:
+            try:
+                hook(name, data)
+            except Exception as error:
+                logger.warning("Metrics hook %r failed: %s", hook, error)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import gzip
+import io
+import shutil
+import sys
+
+from . import codec
+
+
+JSON_FORMAT = 'json'
+NDJSON_FORMAT = 'ndjson'
+
+GZIP_COMPRESSION = 'gzip'
+ZSTD_COMPRESSION = 'zstd'
+
+
+class EventWriter:
+    """Write events to a file or to the standard output.
+
+    Events are written as pretty-printed JSON documents (`json`
+    format) or as compact JSON documents, one per line (`ndjson`
+    format). The output is buffered and it can be compressed with
+    gzip or, when the package `zstandard` is installed, with zstd.
+
+    :param path: path of the output file; when None or `-` the
+        events are written to the standard output
+    :param fmt: format of the events; `json` or `ndjson`
+    :param compression: compression of the output; None, `gzip`
+        or `zstd`
+    :param buffer_size: size in bytes of the write buffer
+    """
+    FORMATS = [JSON_FORMAT, NDJSON_FORMAT]
+    COMPRESSIONS = [GZIP_COMPRESSION, ZSTD_COMPRESSION]
+    DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, path=None, fmt=JSON_FORMAT, compression=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        if fmt not in self.FORMATS:
+            raise ValueError("Unknown format %s" % fmt)
+        if compression and compression not in self.COMPRESSIONS:
+            raise ValueError("Unknown compression %s" % compression)
+
+        self.path = path if path != '-' else None
+        self.fmt = fmt
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.count = 0
+
+        self._file = None
+        self._compressed = None
+        self._stream = self.__open_stream()
+
+        if fmt == NDJSON_FORMAT:
+            self._encode = self.__encode_ndjson
+        else:
+            self._encode = self.__encode_json
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, event):
+        """Write an event.
+
+        :param event: event to write
+        """
+        self._stream.write(self._encode(event))
+        self.count += 1
+
+    def copy(self, path, count):
+        """Copy events already encoded in the format of the writer.
+
+        :param path: path of the file with the encoded events
+        :param count: number of events in the file
+        """
+        with open(path, 'rb') as f:
+            shutil.copyfileobj(f, self._stream, self.buffer_size)
+
+        self.count += count
+
+    def flush(self):
+        """Write the buffered events to the output. Compressed
+        outputs are flushed so the events written can already be
+        decompressed."""
+
+        self._stream.flush()
+
+        if self._compressed is not None:
+            self._compressed.flush()
+
+            raw = self._file if self._file is not None else sys.stdout.buffer
+            raw.flush()
+
+    def close(self):
+        """Flush the buffered data and close the output. The
+        standard output is flushed but not closed."""
+
+        if self._stream is None:
+            return
+
+        if self._stream is sys.stdout.buffer:
+            self._stream.flush()
+        else:
+            self._stream.close()
+
+        if self._file is not None:
+            self._file.close()
+
+        self._stream = None
+        self._file = None
+
+    def __open_stream(self):
+        if not self.compression:
+            if self.path is None:
+                return sys.stdout.buffer
+            return open(self.path, 'wb', buffering=self.buffer_size)
+
+        if self.compression == ZSTD_COMPRESSION:
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("zstd compression requires the package zstandard")
+
+        if self.path is None:
+            raw = sys.stdout.buffer
+        else:
+            raw = self._file = open(self.path, 'wb')
+
+        if self.compression == GZIP_COMPRESSION:
+            compressed = gzip.GzipFile(fileobj=raw, mode='wb')
+        else:
+            compressed = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+
+        self._compressed = compressed
+
+        return io.BufferedWriter(compressed, buffer_size=self.buffer_size)
+
+    @staticmethod
+    def __encode_json(event):
+        return codec.dumpb(event, sort_keys=True, indent=4) + b'\n'
+
+    @staticmethod
+    def __encode_ndjson(event):
+        return codec.dumpb(event) + b'\n'
+
+
+class NormalizedWriter:
+    """Write events and their repositories to separate outputs.
+
+    The `repo_data` document of the events is replaced by the
+    attribute `repo_data_id`, which refers to the attribute `id` of
+    the repository. Each repository is written once to the repos
+    output.
+
+    :param events_writer: `EventWriter` for the events
+    :param repos_writer: `EventWriter` for the repositories
+    """
+    def __init__(self, events_writer, repos_writer):
+        self.events_writer = events_writer
+        self.repos_writer = repos_writer
+        self._repo_ids = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def count(self):
+        """Number of events written"""
+
+        return self.events_writer.count
+
+    def write(self, event):
+        """Write an event, and its repository if it was not
+        written before.
+
+        :param event: event to write
+        """
+        repo = event.get('repo_data', None)
+
+        if repo is not None:
+            repo_id = repo['id']
+            event = {key: value for key, value in event.items() if key != 'repo_data'}
+            event['repo_data_id'] = repo_id
+
+            if repo_id not in self._repo_ids:
+                self._repo_ids.add(repo_id)
+                self.repos_writer.write(repo)
+
+        self.events_writer.write(event)
+
+    def flush(self):
+        """Flush both outputs"""
+
+        self.events_writer.flush()
+        self.repos_writer.flush()
+
+    def close(self):
+        """Close both outputs"""
+
+        self.events_writer.close()
+        self.repos_writer.close()
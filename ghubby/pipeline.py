@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import logging
+import queue
+import threading
+import time
+
+from .checkpoint import DeferredCheckpoints
+from .ghubby import RESOLVE_EAGER, RESOLVE_LAZY
+from .utils import DEFAULT_DATETIME
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    """Step of a `Pipeline`, run in its own thread.
+
+    The stage calls `func` with each item read from its input queue
+    and puts the result in its output queue. When `batch_size` is
+    greater than 1, `func` is called with the list of items already
+    waiting in the queue, up to `batch_size`, and it must return a
+    list of items.
+
+    Besides the number of items, the stage keeps the seconds spent
+    running `func` (`busy_seconds`), waiting for input
+    (`idle_seconds`) and waiting for room in the output queue
+    (`blocked_seconds`).
+
+    :param name: name of the stage
+    :param func: function applied to the items
+    :param batch_size: maximum number of items passed at once to `func`
+    """
+    def __init__(self, name, func, batch_size=1):
+        if batch_size < 1:
+            raise ValueError("Batch size must be greater than 0")
+
+        self.name = name
+        self.func = func
+        self.batch_size = batch_size
+
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.blocked_seconds = 0.0
+
+    def stats(self):
+        return {
+            'items': self.items,
+            'busy_seconds': self.busy_seconds,
+            'idle_seconds': self.idle_seconds,
+            'blocked_seconds': self.blocked_seconds
+        }
+
+
+class Pipeline:
+    """Run the steps of a process concurrently, connected by
+    bounded queues.
+
+    The items of `source` are read in a thread of their own and
+    passed through the stages, each of them running in another
+    thread; the last stage is the sink, whose results are dropped.
+    Since queues hold at most `queue_size` items, memory does not
+    grow with the number of items: a slow stage makes the previous
+    ones wait once its queue is full, while they keep working until
+    then.
+
+    When a stage fails, the rest are stopped and `run` raises the
+    error. The progress of the stages and the depth of the queues
+    can be read with `stats` while the pipeline runs.
+
+    :param source: iterable with the items; when it is a generator,
+        it is closed if the pipeline stops early
+    :param stages: list of `Stage`
+    :param queue_size: maximum number of items in each queue
+    :param source_name: name of the stage reading the source
+    """
+    DEFAULT_QUEUE_SIZE = 1000
+    POLL_TIMEOUT = 0.1
+
+    def __init__(self, source, stages, queue_size=DEFAULT_QUEUE_SIZE, source_name='source'):
+        if not stages:
+            raise ValueError("At least one stage is required")
+        if queue_size < 1:
+            raise ValueError("Queue size must be greater than 0")
+
+        self.source = source
+        self.stages = [Stage(source_name, None)] + list(stages)
+        self.queue_size = queue_size
+
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._max_depths = [0] * len(stages)
+        self._stop = threading.Event()
+        self._error = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Run the pipeline until all the items are processed.
+
+        :raises Exception: the first error raised by a stage
+        """
+        threads = [threading.Thread(target=self.__run_source, name=self.stages[0].name, daemon=True)]
+        threads += [threading.Thread(target=self.__run_stage, args=(i,), name=stage.name, daemon=True)
+                    for i, stage in enumerate(self.stages[1:], start=1)]
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(self.POLL_TIMEOUT)
+        except BaseException:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            raise
+
+        if self._error is not None:
+            raise self._error
+
+        logger.debug("Pipeline done: %s", self.stats())
+
+    def stats(self):
+        """Return the counters of the stages and the depth of the
+        queues; `max_depth` is the largest depth seen"""
+
+        queues = []
+        for i, q in enumerate(self._queues):
+            queues.append({
+                'from': self.stages[i].name,
+                'to': self.stages[i + 1].name,
+                'depth': q.qsize(),
+                'max_depth': self._max_depths[i],
+                'size': self.queue_size
+            })
+
+        return {
+            'stages': {stage.name: stage.stats() for stage in self.stages},
+            'queues': queues
+        }
+
+    def __run_source(self):
+        stage = self.stages[0]
+        items = iter(self.source)
+
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(items, _DONE)
+                stage.busy_seconds += time.perf_counter() - start
+
+                if item is _DONE:
+                    break
+
+                stage.items += 1
+                self.__put(0, item)
+        except BaseException as error:
+            self.__fail(stage, error)
+        finally:
+            if self._stop.is_set() and hasattr(items, 'close'):
+                items.close()
+            self.__put(0, _DONE)
+
+    def __run_stage(self, index):
+        stage = self.stages[index]
+        is_sink = index == len(self.stages) - 1
+
+        try:
+            done = False
+            while not done:
+                batch, done = self.__get(index - 1)
+
+                if not batch:
+                    continue
+
+                start = time.perf_counter()
+                if stage.batch_size > 1:
+                    results = stage.func(batch)
+                else:
+                    results = [stage.func(batch[0])]
+                stage.busy_seconds += time.perf_counter() - start
+                stage.items += len(batch)
+
+                if not is_sink:
+                    for item in results:
+                        self.__put(index, item)
+        except BaseException as error:
+            self.__fail(stage, error)
+        finally:
+            if not is_sink:
+                self.__put(index, _DONE)
+
+    def __get(self, index):
+        """Read the items of the next batch of a stage; it returns
+        the items and whether the input is over"""
+
+        stage = self.stages[index + 1]
+        q = self._queues[index]
+        batch = []
+
+        start = time.perf_counter()
+        while True:
+            if self._stop.is_set():
+                return batch, True
+            try:
+                item = q.get(timeout=self.POLL_TIMEOUT)
+                break
+            except queue.Empty:
+                continue
+        stage.idle_seconds += time.perf_counter() - start
+
+        while item is not _DONE:
+            batch.append(item)
+
+            if len(batch) == stage.batch_size:
+                return batch, False
+            try:
+                item = q.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+        return batch, True
+
+    def __put(self, index, item):
+        stage = self.stages[index]
+        q = self._queues[index]
+
+        start = time.perf_counter()
+        while True:
+            if self._stop.is_set() and item is not _DONE:
+                break
+            try:
+                q.put(item, timeout=self.POLL_TIMEOUT)
+                break
+            except queue.Full:
+                if item is _DONE and self._stop.is_set():
+                    break
+        stage.blocked_seconds += time.perf_counter() - start
+
+        depth = q.qsize()
+        if depth > self._max_depths[index]:
+            self._max_depths[index] = depth
+
+    def __fail(self, stage, error):
+        with self._lock:
+            if self._error is None:
+                logger.error("Pipeline stage %s failed: %s", stage.name, error)
+                self._error = error
+            self._stop.set()
+
+
+class EventPipeline(Pipeline):
+    """Pipeline that fetches the events of a user, enriches them with
+    their repository data and passes them to `sink`.
+
+    Events are fetched with lazy repos, and the repos of the events
+    waiting in the queue are resolved at once by the enrich stage
+    (see `Ghubby.resolve_repos`), so a slow sink does not stop the
+    fetch of the events nor the resolution of the repos. When the
+    repos are not resolved, there is no enrich stage.
+
+    The checkpoint of the user is saved once all the events were
+    passed to `sink`, so events are not skipped by later runs when
+    the pipeline fails.
+
+    :param ghubby: `Ghubby` instance of the user
+    :param sink: function called with each event (e.g., the method
+        `write` of an `EventWriter`)
+    :param from_date: obtain events since this date
+    :param queue_size: maximum number of events in each queue
+    :param batch_size: maximum number of events enriched at once
+    :param kwargs: other parameters of `Ghubby.fetch`
+    """
+    DEFAULT_BATCH_SIZE = 100
+
+    def __init__(self, ghubby, sink, from_date=DEFAULT_DATETIME,
+                 queue_size=Pipeline.DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        stages = []
+
+        if kwargs.get('resolve_repos', RESOLVE_EAGER) == RESOLVE_EAGER:
+            kwargs['resolve_repos'] = RESOLVE_LAZY
+            stages.append(Stage('enrich', ghubby.resolve_repos, batch_size=batch_size))
+
+        stages.append(Stage('write', sink))
+
+        super().__init__(None, stages, queue_size=queue_size, source_name='fetch')
+
+        self.ghubby = ghubby
+        self.from_date = from_date
+        self.kwargs = kwargs
+
+    def run(self):
+        store = self.ghubby.checkpoints
+        checkpoints = DeferredCheckpoints(store) if store is not None else None
+
+        self.ghubby.checkpoints = checkpoints
+        self.source = self.ghubby.fetch(from_date=self.from_date, **self.kwargs)
+
+        try:
+            super().run()
+        finally:
+            self.ghubby.checkpoints = store
+
+        if checkpoints is not None:
+            checkpoints.commit()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class EventsPoll:
+    """State of the polling of an events feed.
+
+    The first page of the feed is requested with the `ETag` of the
+    previous poll in the header `If-None-Match`, so when there are
+    no new events the API replies `304 Not Modified`, which does not
+    count against the rate limit. Polls are spaced by the seconds
+    given by the header `X-Poll-Interval` of the API, or by
+    `min_interval` when it is longer.
+
+    :param min_interval: minimum seconds between polls
+    """
+    DEFAULT_INTERVAL = 60
+
+    def __init__(self, min_interval=None):
+        self.min_interval = min_interval or 0
+        self.interval = self.DEFAULT_INTERVAL
+        self.etag = None
+        self.modified = True
+        self.polls = 0
+
+        self._last_poll = None
+
+    @property
+    def headers(self):
+        """Headers of the conditional request of the next poll"""
+
+        if self.etag is None:
+            return None
+
+        return {'If-None-Match': self.etag}
+
+    def update(self, response):
+        """Update the state from the response to the first page"""
+
+        self.polls += 1
+        self._last_poll = time.monotonic()
+
+        # a 304 to the ETag sent by the HTTP cache, not by the poll,
+        # comes with the cached body of the page
+        self.modified = response.status_code != 304 or self.etag is None
+
+        if 'X-Poll-Interval' in response.headers:
+            self.interval = int(response.headers['X-Poll-Interval'])
+        if self.modified:
+            self.etag = response.headers.get('ETag', None)
+
+    def wait(self):
+        """Sleep until the next poll is due.
+
+        :returns: the seconds slept
+        """
+        if self._last_poll is None:
+            return 0
+
+        interval = max(self.interval, self.min_interval)
+        seconds = self._last_poll + interval - time.monotonic()
+
+        if seconds <= 0:
+            return 0
+
+        logger.debug("Next poll in %.1f secs", seconds)
+        time.sleep(seconds)
+
+        return seconds
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+REPO_DATA = 'repo_data'
+
+
+def parse_fields(fields):
+    """Parse a list of dotted field paths into a tree.
+
+    Each node of the tree maps a key to its subtree, or to None
+    when the whole value of the key is selected. For instance,
+    `['type', 'repo.name', 'repo']` is parsed as `{'type': None,
+    'repo': None}`, while `['payload.action', 'payload.number']`
+    is parsed as `{'payload': {'action': None, 'number': None}}`.
+
+    :param fields: list of dotted field paths
+
+    :returns: a tree of fields
+    """
+    tree = {}
+
+    for field in fields:
+        keys = field.split('.')
+        node = tree
+
+        for key in keys[:-1]:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+
+    return tree
+
+
+def project(obj, tree):
+    """Keep only the fields of an object selected in a tree.
+
+    Lists are projected item by item, and fields that are not
+    found in the object are ignored. The object is not modified.
+
+    :param obj: object to project
+    :param tree: tree of fields, as returned by `parse_fields`
+
+    :returns: the projected object
+    """
+    if isinstance(obj, list):
+        return [project(item, tree) for item in obj]
+
+    if not isinstance(obj, dict):
+        return obj
+
+    projected = {}
+
+    for key, subtree in tree.items():
+        if key not in obj:
+            continue
+
+        value = obj[key]
+        projected[key] = value if subtree is None else project(value, subtree)
+
+    return projected
+
+
+def repo_fields(fields):
+    """Extract the fields of `repo_data` from the fields of an event.
+
+    :param fields: list of dotted field paths of an event
+
+    :returns: the list of fields of the repository, None when the
+        whole repository is selected or an empty list when the
+        repository is not selected
+    """
+    prefix = REPO_DATA + '.'
+
+    if REPO_DATA in fields:
+        return None
+
+    return [field[len(prefix):] for field in fields if field.startswith(prefix)]
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import email.utils
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+LOW_PRIORITY = 2
+
+PRIMARY_RATE_LIMIT = 'primary'
+SECONDARY_RATE_LIMIT = 'secondary'
+
+
+def retry_after(response):
+    """Seconds to wait given by the `Retry-After` header of a
+    response, either as a number of seconds or as a date.
+
+    :returns: the seconds, or None when the header is missing
+        or not valid
+    """
+    value = response.headers.get('Retry-After', None)
+
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(date.timestamp() - time.time(), 0)
+
+
+def rate_limit_kind(response):
+    """Tell whether a response was rejected by a rate limit.
+
+    The primary rate limit is hit when the token has no remaining
+    requests; the secondary (abuse) one is told by the `Retry-After`
+    header or the error message.
+
+    :returns: `primary`, `secondary` or None
+    """
+    if response.status_code not in (403, 429):
+        return None
+
+    if 'Retry-After' in response.headers:
+        return SECONDARY_RATE_LIMIT
+
+    if response.headers.get('X-RateLimit-Remaining', None) == '0':
+        return PRIMARY_RATE_LIMIT
+
+    message = response.text.lower()
+    if 'abuse' in message or 'secondary rate limit' in message:
+        return SECONDARY_RATE_LIMIT
+
+    return None
+
+
+class RateLimitScheduler:
+    """Scheduler of the requests sent with the tokens of a `TokenPool`.
+
+    Instead of spending the rate limit as fast as possible and then
+    sleeping until it is reset, requests are paced to spread the
+    remaining requests of the tokens evenly over the time left to
+    their reset (see `TokenPool.rate`). Pacing starts only once the
+    remaining requests of the tokens fall below `pace_below`, so
+    runs that need a small part of the rate limit are sent at full
+    speed; the price is that only the last `pace_below` requests
+    are spread, while the rest are spent as fast as they are sent.
+    Up to `burst` requests can be sent without waiting. While the
+    rate limit is unknown, requests are not paced.
+
+    When the API rejects a request with the secondary (abuse) rate
+    limit, `backoff` holds all the requests for the seconds given by
+    the `Retry-After` header or, when it is missing, for a backoff
+    that doubles with each consecutive rejection.
+
+    Requests waiting for their turn are served by priority, so the
+    requests of interactive lookups (`HIGH_PRIORITY`) go ahead of
+    those of bulk crawls (`LOW_PRIORITY`). Requests with the same
+    priority are served in arrival order. The scheduler is thread
+    safe; clients sharing a `TokenPool` should share its scheduler.
+
+    :param tokens: `TokenPool` whose requests are scheduled
+    :param burst: maximum number of requests sent without waiting
+    :param pace: when False, requests are not paced and only
+        backoffs are honored
+    :param pace_below: remaining requests of the tokens under which
+        requests are paced; when None, they are always paced
+    :param backoff_factor: seconds of the first backoff when no
+        `Retry-After` header is given
+    :param max_backoff: maximum seconds of a backoff
+    """
+    DEFAULT_BURST = 10
+    DEFAULT_PACE_BELOW = 1000
+    DEFAULT_BACKOFF_FACTOR = 60
+    DEFAULT_MAX_BACKOFF = 900
+
+    def __init__(self, tokens, burst=DEFAULT_BURST, pace=True,
+                 pace_below=DEFAULT_PACE_BELOW,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 max_backoff=DEFAULT_MAX_BACKOFF):
+        if burst < 1:
+            raise ValueError("Burst must be greater than 0")
+
+        self.tokens = tokens
+        self.burst = burst
+        self.pace = pace
+        self.pace_below = pace_below
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.backoffs = 0
+
+        self._allowance = burst
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority=NORMAL_PRIORITY):
+        """Wait until a request with the given priority can be sent.
+
+        :param priority: priority of the request; lower values go first
+
+        :returns: the seconds waited; 0 when the request was not held
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._counter))
+        waited = False
+
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._blocked_until - now
+
+                    if self._waiting[0] != entry:
+                        waited = True
+                        self._cond.wait(delay if delay > 0 else None)
+                        continue
+
+                    delay = max(delay, self.__pacing_delay(now))
+                    if delay <= 0:
+                        break
+
+                    waited = True
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+            self._allowance -= 1
+
+        return time.monotonic() - start if waited else 0
+
+    def backoff(self, seconds=None):
+        """Hold the requests after a rejection by the rate limit.
+
+        :param seconds: seconds to wait, e.g., those of the
+            `Retry-After` header; when None, the backoff doubles
+            with each consecutive call
+
+        :returns: the seconds requests are held
+        """
+        with self._cond:
+            if seconds is None:
+                seconds = min(self.backoff_factor * 2 ** self.backoffs, self.max_backoff)
+            self.backoffs += 1
+
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+        logger.warning("Secondary rate limit reached. Waiting %.1f secs.", seconds)
+
+        return seconds
+
+    def succeeded(self):
+        """Reset the backoff after a request is accepted"""
+
+        with self._cond:
+            self.backoffs = 0
+
+    def __pacing_delay(self, now):
+        """Seconds to wait until the pace allows another request"""
+
+        rate = self.tokens.rate() if self.__is_paced() else None
+
+        if not rate:
+            self._allowance = self.burst
+        else:
+            self._allowance = min(self._allowance + (now - self._last) * rate, self.burst)
+        self._last = now
+
+        if self._allowance >= 1:
+            return 0
+
+        return (1 - self._allowance) / rate
+
+    def __is_paced(self):
+        """Whether the remaining requests of the tokens are low
+        enough to pace the requests"""
+
+        if not self.pace:
+            return False
+        if self.pace_below is None:
+            return True
+
+        remaining = self.tokens.remaining()
+
+        return remaining is not None and remaining < self.pace_below
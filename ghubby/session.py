@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import requests
+import urllib3
+from perceval.client import HttpClient
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+    """HTTP adapter that applies a default timeout to the requests
+    sent without one.
+
+    :param timeout: seconds to wait for the server; a number or a
+        tuple with the connect and read timeouts
+    """
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout', None) is None:
+            kwargs['timeout'] = self.timeout
+
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                   max_retries=HttpClient.MAX_RETRIES,
+                   backoff_factor=HttpClient.DEFAULT_SLEEP_TIME):
+    """Create an HTTP session to be shared among several clients.
+
+    Connections are kept alive and reused by all the clients, up
+    to `pool_size` connections per host. Requests are retried as
+    the perceval clients do. The session has no authorization
+    header; clients send the token with each request.
+
+    :param pool_size: maximum number of connections kept per host;
+        it should not be lower than the number of threads sending
+        requests
+    :param timeout: seconds to wait for the server; a number or a
+        tuple with the connect and read timeouts
+    :param max_retries: maximum number of retries of a request
+    :param backoff_factor: factor of the exponential backoff
+        between retries
+
+    :returns: a `requests.Session`
+    """
+    retries = urllib3.util.Retry(total=max_retries,
+                                 connect=HttpClient.MAX_RETRIES_ON_CONNECT,
+                                 read=HttpClient.MAX_RETRIES_ON_READ,
+                                 redirect=HttpClient.MAX_RETRIES_ON_REDIRECT,
+                                 status=HttpClient.MAX_RETRIES_ON_STATUS,
+                                 status_forcelist=HttpClient.DEFAULT_STATUS_FORCE_LIST,
+                                 backoff_factor=backoff_factor,
+                                 raise_on_redirect=HttpClient.DEFAULT_RAISE_ON_REDIRECT,
+                                 raise_on_status=HttpClient.DEFAULT_RAISE_ON_STATUS,
+                                 respect_retry_after_header=HttpClient.DEFAULT_RESPECT_RETRY_AFTER_HEADER,
+                                 **{_retry_methods_arg(): HttpClient.DEFAULT_METHOD_WHITELIST})
+
+    adapter = TimeoutHTTPAdapter(timeout=timeout, max_retries=retries,
+                                 pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.headers.update(HttpClient.DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def _retry_methods_arg():
+    """Name of the argument of `Retry` with the methods to retry,
+    renamed in urllib3 1.26"""
+
+    if 'allowed_methods' in urllib3.util.Retry.__init__.__code__.co_varnames:
+        return 'allowed_methods'
+    return 'method_whitelist'
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import logging
+import threading
+import time
+
+from perceval.errors import RateLimitError
+
+from .utils import MIN_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class TokenPool:
+    """Pool of GitHub tokens that picks the token with the most
+    remaining requests.
+
+    The rate limit of each token is learned from the headers
+    `X-RateLimit-Remaining` and `X-RateLimit-Reset` of the responses;
+    tokens not used yet are preferred, since their rate limit is
+    unknown. A token is exhausted when its remaining requests are
+    equal to or lower than `min_rate_to_sleep` and its rate limit is
+    not reset yet. Only when all the tokens are exhausted, the pool
+    sleeps until the first token is reset, or raises a
+    `RateLimitError` if `sleep_for_rate` is not set.
+
+    :param tokens: list of GitHub auth tokens; None stands for
+        unauthenticated requests
+    :param min_rate_to_sleep: minimum rate needed to consider a
+        token exhausted
+    :param sleep_for_rate: sleep until a token is reset when all of
+        them are exhausted
+    """
+    RATE_LIMIT_HEADER = "X-RateLimit-Remaining"
+    RATE_LIMIT_RESET_HEADER = "X-RateLimit-Reset"
+    RATE_LIMIT_RESOURCE_HEADER = "X-RateLimit-Resource"
+    CORE_RESOURCE = 'core'
+
+    def __init__(self, tokens, min_rate_to_sleep=MIN_RATE_LIMIT, sleep_for_rate=True):
+        tokens = list(dict.fromkeys(tokens))
+
+        if not tokens:
+            raise ValueError("At least one token is required")
+
+        self.tokens = tokens
+        self.min_rate_to_sleep = min_rate_to_sleep
+        self.sleep_for_rate = sleep_for_rate
+
+        self._remaining = {token: None for token in tokens}
+        self._reset_ts = {token: None for token in tokens}
+        self._requests = {token: 0 for token in tokens}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def select(self):
+        """Select the token with the most remaining requests.
+
+        When all the tokens are exhausted, the method sleeps until
+        the first of them is reset.
+
+        :returns: a token
+
+        :raises RateLimitError: when all the tokens are exhausted
+            and `sleep_for_rate` is not set
+        """
+        token, _ = self.take()
+
+        return token
+
+    def take(self):
+        """Select a token, like `select` does, returning also the
+        seconds slept until a token was reset.
+
+        :returns: a tuple with the token and the seconds slept
+
+        :raises RateLimitError: when all the tokens are exhausted
+            and `sleep_for_rate` is not set
+        """
+        slept = 0
+
+        while True:
+            with self._lock:
+                now = time.time()
+                token = max(self.tokens, key=lambda t: self.__available(t, now))
+
+                if not self.__is_exhausted(token, now):
+                    self._requests[token] += 1
+                    return token, slept
+
+                seconds_to_reset = min(self._reset_ts[t] for t in self.tokens) - now
+                seconds_to_reset = max(int(seconds_to_reset) + 1, 0)
+
+            cause = "Rate limit exhausted for all the tokens."
+            if not self.sleep_for_rate:
+                raise RateLimitError(cause=cause, seconds_to_reset=seconds_to_reset)
+
+            logger.info("%s Waiting %i secs for rate limit reset.", cause, seconds_to_reset)
+            time.sleep(seconds_to_reset)
+            slept += seconds_to_reset
+
+    def update(self, token, response):
+        """Update the rate limit of a token from the response headers.
+
+        Responses of other resources than the REST API (e.g., the
+        points of the GraphQL API) are ignored, since their headers
+        refer to a budget of their own.
+
+        :param token: token used to send the request
+        :param response: the response object
+        """
+        if not self.is_core(response):
+            return
+
+        with self._lock:
+            if self.RATE_LIMIT_HEADER in response.headers:
+                self._remaining[token] = int(response.headers[self.RATE_LIMIT_HEADER])
+            if self.RATE_LIMIT_RESET_HEADER in response.headers:
+                self._reset_ts[token] = int(response.headers[self.RATE_LIMIT_RESET_HEADER])
+
+    def rate(self):
+        """Requests per second that spend the remaining requests of
+        the tokens evenly until they are reset, keeping
+        `min_rate_to_sleep` requests of each one.
+
+        :returns: the rate, or None when the rate limit of a token
+            is unknown or already reset
+        """
+        with self._lock:
+            now = time.time()
+            rate = 0.0
+
+            for token in self.tokens:
+                if self.__available(token, now) == float('inf'):
+                    return None
+
+                remaining = max(self._remaining[token] - self.min_rate_to_sleep, 0)
+                rate += remaining / (self._reset_ts[token] - now)
+
+            return rate
+
+    def remaining(self):
+        """Remaining requests of the tokens, keeping
+        `min_rate_to_sleep` requests of each one.
+
+        :returns: the remaining requests, or None when the rate
+            limit of a token is unknown or already reset
+        """
+        with self._lock:
+            now = time.time()
+            remaining = 0
+
+            for token in self.tokens:
+                if self.__available(token, now) == float('inf'):
+                    return None
+
+                remaining += max(self._remaining[token] - self.min_rate_to_sleep, 0)
+
+            return remaining
+
+    def usage(self):
+        """Return the number of requests, remaining requests and
+        reset time of each token. Tokens are masked, showing only
+        their last four characters."""
+
+        with self._lock:
+            return {
+                self.mask(token): {
+                    'requests': self._requests[token],
+                    'remaining': self._remaining[token],
+                    'reset': self._reset_ts[token]
+                }
+                for token in self.tokens
+            }
+
+    @classmethod
+    def is_core(cls, response):
+        """Whether the rate limit headers of a response refer to the
+        REST API; responses without `X-RateLimit-Resource` do"""
+
+        resource = response.headers.get(cls.RATE_LIMIT_RESOURCE_HEADER, cls.CORE_RESOURCE)
+
+        return resource == cls.CORE_RESOURCE
+
+    @staticmethod
+    def mask(token):
+        """Mask a token to be shown in logs and reports"""
+
+        if token is None:
+            return 'anonymous'
+
+        return '*' * max(len(token) - 4, 0) + token[-4:]
+
+    def __available(self, token, now):
+        """Remaining requests of a token; unknown or reset ones come first"""
+
+        remaining = self._remaining[token]
+        reset_ts = self._reset_ts[token]
+
+        if remaining is None or reset_ts is None or reset_ts <= now:
+            return float('inf')
+
+        return remaining
+
+    def __is_exhausted(self, token, now):
+        return self.__available(token, now) <= self.min_rate_to_sleep
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+"""Helpers replacing those of grimoirelab-toolkit and perceval that
+ghubby needs at import time or in hot paths.
+
+Importing the grimoirelab namespace package loads `pkg_resources`,
+and perceval's GitHub backend loads the whole backend machinery,
+which make up most of the start up time of ghubby. The toolkit is
+only imported when a date is not in ISO 8601 format.
+"""
+
+import datetime
+
+DEFAULT_DATETIME = datetime.datetime(1970, 1, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+GITHUB_API_URL = "https://api.github.com"
+MIN_RATE_LIMIT = 10
+
+def urijoin(*args):
+    """Join the given arguments into a URI, stripping the leading
+    and trailing slashes of each one"""
+
+    return '/'.join(str(arg).strip('/') for arg in args)
+
+
+def str_to_datetime(ts):
+    """Convert a string to a timezone aware datetime.
+
+    Dates in the format of the GitHub API (e.g., `2018-04-13T16:52:56Z`)
+    and other ISO 8601 dates (e.g., `2018-04-13`) are parsed directly;
+    any other string is parsed by `grimoirelab.toolkit.datetime.str_to_datetime`.
+    UTC is assumed when no timezone is given.
+
+    :raises InvalidDateError: when the string is not a valid date
+    """
+    if isinstance(ts, str):
+        try:
+            if ts.endswith('Z'):
+                dt = datetime.datetime.fromisoformat(ts[:-1]).replace(tzinfo=datetime.timezone.utc)
+            else:
+                dt = datetime.datetime.fromisoformat(ts)
+        except ValueError:
+            pass
+        else:
+            if not dt.tzinfo:
+                dt = dt.replace(tzinfo=datetime.timezone.utc)
+            return dt
+
+    from grimoirelab.toolkit.datetime import str_to_datetime as toolkit_str_to_datetime
+
+    return toolkit_str_to_datetime(ts)
+
+
+def datetime_to_utc(ts):
+    """Convert a datetime to UTC; naive datetimes are assumed to be in UTC"""
+
+    if not isinstance(ts, datetime.datetime):
+        from grimoirelab.toolkit.datetime import InvalidDateError
+        raise InvalidDateError(date='<%s> object' % type(ts))
+
+    if not ts.tzinfo:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+
+    return ts.astimezone(datetime.timezone.utc)
@@ -51,4 +51,13 @@ setup(name="ghubby",
       install_requires=[
           'perceval>=0.10.0'
       ],
+      extras_require={
+          'zstd': ['zstandard'],
+          'fast-json': ['orjson']
+      },
+      entry_points={
+          'console_scripts': [
+              'ghubby=ghubby.ghubby:main'
+          ]
+      },
       zip_safe=False)
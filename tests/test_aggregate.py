@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import httpretty
+
+from ghubby.aggregate import ActivityAggregator
+from ghubby.ghubby import Ghubby
+
+from .test_ghubby import setup_http_server
+
+
+def event(event_type, repo, created_at):
+    return {
+        'type': event_type,
+        'repo': {'name': repo},
+        'created_at': created_at
+    }
+
+
+EVENTS = [
+    event('PushEvent', 'chaoss/grimoirelab', '2018-04-18T10:00:00Z'),
+    event('PushEvent', 'chaoss/grimoirelab', '2018-04-18T11:00:00Z'),
+    event('CreateEvent', 'valeriocos/ghubby', '2018-04-19T10:00:00Z')
+]
+
+
+class TestActivityAggregator(unittest.TestCase):
+    """ActivityAggregator tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_add(self):
+        """Test whether events are counted by type, repo and day"""
+
+        aggregator = ActivityAggregator()
+        for e in EVENTS:
+            aggregator.add('valeriocos', e)
+        aggregator.add('jgbarah', EVENTS[2])
+
+        self.assertEqual(aggregator.count, 4)
+        self.assertDictEqual(aggregator.summary(), {
+            'valeriocos': {
+                'events': 3,
+                'types': {'PushEvent': 2, 'CreateEvent': 1},
+                'repos': {'chaoss/grimoirelab': 2, 'valeriocos/ghubby': 1},
+                'days': {'2018-04-18': 2, '2018-04-19': 1}
+            },
+            'jgbarah': {
+                'events': 1,
+                'types': {'CreateEvent': 1},
+                'repos': {'valeriocos/ghubby': 1},
+                'days': {'2018-04-19': 1}
+            }
+        })
+
+    def test_merge(self):
+        """Test whether the counts of several aggregators are merged"""
+
+        first = ActivityAggregator()
+        first.add('valeriocos', EVENTS[0])
+        first.add('jgbarah', EVENTS[2])
+
+        second = ActivityAggregator()
+        second.add('jgbarah', EVENTS[1])
+        second.add('valeriocos', EVENTS[1])
+        second.add('valeriocos', EVENTS[2])
+
+        # aggregators of worker processes are sent pickled
+        first.merge(pickle.loads(pickle.dumps(second)))
+
+        expected = ActivityAggregator()
+        for user, e in [('valeriocos', EVENTS[0]), ('jgbarah', EVENTS[2]), ('jgbarah', EVENTS[1]),
+                        ('valeriocos', EVENTS[1]), ('valeriocos', EVENTS[2])]:
+            expected.add(user, e)
+
+        self.assertEqual(first.count, 5)
+        self.assertDictEqual(first.summary(), expected.summary())
+
+    def test_dump_load(self):
+        """Test whether a summary is written and read back"""
+
+        path = os.path.join(self.tmp_path, 'summary.json')
+
+        aggregator = ActivityAggregator()
+        for e in EVENTS:
+            aggregator.add('valeriocos', e)
+        aggregator.dump(path)
+
+        with open(path) as f:
+            summary = json.load(f)
+
+        self.assertDictEqual(summary, aggregator.summary())
+
+        loaded = ActivityAggregator.load(path)
+        self.assertEqual(loaded.count, 3)
+        self.assertDictEqual(loaded.summary(), aggregator.summary())
+
+        loaded.merge(aggregator)
+        self.assertEqual(loaded.summary()['valeriocos']['types']['PushEvent'], 4)
+
+    @httpretty.activate
+    def test_fetch(self):
+        """Test whether fetched events are aggregated"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        aggregator = ActivityAggregator()
+
+        for e in ghubby.fetch(fields=ActivityAggregator.FIELDS):
+            self.assertNotIn('repo_data', e)
+            aggregator.add(ghubby.user, e)
+
+        summary = aggregator.summary()['valeriocos']
+        self.assertEqual(summary['events'], 3)
+        self.assertDictEqual(summary['types'], {'PushEvent': 1, 'PullRequestEvent': 1, 'CreateEvent': 1})
+        self.assertEqual(sum(summary['repos'].values()), 3)
+        self.assertEqual(sum(summary['days'].values()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
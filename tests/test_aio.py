@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import asyncio
+import unittest
+
+import httpretty
+import requests
+
+from ghubby.aio import AsyncGhubby
+from ghubby.cache import LRUCache
+
+from .test_ghubby import (GITHUB_API_URL,
+                          read_file,
+                          setup_http_server)
+
+
+GITHUB_USER_2_EVENTS_URL = GITHUB_API_URL + "/users/jgbarah/events/public"
+GITHUB_USER_3_EVENTS_URL = GITHUB_API_URL + "/users/unknown/events/public"
+
+
+def collect(ghubby, **kwargs):
+    """Consume the events returned by an `AsyncGhubby` instance"""
+
+    async def consume():
+        return [item async for item in ghubby.fetch(**kwargs)]
+
+    return asyncio.run(consume())
+
+
+class TestAsyncGhubby(unittest.TestCase):
+    """AsyncGhubby tests"""
+
+    @httpretty.activate
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        setup_http_server()
+
+        ghubby = AsyncGhubby(['valeriocos', 'jgbarah'], 'aaa', max_concurrency=2)
+
+        self.assertListEqual(ghubby.users, ['valeriocos', 'jgbarah'])
+        self.assertEqual(ghubby.api_token, 'aaa')
+        self.assertEqual(ghubby.max_concurrency, 2)
+        self.assertIsNone(ghubby.client.user)
+        self.assertDictEqual(ghubby.errors, {})
+
+    def test_invalid_max_concurrency(self):
+        """Test whether an error is raised when the concurrency is not valid"""
+
+        with self.assertRaises(ValueError):
+            AsyncGhubby(['valeriocos'], 'aaa', max_concurrency=0)
+
+    @httpretty.activate
+    def test_fetch(self):
+        """Test whether the events of several users are returned"""
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_2_EVENTS_URL,
+                               body=read_file('data/events_page_2'),
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+
+        repo_cache = LRUCache()
+        ghubby = AsyncGhubby(['valeriocos', 'jgbarah'], 'aaa',
+                             max_concurrency=2, repo_cache=repo_cache)
+        items = collect(ghubby)
+
+        self.assertEqual(len(items), 4)
+
+        events = [event for user, event in items if user == 'valeriocos']
+        self.assertListEqual([event['type'] for event in events],
+                             ['PushEvent', 'PullRequestEvent', 'CreateEvent'])
+
+        events = [event for user, event in items if user == 'jgbarah']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+
+        # Repos are shared among users
+        self.assertDictEqual(events[0]['repo_data'],
+                             repo_cache.get('valeriocos/GrimoireELK'))
+        self.assertEqual(len(repo_cache), 2)
+
+    @httpretty.activate
+    def test_fetch_error(self):
+        """Test whether errors fetching a user are reported per user"""
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_3_EVENTS_URL,
+                               body='{"message": "Not Found"}',
+                               status=404)
+
+        ghubby = AsyncGhubby(['unknown', 'valeriocos'], 'aaa', max_concurrency=1)
+        items = collect(ghubby)
+
+        # the error of a user does not stop the others
+        self.assertEqual(len(items), 3)
+        self.assertTrue(all(user == 'valeriocos' for user, _ in items))
+
+        self.assertListEqual(list(ghubby.errors.keys()), ['unknown'])
+        self.assertIsInstance(ghubby.errors['unknown'], requests.exceptions.HTTPError)
+        self.assertEqual(ghubby.errors['unknown'].response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
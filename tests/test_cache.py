@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from ghubby.cache import LRUCache, SQLiteCache
+
+
+class TestLRUCache(unittest.TestCase):
+    """LRUCache tests"""
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        cache = LRUCache()
+
+        self.assertEqual(cache.max_size, LRUCache.DEFAULT_MAX_SIZE)
+        self.assertIsNone(cache.ttl)
+        self.assertEqual(len(cache), 0)
+        self.assertDictEqual(cache.stats(),
+                             {'size': 0, 'hits': 0, 'misses': 0, 'evictions': 0})
+
+        cache = LRUCache(max_size=None, ttl=60)
+        self.assertIsNone(cache.max_size)
+        self.assertEqual(cache.ttl, 60)
+
+    def test_invalid_max_size(self):
+        """Test whether an error is raised when the size is not valid"""
+
+        with self.assertRaises(ValueError):
+            LRUCache(max_size=0)
+
+    def test_get_put(self):
+        """Test whether values are stored and retrieved"""
+
+        cache = LRUCache()
+        value = {'name': 'GrimoireELK'}
+        cache.put('valeriocos/GrimoireELK', value)
+
+        self.assertIs(cache.get('valeriocos/GrimoireELK'), value)
+        self.assertIsNone(cache.get('chaoss/grimoirelab-mordred'))
+        self.assertIn('valeriocos/GrimoireELK', cache)
+        self.assertNotIn('chaoss/grimoirelab-mordred', cache)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_eviction(self):
+        """Test whether the least recently used entry is evicted"""
+
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    @unittest.mock.patch('ghubby.cache.time.monotonic')
+    def test_ttl(self, mock_monotonic):
+        """Test whether expired entries are evicted"""
+
+        mock_monotonic.return_value = 100
+        cache = LRUCache(ttl=10)
+        cache.put('a', 1)
+
+        mock_monotonic.return_value = 105
+        self.assertEqual(cache.get('a'), 1)
+
+        mock_monotonic.return_value = 111
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_clear(self):
+        """Test whether all the entries are removed"""
+
+        cache = LRUCache()
+        cache.put('a', 1)
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+
+
+class TestSQLiteCache(unittest.TestCase):
+    """SQLiteCache tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.path = os.path.join(self.tmp_path, 'repos.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        cache = SQLiteCache(self.path)
+
+        self.assertEqual(cache.path, self.path)
+        self.assertEqual(cache.ttl, SQLiteCache.DEFAULT_TTL)
+        self.assertEqual(len(cache), 0)
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_get_put(self):
+        """Test whether values are stored and retrieved"""
+
+        cache = SQLiteCache(self.path)
+        cache.put('valeriocos/GrimoireELK', {'name': 'GrimoireELK'})
+
+        self.assertDictEqual(cache.get('valeriocos/GrimoireELK'),
+                             {'name': 'GrimoireELK'})
+        self.assertIsNone(cache.get('chaoss/grimoirelab-mordred'))
+        self.assertDictEqual(cache.stats(),
+                             {'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_persistence(self):
+        """Test whether values are shared among instances"""
+
+        cache = SQLiteCache(self.path)
+        cache.put('valeriocos/GrimoireELK', {'name': 'GrimoireELK'})
+        cache.close()
+
+        cache = SQLiteCache(self.path)
+        self.assertDictEqual(cache.get('valeriocos/GrimoireELK'),
+                             {'name': 'GrimoireELK'})
+
+    @unittest.mock.patch('ghubby.cache.time.time')
+    def test_ttl(self, mock_time):
+        """Test whether expired entries are evicted"""
+
+        mock_time.return_value = 100
+        cache = SQLiteCache(self.path, ttl=10)
+        cache.put('a', 1)
+        cache.put('b', 2, ttl=100)
+        cache.put('c', 3)
+
+        mock_time.return_value = 111
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.purge(), 1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.evictions, 2)
+
+    def test_no_ttl(self):
+        """Test whether entries never expire when ttl is None"""
+
+        cache = SQLiteCache(self.path, ttl=None)
+        cache.put('a', 1)
+
+        self.assertEqual(cache.purge(), 0)
+        self.assertEqual(cache.get('a'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from ghubby.checkpoint import CheckpointStore, DeferredCheckpoints
+
+
+class TestCheckpointStore(unittest.TestCase):
+    """CheckpointStore tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.path = os.path.join(self.tmp_path, 'checkpoints.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        store = CheckpointStore(self.path)
+
+        self.assertEqual(store.path, self.path)
+        self.assertEqual(len(store), 0)
+        self.assertIsNone(store.get('valeriocos'))
+
+    def test_save(self):
+        """Test whether checkpoints are saved to the file"""
+
+        store = CheckpointStore(self.path)
+        store.save('valeriocos', '7527388148', '2018-04-13T16:52:56Z')
+
+        expected = {
+            'valeriocos': {
+                'id': '7527388148',
+                'created_at': '2018-04-13T16:52:56Z'
+            }
+        }
+
+        self.assertDictEqual(store.get('valeriocos'), expected['valeriocos'])
+
+        with open(self.path) as f:
+            self.assertDictEqual(json.load(f), expected)
+
+        store = CheckpointStore(self.path)
+        self.assertDictEqual(store.get('valeriocos'), expected['valeriocos'])
+
+    def test_save_shared(self):
+        """Test whether checkpoints saved by other instances are kept"""
+
+        store_1 = CheckpointStore(self.path)
+        store_2 = CheckpointStore(self.path)
+
+        store_1.save('valeriocos', '7527388148', '2018-04-13T16:52:56Z')
+        store_2.save('jgbarah', '7527054699', '2018-04-13T15:47:04Z')
+
+        self.assertEqual(len(store_2), 2)
+        self.assertEqual(CheckpointStore(self.path).get('valeriocos')['id'], '7527388148')
+
+    def test_save_many(self):
+        """Test whether the checkpoints of several users are written at once"""
+
+        store = CheckpointStore(self.path)
+        store.save('jgbarah', '1', '2018-04-18T10:00:00Z')
+
+        checkpoints = {
+            'valeriocos': {'id': '7527388148', 'created_at': '2018-04-13T16:52:56Z'},
+            'jgbarah': {'id': '2', 'created_at': '2018-04-19T10:00:00Z'}
+        }
+
+        with unittest.mock.patch('ghubby.checkpoint.os.replace', wraps=os.replace) as mock_replace:
+            store.save_many(checkpoints)
+            store.save_many({})
+
+        mock_replace.assert_called_once()
+
+        with open(self.path) as f:
+            self.assertDictEqual(json.load(f), checkpoints)
+
+    def test_empty_file(self):
+        """Test whether an empty file is read as a store without checkpoints"""
+
+        open(self.path, 'w').close()
+
+        store = CheckpointStore(self.path)
+        self.assertEqual(len(store), 0)
+
+
+
+class TestDeferredCheckpoints(unittest.TestCase):
+    """DeferredCheckpoints tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.path = os.path.join(self.tmp_path, 'checkpoints.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_commit(self):
+        """Test whether checkpoints are saved in the store only when committed"""
+
+        store = CheckpointStore(self.path)
+        store.save('jgbarah', '2', '2018-04-18T10:00:00Z')
+
+        checkpoints = DeferredCheckpoints(store)
+        self.assertEqual(checkpoints.get('jgbarah')['id'], '2')
+
+        checkpoints.save('valeriocos', '1', '2018-04-19T10:00:00Z')
+        self.assertEqual(checkpoints.get('valeriocos')['id'], '1')
+        self.assertIsNone(store.get('valeriocos'))
+
+        checkpoints.commit()
+        self.assertEqual(CheckpointStore(self.path).get('valeriocos')['id'], '1')
+        self.assertDictEqual(checkpoints.checkpoints, {})
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
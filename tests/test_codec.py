@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import unittest
+
+from ghubby import codec
+
+
+EVENT = {
+    'id': '7527388148',
+    'type': 'PushEvent',
+    'public': True,
+    'payload': {'size': 1, 'description': None},
+    'repo': {'name': 'valeriocos/GrimoireELK', 'url': 'https://api.github.com/repos/x/y'},
+    'actor': {'display_login': 'Válerio'}
+}
+
+
+class TestCodec(unittest.TestCase):
+    """JSON codec tests"""
+
+    def setUp(self):
+        backend = codec.backend
+        self.addCleanup(codec.set_backend, backend)
+
+    def test_backends(self):
+        """Test whether the fastest backend is selected and stdlib is always available"""
+
+        self.assertIn('json', codec.BACKENDS)
+        self.assertEqual(codec.backend, codec.BACKENDS[0])
+
+        with self.assertRaises(ValueError):
+            codec.set_backend('simdjson')
+
+    def test_loads(self):
+        """Test whether str and bytes documents are decoded"""
+
+        document = json.dumps(EVENT)
+
+        for backend in codec.BACKENDS:
+            with self.subTest(backend=backend):
+                codec.set_backend(backend)
+                self.assertDictEqual(codec.loads(document), EVENT)
+                self.assertDictEqual(codec.loads(document.encode('utf-8')), EVENT)
+
+    def test_dumps(self):
+        """Test whether compact documents are the same with every backend"""
+
+        expected = json.dumps(EVENT, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+        for backend in codec.BACKENDS:
+            with self.subTest(backend=backend):
+                codec.set_backend(backend)
+                self.assertEqual(codec.dumps(EVENT, sort_keys=True), expected)
+                self.assertEqual(codec.dumpb(EVENT, sort_keys=True), expected.encode('utf-8'))
+                self.assertDictEqual(codec.loads(codec.dumpb(EVENT)), EVENT)
+
+    def test_dumps_indent(self):
+        """Test whether indented documents are encoded with the standard module"""
+
+        expected = json.dumps(EVENT, sort_keys=True, indent=4)
+
+        for backend in codec.BACKENDS:
+            with self.subTest(backend=backend):
+                codec.set_backend(backend)
+                self.assertEqual(codec.dumps(EVENT, sort_keys=True, indent=4), expected)
+                self.assertEqual(codec.dumpb(EVENT, sort_keys=True, indent=4),
+                                 expected.encode('utf-8'))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import httpretty
+
+from ghubby.checkpoint import CheckpointStore
+from ghubby.crawler import ShardedCrawler, ShardError
+from ghubby.ghubby import Ghubby
+
+from .test_ghubby import (GITHUB_API_URL,
+                          read_file,
+                          setup_http_server)
+
+
+GITHUB_USER_2_EVENTS_URL = GITHUB_API_URL + "/users/jgbarah/events/public"
+
+
+def setup_users():
+    """Register the events of valeriocos and jgbarah"""
+
+    setup_http_server()
+
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_USER_2_EVENTS_URL,
+                           body=read_file('data/events_page_2'),
+                           status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '5'
+                           })
+
+
+class TestShardedCrawler(unittest.TestCase):
+    """ShardedCrawler tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah', 'valeriocos'], ['aaa'],
+                                 processes=2)
+
+        self.assertListEqual(crawler.users, ['valeriocos', 'jgbarah'])
+        self.assertListEqual(crawler.api_tokens, ['aaa'])
+        self.assertEqual(crawler.processes, 2)
+        self.assertEqual(crawler.shard_size, 100)
+        self.assertEqual(crawler.max_retries, 2)
+        self.assertEqual(crawler.retries, 0)
+        self.assertListEqual(crawler.skipped_users, [])
+
+        with self.assertRaises(ValueError):
+            ShardedCrawler(['valeriocos'], ['aaa'], processes=-1)
+
+        with self.assertRaises(ValueError):
+            ShardedCrawler(['valeriocos'], ['aaa'], shard_size=0)
+
+    def test_shards(self):
+        """Test whether users are split in shards of consecutive users"""
+
+        users = ['user%i' % i for i in range(5)]
+        crawler = ShardedCrawler(users, ['aaa'], shard_size=2)
+
+        self.assertListEqual(crawler.shards(), [['user0', 'user1'],
+                                                ['user2', 'user3'],
+                                                ['user4']])
+
+    def test_token_groups(self):
+        """Test whether tokens are divided among the processes"""
+
+        users = ['user%i' % i for i in range(5)]
+
+        crawler = ShardedCrawler(users, ['a', 'b', 'c', 'd', 'e'], processes=2, shard_size=1)
+        self.assertListEqual(crawler.token_groups(), [['a', 'c', 'e'], ['b', 'd']])
+
+        crawler = ShardedCrawler(users, ['a'], processes=3, shard_size=1)
+        self.assertListEqual(crawler.token_groups(), [['a'], ['a'], ['a']])
+
+        # There are no more processes than shards
+        crawler = ShardedCrawler(users, ['a', 'b'], processes=4, shard_size=5)
+        self.assertListEqual(crawler.token_groups(), [['a', 'b']])
+
+        crawler = ShardedCrawler(users, [], processes=2, shard_size=1)
+        self.assertListEqual(crawler.token_groups(), [[None], [None]])
+
+    @httpretty.activate
+    def test_fetch(self):
+        """Test whether the events of the shards are merged in order"""
+
+        setup_users()
+
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa', 'bbb'],
+                                 processes=2, shard_size=1)
+        events = [event for event in crawler.fetch()]
+
+        self.assertListEqual([event['id'] for event in events],
+                             ['7527388148', '7527054699', '7527041378', '7527041378'])
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+        self.assertEqual(crawler.retries, 0)
+
+    @httpretty.activate
+    def test_fetch_shards(self):
+        """Test whether shards are written in the given format and checkpoints saved"""
+
+        setup_users()
+
+        checkpoint_file = os.path.join(self.tmp_path, 'checkpoints.json')
+        repo_store = os.path.join(self.tmp_path, 'repos.db')
+
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa'], processes=2, shard_size=1,
+                                 checkpoint_file=checkpoint_file, repo_store=repo_store)
+        shards = crawler.fetch_shards(fmt='json', fields=['id', 'type'])
+
+        shard = next(shards)
+        self.assertEqual(shard.index, 0)
+        self.assertListEqual(shard.users, ['valeriocos'])
+        self.assertEqual(shard.count, 3)
+
+        with open(shard.path) as f:
+            self.assertTrue(f.read().startswith('{\n    "id": "7527388148"'))
+
+        # Checkpoints are saved once the shard is merged
+        self.assertIsNone(CheckpointStore(checkpoint_file).get('valeriocos'))
+
+        shard = next(shards)
+        self.assertEqual(shard.index, 1)
+        self.assertEqual(shard.count, 1)
+        self.assertEqual(CheckpointStore(checkpoint_file).get('valeriocos')['id'], '7527388148')
+
+        with self.assertRaises(StopIteration):
+            next(shards)
+
+        self.assertEqual(CheckpointStore(checkpoint_file).get('jgbarah')['id'], '7527041378')
+
+        # Later runs resume from the checkpoints
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa'], processes=2, shard_size=1,
+                                 checkpoint_file=checkpoint_file, repo_store=repo_store)
+        self.assertListEqual([event for event in crawler.fetch()], [])
+
+    @httpretty.activate
+    def test_fetch_retry(self):
+        """Test whether the shard of a dead process is retried"""
+
+        setup_users()
+
+        marker = os.path.join(self.tmp_path, 'crashed')
+        fetch = Ghubby.fetch
+
+        def crashing_fetch(ghubby, *args, **kwargs):
+            if ghubby.user == 'jgbarah' and not os.path.exists(marker):
+                open(marker, 'w').close()
+                os._exit(1)
+            return fetch(ghubby, *args, **kwargs)
+
+        with unittest.mock.patch.object(Ghubby, 'fetch', crashing_fetch):
+            crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa'],
+                                     processes=2, shard_size=1)
+            events = [event for event in crawler.fetch()]
+
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[3]['id'], '7527041378')
+        self.assertGreaterEqual(crawler.retries, 1)
+
+    @httpretty.activate
+    def test_fetch_max_retries(self):
+        """Test whether an error is raised when a shard fails too many times"""
+
+        setup_users()
+
+        def failing_fetch(ghubby, *args, **kwargs):
+            raise RuntimeError("boom")
+
+        with unittest.mock.patch.object(Ghubby, 'fetch', failing_fetch):
+            crawler = ShardedCrawler(['valeriocos'], ['aaa'], processes=1, max_retries=1)
+
+            with self.assertRaises(ShardError) as context:
+                [event for event in crawler.fetch()]
+
+        self.assertEqual(context.exception.index, 0)
+        self.assertEqual(crawler.retries, 1)
+
+    @httpretty.activate
+    def test_fetch_skip_user(self):
+        """Test whether users not found are skipped without failing the shard"""
+
+        setup_users()
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_API_URL + "/users/ghost/events/public",
+                               body='{"message": "Not Found"}',
+                               status=404)
+
+        checkpoint_file = os.path.join(self.tmp_path, 'checkpoints.json')
+
+        crawler = ShardedCrawler(['valeriocos', 'ghost', 'jgbarah'], ['aaa'],
+                                 processes=1, checkpoint_file=checkpoint_file)
+        events = [event for event in crawler.fetch()]
+
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[3]['id'], '7527041378')
+        self.assertEqual(crawler.retries, 0)
+        self.assertListEqual(crawler.skipped_users, ['ghost'])
+
+        checkpoints = CheckpointStore(checkpoint_file)
+        self.assertIsNone(checkpoints.get('ghost'))
+        self.assertEqual(checkpoints.get('jgbarah')['id'], '7527041378')
+
+    @httpretty.activate
+    def test_aggregate(self):
+        """Test whether the counts of the shards are merged and written"""
+
+        setup_users()
+
+        output = os.path.join(self.tmp_path, 'summary.json')
+        checkpoint_file = os.path.join(self.tmp_path, 'checkpoints.json')
+
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa', 'bbb'], processes=2,
+                                 shard_size=1, checkpoint_file=checkpoint_file)
+        aggregator = crawler.aggregate(output, event_types=['PushEvent', 'CreateEvent'])
+
+        self.assertEqual(aggregator.count, 3)
+
+        with open(output) as f:
+            summary = json.load(f)
+
+        self.assertDictEqual(summary['valeriocos']['types'], {'PushEvent': 1, 'CreateEvent': 1})
+        self.assertDictEqual(summary['jgbarah']['types'], {'CreateEvent': 1})
+        self.assertEqual(CheckpointStore(checkpoint_file).get('valeriocos')['id'], '7527388148')
+
+        # Later runs count new events only, and merge the previous summaries
+        crawler = ShardedCrawler(['valeriocos', 'jgbarah'], ['aaa'], processes=2,
+                                 shard_size=1, checkpoint_file=checkpoint_file)
+        aggregator = crawler.aggregate(os.path.join(self.tmp_path, 'total.json'),
+                                       summaries=[output])
+
+        self.assertEqual(aggregator.count, 3)
+        self.assertEqual(crawler.retries, 0)
+
+    def test_fetch_lazy(self):
+        """Test whether lazy repos are not allowed"""
+
+        crawler = ShardedCrawler(['valeriocos'], ['aaa'], processes=1)
+
+        with self.assertRaises(ValueError):
+            next(crawler.fetch(resolve_repos='lazy'))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+
+from ghubby.filters import EventFilter
+
+
+PUSH_EVENT = {'type': 'PushEvent', 'repo': {'name': 'valeriocos/GrimoireELK'}}
+PULL_EVENT = {'type': 'PullRequestEvent', 'repo': {'name': 'chaoss/grimoirelab-mordred'}}
+WATCH_EVENT = {'type': 'WatchEvent', 'repo': {'name': 'chaoss/grimoirelab-perceval'}}
+
+
+class TestEventFilter(unittest.TestCase):
+    """EventFilter tests"""
+
+    def test_empty(self):
+        """Test whether an empty filter matches all the events"""
+
+        event_filter = EventFilter()
+
+        self.assertFalse(event_filter)
+        self.assertTrue(event_filter.match(PUSH_EVENT))
+        self.assertTrue(event_filter.match(WATCH_EVENT))
+
+    def test_event_types(self):
+        """Test whether events are filtered by type"""
+
+        event_filter = EventFilter(event_types=['PushEvent', 'PullRequestEvent'])
+
+        self.assertTrue(event_filter)
+        self.assertTrue(event_filter.match(PUSH_EVENT))
+        self.assertTrue(event_filter.match(PULL_EVENT))
+        self.assertFalse(event_filter.match(WATCH_EVENT))
+
+        event_filter = EventFilter(exclude_event_types=['WatchEvent'])
+
+        self.assertTrue(event_filter.match(PUSH_EVENT))
+        self.assertFalse(event_filter.match(WATCH_EVENT))
+
+    def test_repos(self):
+        """Test whether events are filtered by repo name patterns"""
+
+        event_filter = EventFilter(repos=['chaoss/*'])
+
+        self.assertFalse(event_filter.match(PUSH_EVENT))
+        self.assertTrue(event_filter.match(PULL_EVENT))
+        self.assertTrue(event_filter.match(WATCH_EVENT))
+
+        event_filter = EventFilter(repos=['chaoss/*'], exclude_repos=['*/*-perceval'])
+
+        self.assertTrue(event_filter.match(PULL_EVENT))
+        self.assertFalse(event_filter.match(WATCH_EVENT))
+
+    def test_combined(self):
+        """Test whether type and repo filters are combined"""
+
+        event_filter = EventFilter(event_types=['PushEvent', 'WatchEvent'],
+                                   exclude_repos=['valeriocos/*'])
+
+        self.assertFalse(event_filter.match(PUSH_EVENT))
+        self.assertFalse(event_filter.match(PULL_EVENT))
+        self.assertTrue(event_filter.match(WATCH_EVENT))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -22,14 +22,29 @@
 #
 
 import datetime
+import gc
+import json
 import os
+import pickle
+import shutil
+import tempfile
+import time
 import unittest
+import unittest.mock
 
 import httpretty
+import requests
 
+from ghubby.cache import LRUCache, SQLiteCache
+from ghubby.checkpoint import CheckpointStore
 from ghubby.ghubby import (Ghubby,
                            GhubbyClient,
-                           GHubbyCommand)
+                           GHubbyCommand,
+                           LazyEvent)
+from ghubby.metrics import Metrics
+from ghubby.scheduler import RateLimitScheduler
+from ghubby.session import create_session
+from ghubby.tokens import TokenPool
 
 
 GITHUB_API_URL = "https://api.github.com"
@@ -47,6 +62,104 @@ def read_file(filename, mode='r'):
     return content
 
 
+def count_requests(path):
+    """Count the requests sent to a given path"""
+
+    return len([request for request in httpretty.latest_requests()
+                if request.path == path])
+
+
+def setup_http_server(events=True):
+    """Register the rate limit, events and repos API calls"""
+
+    repo_1 = read_file('data/repo_1')
+    repo_2 = read_file('data/repo_2')
+    events_page_1 = read_file('data/events_page_1')
+    events_page_2 = read_file('data/events_page_2')
+    rate_limit = read_file('data/rate_limit')
+
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_RATE_LIMIT,
+                           body=rate_limit,
+                           status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '15'
+                           })
+    if events:
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_EVENTS_URL,
+                               body=events_page_1,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '5',
+                                   'Link': '<' + GITHUB_USER_EVENTS_URL +
+                                           '/?&page=2>; rel="next", <' +
+                                           GITHUB_USER_EVENTS_URL +
+                                           '/?&page=3>; rel="last"'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_EVENTS_URL + '/?&page=2',
+                               body=events_page_2,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '5'
+                               })
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_REPO_1_URL,
+                           body=repo_1, status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '15'
+                           })
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_REPO_2_URL,
+                           body=repo_2, status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '15'
+                           })
+
+
+def setup_events_pages(last_page, delay=0):
+    """Register events pages up to `last_page`; only the first two have events.
+
+    Each page after the first one replies after `delay` seconds.
+    """
+    setup_http_server(events=False)
+
+    events_page_1 = read_file('data/events_page_1')
+    events_page_2 = read_file('data/events_page_2')
+
+    def request_callback(request, uri, headers):
+        time.sleep(delay)
+        page = request.querystring['page'][0]
+        body = events_page_2 if page == '2' else '[]'
+        headers.update({
+            'X-RateLimit-Remaining': '20',
+            'X-RateLimit-Reset': '5'
+        })
+        return 200, headers, body
+
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_USER_EVENTS_URL,
+                           body=events_page_1,
+                           status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '5',
+                               'Link': '<' + GITHUB_USER_EVENTS_URL +
+                                       '/?&page=2>; rel="next", <' +
+                                       GITHUB_USER_EVENTS_URL +
+                                       '/?&page=%i>; rel="last"' % last_page
+                           })
+    httpretty.register_uri(httpretty.GET,
+                           GITHUB_USER_EVENTS_URL + '/?&page=2',
+                           body=request_callback)
+
+
 class TestGHubby(unittest.TestCase):
     """GHubby tests"""
 
@@ -142,6 +255,7 @@ class TestGHubby(unittest.TestCase):
         self.assertEqual(event['actor']['login'], 'valeriocos')
         self.assertEqual(event['type'], 'CreateEvent')
         self.assertEqual(event['repo_data']['name'], 'GrimoireELK')
+        self.assertIs(event['repo_data'], events[0]['repo_data'])
 
     @httpretty.activate
     def test_fetch_from_date(self):
@@ -213,6 +327,339 @@ class TestGHubby(unittest.TestCase):
         self.assertEqual(event['type'], 'PullRequestEvent')
         self.assertEqual(event['repo_data']['name'], 'mordred')
 
+    @httpretty.activate
+    def test_fetch_short_circuit(self):
+        """Test whether the pagination stops when events are older than from date"""
+
+        setup_http_server()
+
+        from_date = datetime.datetime(2018, 4, 13, 16, 0)
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.fetch(from_date=from_date,
+                                                  short_circuit=True)]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['type'], 'PushEvent')
+        self.assertEqual(ghubby.saved_requests, 2)
+
+        self.assertEqual(count_requests('/users/valeriocos/events/public/?&page=2&per_page=30'), 0)
+        self.assertEqual(count_requests('/users/valeriocos/events/public?per_page=30'), 1)
+
+    @httpretty.activate
+    def test_fetch_short_circuit_last_page(self):
+        """Test whether all the pages are fetched when events are newer than from date"""
+
+        setup_http_server()
+
+        from_date = datetime.datetime(2018, 4, 13, 15, 45)
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.fetch(from_date=from_date,
+                                                  short_circuit=True)]
+
+        self.assertEqual(len(events), 2)
+        self.assertEqual(ghubby.saved_requests, 1)
+
+    @httpretty.activate
+    def test_fetch_max_workers(self):
+        """Test whether repos are fetched concurrently keeping the events order"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa', max_workers=4)
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['type'], 'PushEvent')
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+        self.assertEqual(events[1]['type'], 'PullRequestEvent')
+        self.assertEqual(events[1]['repo_data']['name'], 'mordred')
+        self.assertEqual(events[2]['type'], 'CreateEvent')
+        self.assertIs(events[2]['repo_data'], events[0]['repo_data'])
+
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 1)
+
+    @httpretty.activate
+    def test_fetch_page_workers(self):
+        """Test whether pages are fetched concurrently keeping the events order"""
+
+        setup_events_pages(3)
+
+        ghubby = Ghubby('valeriocos', 'aaa', page_workers=2)
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['type'], 'PushEvent')
+        self.assertEqual(events[1]['type'], 'PullRequestEvent')
+        self.assertEqual(events[2]['type'], 'CreateEvent')
+
+    @httpretty.activate
+    def test_fetch_graphql_resolver(self):
+        """Test whether repos are resolved in batches with REST fallback"""
+
+        queries = []
+
+        def request_callback(request, uri, headers):
+            queries.append(json.loads(request.body.decode('utf-8')))
+            headers.update({
+                'X-RateLimit-Remaining': '20',
+                'X-RateLimit-Reset': '15'
+            })
+            return 200, headers, read_file('data/graphql_repos')
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.POST,
+                               GITHUB_API_URL + "/graphql",
+                               body=request_callback)
+
+        ghubby = Ghubby('valeriocos', 'aaa', repo_resolver='graphql')
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['repo_data']['id'], 116242339)
+        self.assertEqual(events[0]['repo_data']['full_name'], 'valeriocos/GrimoireELK')
+        self.assertEqual(events[1]['repo_data']['name'], 'mordred')
+        self.assertIs(events[2]['repo_data'], events[0]['repo_data'])
+
+        # the repos of the second page were already cached
+        self.assertEqual(len(queries), 1)
+        self.assertDictEqual(queries[0]['variables'], {'o0': 'valeriocos',
+                                                       'n0': 'GrimoireELK',
+                                                       'o1': 'chaoss',
+                                                       'n1': 'grimoirelab-mordred'})
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 1)
+
+    @httpretty.activate
+    def test_fetch_resolve_repos_none(self):
+        """Test whether repos are not fetched when they are not resolved"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.fetch(resolve_repos='none')]
+
+        self.assertEqual(len(events), 3)
+        for event in events:
+            self.assertNotIn('repo_data', event)
+
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 0)
+
+    @httpretty.activate
+    def test_fetch_resolve_repos_lazy(self):
+        """Test whether repos are fetched only when they are accessed"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.fetch(resolve_repos='lazy')]
+
+        self.assertEqual(len(events), 3)
+        self.assertIsInstance(events[0], LazyEvent)
+        self.assertFalse(events[0].resolved)
+        self.assertNotIn('repo_data', events[0])
+        self.assertNotIn('repo_data', json.loads(json.dumps(events[0])))
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+        self.assertTrue(events[0].resolved)
+        self.assertIs(events[2].get('repo_data'), events[0]['repo_data'])
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 0)
+
+        with self.assertRaises(KeyError):
+            events[1]['unknown']
+        self.assertIsNone(events[1].get('unknown'))
+
+        # copies are plain events
+        event = pickle.loads(pickle.dumps(events[1]))
+        self.assertIs(type(event), dict)
+        self.assertNotIn('repo_data', event)
+
+    @httpretty.activate
+    def test_resolve_repos(self):
+        """Test whether the repos of lazy events are fetched at once"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa', max_workers=2)
+        events = ghubby.resolve_repos(ghubby.fetch(resolve_repos='lazy',
+                                                   fields=['type', 'repo_data.name']))
+
+        self.assertListEqual(events, [
+            {'type': 'PushEvent', 'repo_data': {'name': 'GrimoireELK'}},
+            {'type': 'PullRequestEvent', 'repo_data': {'name': 'mordred'}},
+            {'type': 'CreateEvent', 'repo_data': {'name': 'GrimoireELK'}}
+        ])
+        self.assertTrue(all(event.resolved for event in events))
+
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 1)
+
+    def test_fetch_invalid_resolve_repos(self):
+        """Test whether an error is raised when the resolve mode is not valid"""
+
+        ghubby = Ghubby('valeriocos', 'aaa', client=object())
+
+        with self.assertRaises(ValueError):
+            ghubby.fetch(resolve_repos='always')
+
+    @httpretty.activate
+    def test_fetch_metrics(self):
+        """Test whether requests, cache lookups and events are recorded"""
+
+        setup_http_server()
+
+        metrics = Metrics()
+        ghubby = Ghubby('valeriocos', 'aaa', metrics=metrics)
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+
+        stats = metrics.as_dict()
+        self.assertDictEqual(stats['requests']['events']['status'], {'200': 2})
+        self.assertDictEqual(stats['requests']['repos']['status'], {'200': 2})
+        self.assertGreater(stats['requests']['repos']['bytes'], 0)
+        self.assertNotIn('rate_limit', stats['requests'])
+        self.assertDictEqual(stats['caches'], {'repo': {'hits': 1, 'misses': 2}})
+        self.assertEqual(stats['rate_limit_wait_seconds'], 0)
+        self.assertGreater(stats['parse']['bytes'], 0)
+        self.assertDictEqual(stats['events'], {'valeriocos': 3})
+
+    @httpretty.activate
+    def test_fetch_metrics_pacing(self):
+        """Test whether short waits of the pace are recorded"""
+
+        setup_http_server()
+
+        metrics = Metrics()
+        tokens = TokenPool(['aaa'])
+        scheduler = RateLimitScheduler(tokens, burst=1)
+
+        # 10 requests per second
+        with unittest.mock.patch.object(TokenPool, 'rate', return_value=10.0), \
+                unittest.mock.patch.object(TokenPool, 'remaining', return_value=100):
+            ghubby = Ghubby('valeriocos', tokens, metrics=metrics, scheduler=scheduler)
+            events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+        self.assertGreater(metrics.as_dict()['rate_limit_wait_seconds'], 0.2)
+
+    def test_invalid_max_workers(self):
+        """Test whether an error is raised when the number of workers is not valid"""
+
+        with self.assertRaises(ValueError):
+            Ghubby('valeriocos', 'aaa', max_workers=0)
+
+        with self.assertRaises(ValueError):
+            Ghubby('valeriocos', 'aaa', page_workers=0)
+
+    @httpretty.activate
+    def test_fetch_checkpoint(self):
+        """Test whether only events newer than the checkpoint are returned"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        checkpoints = CheckpointStore(os.path.join(tmp_path, 'checkpoints.json'))
+
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 3)
+        self.assertDictEqual(checkpoints.get('valeriocos'),
+                             {'id': '7527388148', 'created_at': '2018-04-13T16:52:56Z'})
+
+        # The checkpoint points to the second event
+        checkpoints.save('valeriocos', '7527054699', '2018-04-13T15:47:04Z')
+
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+        with self.assertLogs('ghubby.ghubby', level='INFO') as logs:
+            events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['id'], '7527388148')
+        self.assertEqual(ghubby.saved_requests, 2)
+        self.assertIn("Checkpoint reached for valeriocos, 2 requests saved", logs.output[-1])
+        self.assertEqual(count_requests('/users/valeriocos/events/public/?&page=2&per_page=30'), 1)
+        self.assertDictEqual(checkpoints.get('valeriocos'),
+                             {'id': '7527388148', 'created_at': '2018-04-13T16:52:56Z'})
+
+        # No new events
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+        events = [event for event in ghubby.fetch()]
+
+        self.assertEqual(len(events), 0)
+        self.assertEqual(checkpoints.get('valeriocos')['id'], '7527388148')
+
+    @httpretty.activate
+    def test_fetch_fields(self):
+        """Test whether only the selected fields are returned"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        fields = ['type', 'repo.name', 'repo_data.name', 'repo_data.owner.login']
+        events = [event for event in ghubby.fetch(fields=fields)]
+
+        self.assertEqual(len(events), 3)
+        self.assertDictEqual(events[0], {
+            'type': 'PushEvent',
+            'repo': {'name': 'valeriocos/GrimoireELK'},
+            'repo_data': {'name': 'GrimoireELK', 'owner': {'login': 'valeriocos'}}
+        })
+
+        # Repos are projected before caching them
+        repo = ghubby.client.repo_cache.get('valeriocos/GrimoireELK?fields=name,owner.login')
+        self.assertDictEqual(repo, {'name': 'GrimoireELK', 'owner': {'login': 'valeriocos'}})
+
+    @httpretty.activate
+    def test_fetch_fields_no_repo_data(self):
+        """Test whether repos are not fetched when repo_data is not selected"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa', max_workers=2)
+        events = [event for event in ghubby.fetch(fields=['id', 'type'])]
+
+        self.assertEqual(len(events), 3)
+        self.assertDictEqual(events[2], {'id': '7527041378', 'type': 'CreateEvent'})
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 0)
+
+    @httpretty.activate
+    def test_fetch_filters(self):
+        """Test whether filtered out events do not fetch their repos"""
+
+        setup_http_server()
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.fetch(event_types=['PullRequestEvent', 'CreateEvent'],
+                                                  exclude_repos=['valeriocos/*'])]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['type'], 'PullRequestEvent')
+        self.assertEqual(events[0]['repo_data']['name'], 'mordred')
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+
+    @httpretty.activate
+    def test_fetch_filters_checkpoint(self):
+        """Test whether filtered out events update the checkpoint"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        checkpoints = CheckpointStore(os.path.join(tmp_path, 'checkpoints.json'))
+
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+        events = [event for event in ghubby.fetch(event_types=['CreateEvent'])]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(checkpoints.get('valeriocos')['id'], '7527388148')
+
     @httpretty.activate
     def test_fetch_empty(self):
         """Test when return empty"""
@@ -242,6 +689,102 @@ class TestGHubby(unittest.TestCase):
 
         self.assertEqual(len(events), 0)
 
+    @httpretty.activate
+    def test_watch(self):
+        """Test whether only new events are returned by later polls"""
+
+        setup_http_server(events=False)
+
+        events_page = json.loads(read_file('data/events_page_1'))
+        new_event = dict(events_page[1], id='7527400000', created_at='2018-04-13T17:00:00Z')
+
+        polls = [
+            (200, '"a"', events_page),
+            (304, '"a"', None),
+            (200, '"b"', [new_event] + events_page)
+        ]
+        conditional_headers = []
+
+        def request_callback(request, uri, headers):
+            conditional_headers.append(request.headers.get('If-None-Match', None))
+            status, etag, events = polls[len(conditional_headers) - 1]
+            headers.update({
+                'ETag': etag,
+                'X-Poll-Interval': '0',
+                'X-RateLimit-Remaining': '20',
+                'X-RateLimit-Reset': '5'
+            })
+            return status, headers, json.dumps(events) if events else ''
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_EVENTS_URL,
+                               body=request_callback)
+
+        ghubby = Ghubby('valeriocos', 'aaa')
+        events = [event for event in ghubby.watch(max_polls=3)]
+
+        self.assertListEqual([event['id'] for event in events],
+                             ['7527388148', '7527054699', '7527400000'])
+        self.assertListEqual(conditional_headers, [None, '"a"', '"a"'])
+
+        # Repos are served by the cache in later polls
+        self.assertEqual(events[2]['repo_data']['name'], 'mordred')
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 1)
+
+    @httpretty.activate
+    def test_watch_checkpoint(self):
+        """Test whether the first poll resumes from the checkpoint"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        checkpoints = CheckpointStore(os.path.join(tmp_path, 'checkpoints.json'))
+        checkpoints.save('valeriocos', '7527054699', '2018-04-13T15:47:04Z')
+
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+        events = [event for event in ghubby.watch(poll_interval=0, max_polls=1)]
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['id'], '7527388148')
+        self.assertEqual(checkpoints.get('valeriocos')['id'], '7527388148')
+
+        with self.assertRaises(ValueError):
+            next(ghubby.watch(resolve_repos='later'))
+
+    @httpretty.activate
+    def test_watch_http_cache(self):
+        """Test whether the first poll returns the events restored by the HTTP cache"""
+
+        setup_http_server(events=False)
+
+        events_page = read_file('data/events_page_1')
+
+        def request_callback(request, uri, headers):
+            headers.update({
+                'ETag': '"a"',
+                'X-Poll-Interval': '0',
+                'X-RateLimit-Remaining': '20',
+                'X-RateLimit-Reset': '5'
+            })
+            if request.headers.get('If-None-Match') == '"a"':
+                return 304, headers, ''
+            return 200, headers, events_page
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_EVENTS_URL,
+                               body=request_callback)
+
+        http_cache = LRUCache()
+        events = [event for event in Ghubby('valeriocos', 'aaa', http_cache=http_cache).fetch()]
+        self.assertEqual(len(events), 2)
+
+        ghubby = Ghubby('valeriocos', 'aaa', http_cache=http_cache)
+        events = [event for event in ghubby.watch(max_polls=2)]
+
+        self.assertListEqual([event['id'] for event in events], ['7527388148', '7527054699'])
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], '"a"')
+
 
 class TestGHubbyClient(unittest.TestCase):
     """GHubbyClient tests"""
@@ -262,6 +805,143 @@ class TestGHubbyClient(unittest.TestCase):
 
         self.assertEqual(client.user, 'valeriocos')
         self.assertEqual(client.token, 'aaa')
+        self.assertEqual(client.repo_resolver, 'rest')
+
+        with self.assertRaises(ValueError):
+            GhubbyClient('valeriocos', 'aaa', repo_resolver='soap')
+
+    def test_init_invalid_cleanup(self):
+        """Test whether clients with invalid arguments are deleted cleanly"""
+
+        scheduler = RateLimitScheduler(TokenPool(['bbb']))
+
+        with unittest.mock.patch('sys.unraisablehook') as mock_hook:
+            for kwargs in [{'repo_resolver': 'soap'}, {'scheduler': scheduler}]:
+                with self.assertRaises(ValueError):
+                    GhubbyClient('valeriocos', 'aaa', **kwargs)
+            with self.assertRaises(ValueError):
+                GhubbyClient('valeriocos', [])
+            gc.collect()
+
+        mock_hook.assert_not_called()
+
+    @httpretty.activate
+    def test_init_no_requests(self):
+        """Test whether the rate limit is learned from the first response"""
+
+        setup_http_server()
+
+        client = GhubbyClient('valeriocos', 'aaa')
+
+        self.assertEqual(len(httpretty.latest_requests()), 0)
+        self.assertDictEqual(client.tokens.usage()['aaa'],
+                             {'requests': 0, 'remaining': None, 'reset': None})
+
+        client.repo('valeriocos/GrimoireELK')
+
+        self.assertEqual(count_requests('/rate_limit'), 0)
+        self.assertDictEqual(client.tokens.usage()['aaa'],
+                             {'requests': 1, 'remaining': 20, 'reset': 15})
+
+    @httpretty.activate
+    def test_abuse_rate_limit(self):
+        """Test whether requests rejected by the abuse rate limit are retried"""
+
+        setup_http_server()
+
+        abuse = read_file('data/abuse_rate_limit')
+        repo_1 = read_file('data/repo_1')
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_REPO_1_URL,
+                               responses=[
+                                   httpretty.Response(body=abuse, status=403,
+                                                      forcing_headers={'Retry-After': '0'}),
+                                   httpretty.Response(body=abuse, status=403),
+                                   httpretty.Response(body=repo_1, status=200)
+                               ])
+
+        tokens = TokenPool(['aaa'])
+        scheduler = RateLimitScheduler(tokens, backoff_factor=0.01)
+        client = GhubbyClient('valeriocos', tokens, scheduler=scheduler)
+
+        repo = client.repo('valeriocos/GrimoireELK')
+
+        self.assertEqual(repo['full_name'], 'valeriocos/GrimoireELK')
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 3)
+        self.assertEqual(scheduler.backoffs, 0)
+
+        # Other errors are not retried
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_REPO_2_URL,
+                               body='{"message": "Forbidden"}', status=403)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            client.repo('chaoss/grimoirelab-mordred')
+        self.assertEqual(count_requests('/repos/chaoss/grimoirelab-mordred'), 1)
+
+        with self.assertRaises(ValueError):
+            GhubbyClient('valeriocos', 'aaa', scheduler=scheduler)
+
+    @httpretty.activate
+    def test_shared_session(self):
+        """Test whether clients share the session and the rate limit state"""
+
+        setup_http_server()
+
+        session = create_session()
+        tokens = TokenPool(['aaa', 'bbb'])
+
+        client_1 = GhubbyClient('valeriocos', tokens, session=session)
+        client_2 = GhubbyClient('valeriocos', tokens, session=session)
+
+        self.assertIs(client_1.session, session)
+        self.assertIs(client_2.session, session)
+        self.assertIs(client_1.tokens, tokens)
+        self.assertIs(client_2.tokens, tokens)
+
+        # the rate limit is not probed by each client
+        self.assertEqual(count_requests('/rate_limit'), 0)
+
+        client_1.repo('valeriocos/GrimoireELK')
+        client_2.repo('chaoss/grimoirelab-mordred')
+
+        usage = tokens.usage()
+        self.assertEqual(sum(token['requests'] for token in usage.values()), 2)
+        self.assertNotIn('Authorization', session.headers)
+        self.assertIn(httpretty.last_request().headers['Authorization'],
+                      ['token aaa', 'token bbb'])
+        self.assertEqual(httpretty.last_request().headers['Accept'],
+                         'application/vnd.github.squirrel-girl-preview')
+
+    @httpretty.activate
+    def test_enterprise_url(self):
+        """Test whether the API of a GitHub Enterprise instance is used"""
+
+        enterprise_api_url = "https://example.com/api/v3"
+
+        httpretty.register_uri(httpretty.GET,
+                               enterprise_api_url + "/rate_limit",
+                               body=read_file('data/rate_limit'),
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               enterprise_api_url + "/users/valeriocos/events/public",
+                               body=read_file('data/events_page_1'),
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+
+        client = GhubbyClient("valeriocos", "aaa", base_url="https://example.com")
+        self.assertEqual(client.base_url, enterprise_api_url)
+
+        raw_events = [events for events in client.events()]
+        self.assertEqual(len(raw_events), 1)
+        self.assertEqual(httpretty.last_request().headers['Host'], 'example.com')
 
     @httpretty.activate
     def test_events(self):
@@ -300,6 +980,69 @@ class TestGHubbyClient(unittest.TestCase):
         self.assertEqual(httpretty.last_request().headers["Authorization"],
                          "token aaa")
 
+    @httpretty.activate
+    def test_events_page_workers(self):
+        """Test whether pages are fetched concurrently with the maximum size"""
+
+        setup_events_pages(4, delay=0.1)
+
+        client = GhubbyClient("valeriocos", "aaa")
+        raw_events = [events for events in client.events(max_workers=3)]
+
+        self.assertEqual(len(raw_events), 4)
+        self.assertEqual(raw_events[0], read_file('data/events_page_1'))
+        self.assertEqual(raw_events[1], read_file('data/events_page_2'))
+        self.assertEqual(raw_events[2], '[]')
+        self.assertEqual(raw_events[3], '[]')
+
+        requests = [request for request in httpretty.latest_requests()
+                    if request.path.startswith('/users/valeriocos/events/public')]
+        self.assertEqual(len(requests), 4)
+
+        pages = sorted(request.querystring.get('page', ['1'])[0] for request in requests)
+        self.assertListEqual(pages, ['1', '2', '3', '4'])
+        for request in requests:
+            self.assertEqual(request.querystring['per_page'], ['100'])
+
+    @httpretty.activate
+    def test_events_page_workers_close(self):
+        """Test whether pending pages are cancelled when the consumer stops"""
+
+        setup_events_pages(5, delay=0.2)
+
+        client = GhubbyClient("valeriocos", "aaa")
+        raw_events = client.events(max_workers=2)
+        next(raw_events)
+        raw_events.close()
+
+        # pages 2 and 3 were already requested, 4 and 5 were cancelled
+        self.assertEqual(client.skipped_requests, 2)
+
+        requests = [request for request in httpretty.latest_requests()
+                    if request.path.startswith('/users/valeriocos/events/public')]
+        self.assertEqual(len(requests), 3)
+
+    @httpretty.activate
+    def test_events_page_workers_window(self):
+        """Test whether no more pages than workers are requested ahead"""
+
+        setup_events_pages(10)
+
+        client = GhubbyClient("valeriocos", "aaa")
+        raw_events = client.events(max_workers=2)
+        next(raw_events)
+        next(raw_events)
+
+        # a slow consumer does not let the rest of pages be requested
+        time.sleep(0.2)
+        raw_events.close()
+
+        self.assertEqual(client.skipped_requests, 6)
+
+        requests = [request for request in httpretty.latest_requests()
+                    if request.path.startswith('/users/valeriocos/events/public')]
+        self.assertEqual(len(requests), 4)
+
     @httpretty.activate
     def test_repo(self):
         """Test repo API call"""
@@ -326,8 +1069,147 @@ class TestGHubbyClient(unittest.TestCase):
 
         client = GhubbyClient("valeriocos", "aaa")
 
-        repo_raw = client.repo("valeriocos/GrimoireELK")
-        self.assertEqual(repo_raw, repo)
+        repo_data = client.repo("valeriocos/GrimoireELK")
+        self.assertDictEqual(repo_data, json.loads(repo))
+
+    @httpretty.activate
+    def test_repo_cache(self):
+        """Test whether parsed repos are cached and shared"""
+
+        setup_http_server()
+
+        repo_cache = LRUCache(max_size=1)
+        client = GhubbyClient("valeriocos", "aaa", repo_cache=repo_cache)
+
+        repo_data = client.repo("valeriocos/GrimoireELK")
+        self.assertIs(client.repo("valeriocos/GrimoireELK"), repo_data)
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+
+        client.repo("chaoss/grimoirelab-mordred")
+        client.repo("valeriocos/GrimoireELK")
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 2)
+
+        self.assertIs(client.repo_cache, repo_cache)
+        self.assertDictEqual(repo_cache.stats(),
+                             {'size': 1, 'hits': 1, 'misses': 3, 'evictions': 2})
+
+    @httpretty.activate
+    def test_repo_store(self):
+        """Test whether repos are read from and written to the repo store"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        repo_store = SQLiteCache(os.path.join(tmp_path, 'repos.db'))
+
+        client = GhubbyClient("valeriocos", "aaa", repo_store=repo_store)
+        repo_data = client.repo("valeriocos/GrimoireELK")
+        self.assertDictEqual(repo_store.get("valeriocos/GrimoireELK"), repo_data)
+
+        client = GhubbyClient("valeriocos", "aaa", repo_store=repo_store)
+        self.assertDictEqual(client.repo("valeriocos/GrimoireELK"), repo_data)
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+        self.assertEqual(len(client.repo_cache), 1)
+
+    @httpretty.activate
+    def test_conditional_requests(self):
+        """Test whether not modified responses are served from the cache"""
+
+        events = read_file('data/events_page_1')
+        rate_limit = read_file('data/rate_limit')
+
+        def request_callback(request, uri, headers):
+            headers.update({
+                'X-RateLimit-Remaining': '20',
+                'X-RateLimit-Reset': '15',
+                'ETag': '"abc"'
+            })
+            if request.headers.get('If-None-Match') == '"abc"':
+                return [304, headers, '']
+            return [200, headers, events]
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_USER_EVENTS_URL,
+                               body=request_callback)
+
+        http_cache = LRUCache()
+        client = GhubbyClient("valeriocos", "aaa", http_cache=http_cache)
+
+        raw_events = [events for events in client.events()]
+        self.assertEqual(raw_events, [events])
+        self.assertNotIn('If-None-Match', httpretty.last_request().headers)
+        self.assertEqual(client.not_modified, 0)
+
+        raw_events = [events for events in client.events()]
+        self.assertEqual(raw_events, [events])
+        self.assertEqual(httpretty.last_request().headers['If-None-Match'], '"abc"')
+        self.assertEqual(client.not_modified, 1)
+
+    @httpretty.activate
+    def test_no_conditional_requests(self):
+        """Test whether responses without validators are not cached"""
+
+        setup_http_server()
+
+        http_cache = LRUCache()
+        client = GhubbyClient("valeriocos", "aaa", http_cache=http_cache)
+        client.repo("valeriocos/GrimoireELK")
+
+        self.assertEqual(len(http_cache), 0)
+
+    @httpretty.activate
+    def test_token_pool(self):
+        """Test whether requests are sent with the token with more remaining requests"""
+
+        rate_limit = read_file('data/rate_limit')
+        repo = read_file('data/repo_1')
+        remaining = {'token aaa': '5', 'token bbb': '100'}
+
+        def request_callback(request, uri, headers):
+            headers.update({
+                'X-RateLimit-Remaining': remaining[request.headers['Authorization']],
+                'X-RateLimit-Reset': '9999999999'
+            })
+            return [200, headers, repo]
+
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_RATE_LIMIT,
+                               body=rate_limit,
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '15'
+                               })
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_REPO_1_URL,
+                               body=request_callback)
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_REPO_2_URL,
+                               body=request_callback)
+
+        client = GhubbyClient("valeriocos", ["aaa", "bbb"])
+        self.assertEqual(client.token, "aaa")
+
+        client.repo("valeriocos/GrimoireELK")
+        self.assertEqual(httpretty.last_request().headers["Authorization"], "token aaa")
+
+        client.repo("chaoss/grimoirelab-mordred")
+        self.assertEqual(httpretty.last_request().headers["Authorization"], "token bbb")
+
+        usage = client.tokens.usage()
+        self.assertEqual(usage['aaa']['requests'], 1)
+        self.assertEqual(usage['aaa']['remaining'], 5)
+        self.assertEqual(usage['bbb']['requests'], 1)
+        self.assertEqual(usage['bbb']['remaining'], 100)
 
     @httpretty.activate
     def test_get_empty_events(self):
@@ -381,8 +1263,241 @@ class TestGHubbyCommand(unittest.TestCase):
 
         parsed_args = parser.parse_args(args)
         self.assertEqual(parsed_args.from_date, '1970-01-01')
-        self.assertEqual(parsed_args.api_token, 'abcdefgh')
+        self.assertListEqual(parsed_args.api_token, ['abcdefgh'])
         self.assertEqual(parsed_args.user, 'valeriocos')
+        self.assertIsNone(parsed_args.api_token_file)
+        self.assertFalse(parsed_args.short_circuit)
+        self.assertIsNone(parsed_args.repo_store)
+        self.assertIsNone(parsed_args.http_cache)
+        self.assertEqual(parsed_args.max_workers, 1)
+        self.assertEqual(parsed_args.page_workers, 1)
+        self.assertEqual(parsed_args.repo_resolver, 'rest')
+        self.assertIsNone(parsed_args.enterprise_url)
+        self.assertEqual(parsed_args.resolve_repos, 'eager')
+        self.assertEqual(parsed_args.http_pool_size, 10)
+        self.assertEqual(parsed_args.http_timeout, 60)
+        self.assertIsNone(parsed_args.metrics_file)
+        self.assertEqual(parsed_args.metrics_format, 'json')
+        self.assertIsNone(parsed_args.checkpoint_file)
+        self.assertIsNone(parsed_args.output)
+        self.assertEqual(parsed_args.format, 'json')
+        self.assertIsNone(parsed_args.compress)
+        self.assertIsNone(parsed_args.repos_output)
+        self.assertIsNone(parsed_args.fields)
+        self.assertIsNone(parsed_args.event_types)
+        self.assertIsNone(parsed_args.exclude_event_types)
+        self.assertIsNone(parsed_args.repos)
+        self.assertIsNone(parsed_args.exclude_repos)
+        self.assertFalse(parsed_args.watch)
+        self.assertIsNone(parsed_args.poll_interval)
+        self.assertTrue(parsed_args.pacing)
+        self.assertIsNone(parsed_args.users_file)
+        self.assertIsNone(parsed_args.processes)
+        self.assertIsNone(parsed_args.shard_size)
+        self.assertFalse(parsed_args.pipeline)
+        self.assertFalse(parsed_args.aggregate)
+        self.assertIsNone(parsed_args.merge_summary)
+        self.assertIsNone(parsed_args.queue_size)
+
+        parsed_args = parser.parse_args(args + ['--short-circuit'])
+        self.assertTrue(parsed_args.short_circuit)
+
+        parsed_args = parser.parse_args(args + ['-t', 'ijklmnop'])
+        self.assertListEqual(parsed_args.api_token, ['abcdefgh', 'ijklmnop'])
+
+    @httpretty.activate
+    def test_run(self):
+        """Test whether the events are written to the output"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'events.ndjson')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa',
+                            '--format', 'ndjson', '-o', output)
+        cmd.run()
+
+        with open(output) as f:
+            events = [json.loads(line) for line in f]
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['type'], 'PushEvent')
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa',
+                            '--format', 'ndjson', '-o', output,
+                            '--event-types', 'PushEvent, CreateEvent',
+                            '--fields', 'id,type')
+        cmd.run()
+
+        with open(output) as f:
+            events = [json.loads(line) for line in f]
+
+        self.assertListEqual(events, [{'id': '7527388148', 'type': 'PushEvent'},
+                                      {'id': '7527041378', 'type': 'CreateEvent'}])
+
+    @httpretty.activate
+    def test_run_pipeline(self):
+        """Test whether the events are written by the pipeline"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'events.ndjson')
+        checkpoint_file = os.path.join(tmp_path, 'checkpoints.json')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa',
+                            '--format', 'ndjson', '-o', output,
+                            '--pipeline', '--queue-size', '1',
+                            '--checkpoint-file', checkpoint_file)
+        cmd.run()
+
+        with open(output) as f:
+            events = [json.loads(line) for line in f]
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(events[0]['type'], 'PushEvent')
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+        self.assertEqual(CheckpointStore(checkpoint_file).get('valeriocos')['id'], '7527388148')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '--pipeline', '--watch')
+        with self.assertRaises(ValueError):
+            cmd.run()
+
+    @httpretty.activate
+    def test_run_aggregate(self):
+        """Test whether the summary of the events is written"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'summary.json')
+        checkpoint_file = os.path.join(tmp_path, 'checkpoints.json')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '-o', output,
+                            '--aggregate', '--checkpoint-file', checkpoint_file)
+        cmd.run()
+
+        with open(output) as f:
+            summary = json.load(f)
+
+        self.assertEqual(summary['valeriocos']['events'], 3)
+        self.assertEqual(summary['valeriocos']['types']['PushEvent'], 1)
+        self.assertEqual(CheckpointStore(checkpoint_file).get('valeriocos')['id'], '7527388148')
+
+        # no repos are fetched
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 0)
+
+        # the summary of the previous run is merged
+        total = os.path.join(tmp_path, 'total.json')
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '-o', total,
+                            '--aggregate', '--pipeline', '--merge-summary', output)
+        cmd.run()
+
+        with open(total) as f:
+            summary = json.load(f)
+
+        self.assertEqual(summary['valeriocos']['events'], 6)
+        self.assertEqual(summary['valeriocos']['types']['PushEvent'], 2)
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '--aggregate', '--fields', 'id')
+        with self.assertRaises(ValueError):
+            cmd.run()
+
+    @httpretty.activate
+    def test_run_users_file(self):
+        """Test whether the events of a file of users are written in order"""
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.GET,
+                               GITHUB_API_URL + "/users/jgbarah/events/public",
+                               body=read_file('data/events_page_2'),
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '20',
+                                   'X-RateLimit-Reset': '5'
+                               })
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'events.ndjson')
+        users_file = os.path.join(tmp_path, 'users.txt')
+
+        with open(users_file, 'w') as f:
+            f.write('jgbarah\n\nvaleriocos\n')
+
+        cmd = GHubbyCommand('--users-file', users_file, '-t', 'aaa',
+                            '--processes', '2', '--shard-size', '1',
+                            '--format', 'ndjson', '-o', output,
+                            '--fields', 'id,actor.login')
+        cmd.run()
+
+        with open(output) as f:
+            events = [json.loads(line) for line in f]
+
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events[0]['id'], '7527041378')
+        self.assertEqual(events[1]['id'], '7527388148')
+
+        cmd = GHubbyCommand('--users-file', users_file, '-u', 'valeriocos', '-t', 'aaa')
+        with self.assertRaises(ValueError):
+            cmd.run()
+
+    @httpretty.activate
+    def test_run_metrics(self):
+        """Test whether the metrics of the run are written"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'events.ndjson')
+        metrics_file = os.path.join(tmp_path, 'metrics.prom')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '-o', output,
+                            '--metrics-file', metrics_file,
+                            '--metrics-format', 'prometheus')
+        cmd.run()
+
+        with open(metrics_file) as f:
+            lines = f.read().splitlines()
+
+        self.assertIn('ghubby_requests_total{kind="events",status="200"} 2', lines)
+        self.assertIn('ghubby_events_total{user="valeriocos"} 3', lines)
+
+    @httpretty.activate
+    def test_run_repos_output(self):
+        """Test whether repos are written once to a separate output"""
+
+        setup_http_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        output = os.path.join(tmp_path, 'events.ndjson')
+        repos_output = os.path.join(tmp_path, 'repos.ndjson')
+
+        cmd = GHubbyCommand('-u', 'valeriocos', '-t', 'aaa', '--format', 'ndjson',
+                            '-o', output, '--repos-output', repos_output)
+        cmd.run()
+
+        with open(output) as f:
+            events = [json.loads(line) for line in f]
+        with open(repos_output) as f:
+            repos = {repo['id']: repo for repo in (json.loads(line) for line in f)}
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(len(repos), 2)
+
+        for event in events:
+            self.assertNotIn('repo_data', event)
+            self.assertIn(event['repo_data_id'], repos)
+
+        self.assertEqual(repos[events[0]['repo_data_id']]['name'], 'GrimoireELK')
+        self.assertEqual(repos[events[1]['repo_data_id']]['name'], 'mordred')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import httpretty
+
+from ghubby.cache import SQLiteCache
+from ghubby.ghubby import GhubbyClient
+from ghubby.graphql import GraphQLRepoResolver
+
+from .test_ghubby import (GITHUB_API_URL,
+                          count_requests,
+                          read_file,
+                          setup_http_server)
+
+
+GITHUB_GRAPHQL_URL = GITHUB_API_URL + "/graphql"
+
+
+def setup_graphql_server():
+    """Register the GraphQL API call"""
+
+    httpretty.register_uri(httpretty.POST,
+                           GITHUB_GRAPHQL_URL,
+                           body=read_file('data/graphql_repos'),
+                           status=200,
+                           forcing_headers={
+                               'X-RateLimit-Remaining': '20',
+                               'X-RateLimit-Reset': '15'
+                           })
+
+
+class TestGraphQLRepoResolver(unittest.TestCase):
+    """GraphQLRepoResolver tests"""
+
+    def test_build_query(self):
+        """Test whether repos are queried with aliases and variables"""
+
+        query, variables = GraphQLRepoResolver.build_query(['valeriocos/GrimoireELK',
+                                                            'chaoss/grimoirelab-mordred'])
+
+        self.assertIn('query($o0: String!, $n0: String!, $o1: String!, $n1: String!)', query)
+        self.assertIn('r0: repository(owner: $o0, name: $n0) { ...repo }', query)
+        self.assertIn('r1: repository(owner: $o1, name: $n1) { ...repo }', query)
+        self.assertIn('fragment repo on Repository', query)
+
+        expected = {
+            'o0': 'valeriocos',
+            'n0': 'GrimoireELK',
+            'o1': 'chaoss',
+            'n1': 'grimoirelab-mordred'
+        }
+        self.assertDictEqual(variables, expected)
+
+    @httpretty.activate
+    def test_url(self):
+        """Test whether the GraphQL endpoint is built from the base URL"""
+
+        setup_http_server()
+
+        client = GhubbyClient("valeriocos", "aaa")
+        resolver = GraphQLRepoResolver(client)
+        self.assertEqual(resolver.url, GITHUB_GRAPHQL_URL)
+
+        client.base_url = 'https://example.com/api/v3'
+        self.assertEqual(resolver.url, 'https://example.com/api/graphql')
+
+    def test_invalid_batch_size(self):
+        """Test whether an error is raised when the batch size is not valid"""
+
+        with self.assertRaises(ValueError):
+            GraphQLRepoResolver(None, batch_size=0)
+
+    @httpretty.activate
+    def test_resolve(self):
+        """Test whether repos are resolved and mapped onto the REST shape"""
+
+        setup_http_server()
+        setup_graphql_server()
+
+        client = GhubbyClient("valeriocos", "aaa")
+        resolver = GraphQLRepoResolver(client)
+        repos = resolver.resolve(['valeriocos/GrimoireELK',
+                                  'chaoss/grimoirelab-mordred'])
+
+        # the repos not found are not included
+        self.assertListEqual(list(repos.keys()), ['valeriocos/GrimoireELK'])
+
+        repo = repos['valeriocos/GrimoireELK']
+        expected = json.loads(read_file('data/repo_1'))
+        for field in ['id', 'name', 'full_name', 'description', 'html_url',
+                      'url', 'clone_url', 'homepage', 'fork', 'private',
+                      'archived', 'created_at', 'updated_at', 'pushed_at',
+                      'size', 'forks_count', 'stargazers_count',
+                      'watchers_count', 'subscribers_count',
+                      'open_issues_count', 'language', 'default_branch',
+                      'license']:
+            self.assertEqual(repo[field], expected[field], field)
+        self.assertEqual(repo['owner']['login'], 'valeriocos')
+
+        self.assertEqual(resolver.requests, 1)
+
+        request = httpretty.last_request()
+        self.assertEqual(request.method, 'POST')
+        self.assertEqual(request.headers['Authorization'], 'token aaa')
+
+        body = json.loads(request.body.decode('utf-8'))
+        self.assertIn('query', body)
+        self.assertEqual(body['variables']['n0'], 'GrimoireELK')
+        self.assertEqual(body['variables']['n1'], 'grimoirelab-mordred')
+
+    @httpretty.activate
+    def test_resolve_error(self):
+        """Test whether no repos are returned when the query fails"""
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.POST,
+                               GITHUB_GRAPHQL_URL,
+                               body='{"message": "Bad credentials"}',
+                               status=401)
+
+        client = GhubbyClient("valeriocos", "aaa")
+        resolver = GraphQLRepoResolver(client)
+        repos = resolver.resolve(['valeriocos/GrimoireELK'])
+
+        self.assertDictEqual(repos, {})
+        self.assertEqual(resolver.requests, 1)
+
+        # the client fetches them from the REST API
+        client = GhubbyClient("valeriocos", "aaa", repo_resolver='graphql')
+        repos = client.repos(['valeriocos/GrimoireELK'])
+
+        self.assertEqual(repos['valeriocos/GrimoireELK']['id'], 116242339)
+        self.assertEqual(httpretty.last_request().path, '/repos/valeriocos/GrimoireELK')
+
+    @httpretty.activate
+    def test_repo_store(self):
+        """Test whether repos resolved with GraphQL are not served to REST clients"""
+
+        setup_http_server()
+        setup_graphql_server()
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        repo_store = SQLiteCache(os.path.join(tmp_path, 'repos.db'))
+
+        client = GhubbyClient("valeriocos", "aaa", repo_store=repo_store, repo_resolver='graphql')
+        client.repos(['valeriocos/GrimoireELK'])
+
+        self.assertIsNotNone(repo_store.get('graphql:valeriocos/GrimoireELK'))
+        self.assertIsNone(repo_store.get('valeriocos/GrimoireELK'))
+
+        client = GhubbyClient("valeriocos", "aaa", repo_store=repo_store)
+        repo = client.repo('valeriocos/GrimoireELK')
+
+        self.assertDictEqual(repo, json.loads(read_file('data/repo_1')))
+        self.assertEqual(count_requests('/repos/valeriocos/GrimoireELK'), 1)
+
+    @httpretty.activate
+    def test_resolve_rate_limit(self):
+        """Test whether the GraphQL rate limit does not change the REST one"""
+
+        setup_http_server()
+        httpretty.register_uri(httpretty.POST,
+                               GITHUB_GRAPHQL_URL,
+                               body=read_file('data/graphql_repos'),
+                               status=200,
+                               forcing_headers={
+                                   'X-RateLimit-Remaining': '4000',
+                                   'X-RateLimit-Reset': '15',
+                                   'X-RateLimit-Resource': 'graphql'
+                               })
+
+        client = GhubbyClient("valeriocos", "aaa")
+        client.repo('chaoss/grimoirelab-mordred')
+        GraphQLRepoResolver(client).resolve(['valeriocos/GrimoireELK'])
+
+        self.assertEqual(client.tokens.usage()['aaa']['remaining'], 20)
+
+    @httpretty.activate
+    def test_resolve_batches(self):
+        """Test whether repos are split in batches"""
+
+        setup_http_server()
+        setup_graphql_server()
+
+        client = GhubbyClient("valeriocos", "aaa")
+        resolver = GraphQLRepoResolver(client, batch_size=2)
+        resolver.resolve(['valeriocos/GrimoireELK',
+                          'chaoss/grimoirelab-mordred',
+                          'chaoss/grimoirelab-perceval',
+                          'valeriocos/GrimoireELK'])
+
+        self.assertEqual(resolver.requests, 2)
+
+        body = json.loads(httpretty.last_request().body.decode('utf-8'))
+        self.assertDictEqual(body['variables'], {'o0': 'chaoss',
+                                                 'n0': 'grimoirelab-perceval'})
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ghubby.metrics import Metrics, request_kind
+
+
+class TestMetrics(unittest.TestCase):
+    """Metrics tests"""
+
+    def test_request_kind(self):
+        """Test whether API URLs are classified"""
+
+        self.assertEqual(request_kind('https://api.github.com/users/valeriocos/events/public'),
+                         'events')
+        self.assertEqual(request_kind('https://api.github.com/repos/chaoss/perceval'), 'repos')
+        self.assertEqual(request_kind('https://api.github.com/graphql'), 'graphql')
+        self.assertEqual(request_kind('https://example.com/api/v3/rate_limit'), 'rate_limit')
+        self.assertEqual(request_kind('https://api.github.com/users/valeriocos'), 'other')
+
+    def test_as_dict(self):
+        """Test whether the records are aggregated"""
+
+        metrics = Metrics()
+        metrics.request('https://api.github.com/users/valeriocos/events/public', 200, 0.5, 100)
+        metrics.request('https://api.github.com/users/valeriocos/events/public', 304, 0.25, 0)
+        metrics.request('https://api.github.com/repos/chaoss/perceval', 404, 0.1, 10)
+        metrics.cache('repo', True)
+        metrics.cache('repo', False)
+        metrics.cache('repo', True)
+        metrics.rate_limit_wait(3)
+        metrics.parse(0.5, 20)
+        metrics.event('valeriocos')
+        metrics.event('valeriocos')
+
+        expected = {
+            'requests': {
+                'events': {
+                    'status': {'200': 1, '304': 1},
+                    'count': 2,
+                    'seconds': 0.75,
+                    'bytes': 100
+                },
+                'repos': {
+                    'status': {'404': 1},
+                    'count': 1,
+                    'seconds': 0.1,
+                    'bytes': 10
+                }
+            },
+            'caches': {
+                'repo': {'hits': 2, 'misses': 1}
+            },
+            'rate_limit_wait_seconds': 3,
+            'parse': {'seconds': 0.5, 'bytes': 20},
+            'events': {'valeriocos': 2}
+        }
+        self.assertDictEqual(metrics.as_dict(), expected)
+        self.assertDictEqual(json.loads(metrics.to_json()), expected)
+
+    def test_to_prometheus(self):
+        """Test whether the metrics are exported in the Prometheus text format"""
+
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.request('https://api.github.com/repos/chaoss/perceval', 200, 0.5, 10)
+        metrics.request('https://api.github.com/repos/chaoss/perceval', 200, 0.05, 10)
+        metrics.cache('repo', False)
+        metrics.event('val"eriocos')
+
+        lines = metrics.to_prometheus().splitlines()
+
+        self.assertIn('# TYPE ghubby_requests_total counter', lines)
+        self.assertIn('ghubby_requests_total{kind="repos",status="200"} 2', lines)
+        self.assertIn('# TYPE ghubby_request_duration_seconds histogram', lines)
+        self.assertIn('ghubby_request_duration_seconds_bucket{kind="repos",le="0.1"} 1', lines)
+        self.assertIn('ghubby_request_duration_seconds_bucket{kind="repos",le="1"} 2', lines)
+        self.assertIn('ghubby_request_duration_seconds_bucket{kind="repos",le="+Inf"} 2', lines)
+        self.assertIn('ghubby_request_duration_seconds_count{kind="repos"} 2', lines)
+        self.assertIn('ghubby_response_bytes_total{kind="repos"} 20', lines)
+        self.assertIn('ghubby_cache_lookups_total{cache="repo",result="hit"} 0', lines)
+        self.assertIn('ghubby_cache_lookups_total{cache="repo",result="miss"} 1', lines)
+        self.assertIn('ghubby_rate_limit_wait_seconds_total 0.0', lines)
+        self.assertIn('ghubby_events_total{user="val\\"eriocos"} 1', lines)
+
+    def test_hooks(self):
+        """Test whether hooks are called with every record"""
+
+        records = []
+
+        def failing_hook(name, data):
+            raise RuntimeError("hook failed")
+
+        metrics = Metrics()
+        metrics.add_hook(failing_hook)
+        metrics.add_hook(lambda name, data: records.append((name, data)))
+
+        metrics.cache('repo', True)
+        metrics.event('valeriocos')
+
+        self.assertListEqual(records, [('cache', {'cache': 'repo', 'hit': True}),
+                                       ('event', {'user': 'valeriocos'})])
+
+        metrics.remove_hook(failing_hook)
+        metrics.rate_limit_wait(1)
+        self.assertEqual(records[-1], ('rate_limit_wait', {'seconds': 1}))
+
+    def test_dump(self):
+        """Test whether the metrics are written to a file"""
+
+        tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+
+        metrics = Metrics()
+        metrics.event('valeriocos')
+
+        path = os.path.join(tmp_path, 'metrics.json')
+        metrics.dump(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['events'], {'valeriocos': 1})
+
+        path = os.path.join(tmp_path, 'metrics.prom')
+        metrics.dump(path, fmt='prometheus')
+        with open(path) as f:
+            self.assertIn('ghubby_events_total{user="valeriocos"} 1', f.read())
+
+        with self.assertRaises(ValueError):
+            metrics.dump(path, fmt='xml')
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import zlib
+
+from ghubby.output import EventWriter, NormalizedWriter
+
+
+EVENTS = [
+    {'id': '7527388148', 'type': 'PushEvent', 'repo': {'name': 'valeriocos/GrimoireELK'}},
+    {'id': '7527054699', 'type': 'PullRequestEvent', 'repo': {'name': 'chaoss/grimoirelab-mordred'}}
+]
+
+
+class TestEventWriter(unittest.TestCase):
+    """EventWriter tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        path = os.path.join(self.tmp_path, 'events.json')
+        writer = EventWriter(path)
+
+        self.assertEqual(writer.path, path)
+        self.assertEqual(writer.fmt, 'json')
+        self.assertIsNone(writer.compression)
+        self.assertEqual(writer.count, 0)
+
+        writer.close()
+
+    def test_invalid_parameters(self):
+        """Test whether an error is raised when the format or compression are not valid"""
+
+        with self.assertRaises(ValueError):
+            EventWriter(fmt='xml')
+
+        with self.assertRaises(ValueError):
+            EventWriter(compression='bz2')
+
+    def test_write_json(self):
+        """Test whether events are written as pretty-printed JSON"""
+
+        path = os.path.join(self.tmp_path, 'events.json')
+
+        with EventWriter(path) as writer:
+            for event in EVENTS:
+                writer.write(event)
+
+        self.assertEqual(writer.count, 2)
+
+        with open(path) as f:
+            content = f.read()
+
+        expected = ''.join(json.dumps(event, sort_keys=True, indent=4) + '\n'
+                           for event in EVENTS)
+        self.assertEqual(content, expected)
+
+    def test_write_ndjson(self):
+        """Test whether events are written one per line"""
+
+        path = os.path.join(self.tmp_path, 'events.ndjson')
+
+        with EventWriter(path, fmt='ndjson') as writer:
+            for event in EVENTS:
+                writer.write(event)
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn(' ', lines[0])
+        self.assertListEqual([json.loads(line) for line in lines], EVENTS)
+
+    def test_write_gzip(self):
+        """Test whether events are compressed with gzip"""
+
+        path = os.path.join(self.tmp_path, 'events.ndjson.gz')
+
+        with EventWriter(path, fmt='ndjson', compression='gzip') as writer:
+            for event in EVENTS:
+                writer.write(event)
+
+        with gzip.open(path, 'rt') as f:
+            lines = f.read().splitlines()
+
+        self.assertListEqual([json.loads(line) for line in lines], EVENTS)
+
+    def test_copy(self):
+        """Test whether encoded events are copied to the output"""
+
+        path = os.path.join(self.tmp_path, 'events.ndjson')
+        shard_path = os.path.join(self.tmp_path, 'shard.ndjson')
+
+        with EventWriter(shard_path, fmt='ndjson') as writer:
+            writer.write(EVENTS[1])
+
+        with EventWriter(path, fmt='ndjson') as writer:
+            writer.write(EVENTS[0])
+            writer.copy(shard_path, 1)
+
+        self.assertEqual(writer.count, 2)
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+        self.assertListEqual([json.loads(line) for line in lines], EVENTS)
+
+    def test_flush(self):
+        """Test whether buffered events are written when the writer is flushed"""
+
+        path = os.path.join(self.tmp_path, 'events.ndjson')
+        gz_path = os.path.join(self.tmp_path, 'events.ndjson.gz')
+
+        writer = EventWriter(path, fmt='ndjson')
+        gz_writer = EventWriter(gz_path, fmt='ndjson', compression='gzip')
+
+        for w in [writer, gz_writer]:
+            w.write(EVENTS[0])
+            w.flush()
+
+        with open(path) as f:
+            self.assertDictEqual(json.loads(f.read()), EVENTS[0])
+
+        # the compressed stream is not finished yet, but it can be read
+        with open(gz_path, 'rb') as f:
+            content = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read())
+        self.assertDictEqual(json.loads(content), EVENTS[0])
+
+        writer.close()
+        gz_writer.close()
+
+    def test_write_stdout(self):
+        """Test whether events are written to the standard output"""
+
+        stdout = unittest.mock.Mock()
+        stdout.buffer = io.BytesIO()
+
+        with unittest.mock.patch('ghubby.output.sys.stdout', stdout):
+            with EventWriter('-', fmt='ndjson') as writer:
+                writer.write(EVENTS[0])
+
+        self.assertFalse(stdout.buffer.closed)
+        self.assertDictEqual(json.loads(stdout.buffer.getvalue()), EVENTS[0])
+
+
+class TestNormalizedWriter(unittest.TestCase):
+    """NormalizedWriter tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_write(self):
+        """Test whether each repo is written once and removed from the events"""
+
+        repo_1 = {'id': 116242339, 'name': 'GrimoireELK'}
+        repo_2 = {'id': 76512683, 'name': 'mordred'}
+        events = [
+            {'id': '1', 'repo': {'id': 116242339}, 'repo_data': repo_1},
+            {'id': '2', 'repo': {'id': 76512683}, 'repo_data': repo_2},
+            {'id': '3', 'repo': {'id': 116242339}, 'repo_data': repo_1},
+            {'id': '4', 'repo': {'id': 1}}
+        ]
+
+        events_path = os.path.join(self.tmp_path, 'events.ndjson')
+        repos_path = os.path.join(self.tmp_path, 'repos.ndjson')
+
+        with NormalizedWriter(EventWriter(events_path, fmt='ndjson'),
+                              EventWriter(repos_path, fmt='ndjson')) as writer:
+            for event in events:
+                writer.write(event)
+
+        self.assertEqual(writer.count, 4)
+
+        with open(events_path) as f:
+            written = [json.loads(line) for line in f]
+
+        self.assertListEqual([event['id'] for event in written], ['1', '2', '3', '4'])
+        self.assertListEqual([event.get('repo_data_id') for event in written],
+                             [116242339, 76512683, 116242339, None])
+        for event in written:
+            self.assertNotIn('repo_data', event)
+
+        # Events given to the writer are not modified
+        self.assertIn('repo_data', events[0])
+
+        with open(repos_path) as f:
+            repos = [json.loads(line) for line in f]
+
+        self.assertListEqual(repos, [repo_1, repo_2])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import httpretty
+
+from ghubby.checkpoint import CheckpointStore
+from ghubby.ghubby import Ghubby
+from ghubby.pipeline import EventPipeline, Pipeline, Stage
+
+from .test_ghubby import setup_http_server
+
+
+class TestPipeline(unittest.TestCase):
+    """Pipeline tests"""
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        pipeline = Pipeline(range(3), [Stage('write', print)], queue_size=5)
+
+        self.assertEqual(pipeline.queue_size, 5)
+        self.assertListEqual([stage.name for stage in pipeline.stages], ['source', 'write'])
+
+        with self.assertRaises(ValueError):
+            Pipeline(range(3), [])
+
+        with self.assertRaises(ValueError):
+            Pipeline(range(3), [Stage('write', print)], queue_size=0)
+
+        with self.assertRaises(ValueError):
+            Stage('write', print, batch_size=0)
+
+    def test_run(self):
+        """Test whether items pass through the stages in order"""
+
+        items = []
+        pipeline = Pipeline(range(100),
+                            [Stage('double', lambda item: item * 2),
+                             Stage('write', items.append)],
+                            queue_size=3)
+        pipeline.run()
+
+        self.assertListEqual(items, [i * 2 for i in range(100)])
+
+        stats = pipeline.stats()
+        self.assertListEqual(list(stats['stages']), ['source', 'double', 'write'])
+        for stage in stats['stages'].values():
+            self.assertEqual(stage['items'], 100)
+
+        self.assertEqual(len(stats['queues']), 2)
+        self.assertEqual(stats['queues'][0]['from'], 'source')
+        self.assertEqual(stats['queues'][0]['to'], 'double')
+        self.assertEqual(stats['queues'][0]['depth'], 0)
+        self.assertEqual(stats['queues'][0]['size'], 3)
+        self.assertLessEqual(stats['queues'][0]['max_depth'], 3)
+
+    def test_run_batch(self):
+        """Test whether a batch stage gets the items waiting in the queue"""
+
+        batches = []
+        items = []
+
+        def double(batch):
+            batches.append(len(batch))
+            return [item * 2 for item in batch]
+
+        gate = threading.Event()
+
+        def source():
+            for i in range(10):
+                yield i
+            gate.set()
+
+        def enrich(batch):
+            gate.wait()
+            return double(batch)
+
+        pipeline = Pipeline(source(),
+                            [Stage('double', enrich, batch_size=4),
+                             Stage('write', items.append)],
+                            queue_size=10)
+        pipeline.run()
+
+        self.assertListEqual(items, [i * 2 for i in range(10)])
+        self.assertTrue(all(size <= 4 for size in batches))
+        self.assertEqual(sum(batches), 10)
+        self.assertGreater(max(batches), 1)
+
+    def test_backpressure(self):
+        """Test whether the source runs ahead of a slow sink up to the queue size"""
+
+        gate = threading.Event()
+        items = []
+
+        def write(item):
+            gate.wait()
+            items.append(item)
+
+        pipeline = Pipeline(range(50), [Stage('write', write)], queue_size=5)
+
+        thread = threading.Thread(target=pipeline.run)
+        thread.start()
+
+        time.sleep(0.5)
+        stats = pipeline.stats()
+
+        # one item written, five queued and one waiting to be queued
+        self.assertEqual(stats['stages']['source']['items'], 7)
+        self.assertEqual(stats['queues'][0]['depth'], 5)
+        self.assertEqual(stats['queues'][0]['max_depth'], 5)
+
+        gate.set()
+        thread.join()
+
+        self.assertListEqual(items, list(range(50)))
+        stats = pipeline.stats()
+        self.assertGreater(stats['stages']['source']['blocked_seconds'], 0.1)
+        self.assertGreater(stats['stages']['write']['busy_seconds'], 0.1)
+
+    def test_stage_error(self):
+        """Test whether the error of a stage stops the pipeline"""
+
+        closed = []
+
+        def source():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                closed.append(True)
+
+        def write(item):
+            if item == 10:
+                raise RuntimeError("boom")
+
+        pipeline = Pipeline(source(), [Stage('write', write)], queue_size=2)
+
+        with self.assertRaisesRegex(RuntimeError, 'boom'):
+            pipeline.run()
+
+        self.assertListEqual(closed, [True])
+        self.assertLess(pipeline.stats()['stages']['source']['items'], 1000)
+
+    def test_source_error(self):
+        """Test whether the error of the source is raised"""
+
+        items = []
+
+        def source():
+            yield 1
+            raise ValueError("broken")
+
+        pipeline = Pipeline(source(), [Stage('double', lambda item: item * 2),
+                                       Stage('write', items.append)])
+
+        with self.assertRaisesRegex(ValueError, 'broken'):
+            pipeline.run()
+
+
+class TestEventPipeline(unittest.TestCase):
+    """EventPipeline tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='ghubby_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    @httpretty.activate
+    def test_run(self):
+        """Test whether events are fetched, enriched and written"""
+
+        setup_http_server()
+
+        events = []
+        ghubby = Ghubby('valeriocos', 'aaa')
+        pipeline = EventPipeline(ghubby, events.append, queue_size=2)
+
+        self.assertListEqual([stage.name for stage in pipeline.stages], ['fetch', 'enrich', 'write'])
+
+        pipeline.run()
+
+        self.assertListEqual([event['id'] for event in events],
+                             ['7527388148', '7527054699', '7527041378'])
+        self.assertEqual(events[0]['repo_data']['name'], 'GrimoireELK')
+        self.assertEqual(events[1]['repo_data']['name'], 'mordred')
+        self.assertTrue(all(event.resolved for event in events))
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['stages']['enrich']['items'], 3)
+        self.assertEqual(stats['stages']['write']['items'], 3)
+
+    @httpretty.activate
+    def test_run_no_repos(self):
+        """Test whether there is no enrich stage when repos are not resolved"""
+
+        setup_http_server()
+
+        events = []
+        ghubby = Ghubby('valeriocos', 'aaa')
+        pipeline = EventPipeline(ghubby, events.append, resolve_repos='none',
+                                 fields=['id', 'type'])
+
+        self.assertListEqual([stage.name for stage in pipeline.stages], ['fetch', 'write'])
+
+        pipeline.run()
+
+        self.assertListEqual(events, [{'id': '7527388148', 'type': 'PushEvent'},
+                                      {'id': '7527054699', 'type': 'PullRequestEvent'},
+                                      {'id': '7527041378', 'type': 'CreateEvent'}])
+
+    @httpretty.activate
+    def test_checkpoints(self):
+        """Test whether the checkpoint is saved only when events are written"""
+
+        setup_http_server()
+
+        checkpoints = CheckpointStore(os.path.join(self.tmp_path, 'checkpoints.json'))
+        ghubby = Ghubby('valeriocos', 'aaa', checkpoints=checkpoints)
+
+        def failing_write(event):
+            if event['id'] == '7527041378':
+                raise RuntimeError("boom")
+
+        pipeline = EventPipeline(ghubby, failing_write)
+
+        with self.assertRaises(RuntimeError):
+            pipeline.run()
+
+        self.assertIsNone(checkpoints.get('valeriocos'))
+        self.assertIs(ghubby.checkpoints, checkpoints)
+
+        events = []
+        pipeline = EventPipeline(ghubby, events.append)
+        pipeline.run()
+
+        self.assertEqual(len(events), 3)
+        self.assertEqual(checkpoints.get('valeriocos')['id'], '7527388148')
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
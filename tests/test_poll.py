@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+import unittest.mock
+
+import requests
+
+from ghubby.poll import EventsPoll
+
+
+def build_response(status, headers):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+
+    return response
+
+
+class TestEventsPoll(unittest.TestCase):
+    """EventsPoll tests"""
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        poll = EventsPoll()
+
+        self.assertEqual(poll.min_interval, 0)
+        self.assertEqual(poll.interval, 60)
+        self.assertIsNone(poll.etag)
+        self.assertIsNone(poll.headers)
+        self.assertTrue(poll.modified)
+        self.assertEqual(poll.polls, 0)
+
+    def test_update(self):
+        """Test whether the state is updated from the responses"""
+
+        poll = EventsPoll()
+
+        poll.update(build_response(200, {'ETag': '"a"', 'X-Poll-Interval': '30'}))
+        self.assertTrue(poll.modified)
+        self.assertEqual(poll.interval, 30)
+        self.assertDictEqual(poll.headers, {'If-None-Match': '"a"'})
+
+        poll.update(build_response(304, {'ETag': '"a"', 'X-Poll-Interval': '90'}))
+        self.assertFalse(poll.modified)
+        self.assertEqual(poll.interval, 90)
+        self.assertEqual(poll.etag, '"a"')
+
+        poll.update(build_response(200, {'ETag': '"b"'}))
+        self.assertTrue(poll.modified)
+        self.assertEqual(poll.interval, 90)
+        self.assertEqual(poll.etag, '"b"')
+        self.assertEqual(poll.polls, 3)
+
+    def test_update_first_poll(self):
+        """Test whether a 304 is modified when the poll did not send the ETag"""
+
+        poll = EventsPoll()
+
+        poll.update(build_response(304, {'ETag': '"a"'}))
+        self.assertTrue(poll.modified)
+        self.assertEqual(poll.etag, '"a"')
+
+        poll.update(build_response(304, {'ETag': '"a"'}))
+        self.assertFalse(poll.modified)
+
+    @unittest.mock.patch('ghubby.poll.time.sleep')
+    @unittest.mock.patch('ghubby.poll.time.monotonic')
+    def test_wait(self, mock_monotonic, mock_sleep):
+        """Test whether polls are spaced by the longest interval"""
+
+        mock_monotonic.return_value = 100
+        poll = EventsPoll(min_interval=10)
+
+        # The first poll is not delayed
+        self.assertEqual(poll.wait(), 0)
+
+        poll.update(build_response(200, {'X-Poll-Interval': '60'}))
+        mock_monotonic.return_value = 120
+        self.assertEqual(poll.wait(), 40)
+        mock_sleep.assert_called_once_with(40)
+
+        poll = EventsPoll(min_interval=90)
+        mock_monotonic.return_value = 100
+        poll.update(build_response(200, {'X-Poll-Interval': '60'}))
+        mock_monotonic.return_value = 200
+        self.assertEqual(poll.wait(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
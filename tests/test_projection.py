@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+
+from ghubby.projection import parse_fields, project, repo_fields
+
+
+class TestProjection(unittest.TestCase):
+    """Projection functions tests"""
+
+    def test_parse_fields(self):
+        """Test whether dotted field paths are parsed into a tree"""
+
+        tree = parse_fields(['type', 'payload.action', 'payload.pull_request.number'])
+        expected = {
+            'type': None,
+            'payload': {
+                'action': None,
+                'pull_request': {
+                    'number': None
+                }
+            }
+        }
+        self.assertDictEqual(tree, expected)
+
+        # A whole field takes precedence over its subfields
+        self.assertDictEqual(parse_fields(['repo.name', 'repo']), {'repo': None})
+        self.assertDictEqual(parse_fields(['repo', 'repo.name']), {'repo': None})
+
+        self.assertDictEqual(parse_fields([]), {})
+
+    def test_project(self):
+        """Test whether only the selected fields are kept"""
+
+        event = {
+            'id': '7527388148',
+            'type': 'PushEvent',
+            'repo': {'id': 116242339, 'name': 'valeriocos/GrimoireELK'},
+            'payload': {
+                'size': 2,
+                'commits': [
+                    {'sha': 'abc', 'message': 'first'},
+                    {'sha': 'def', 'message': 'second'}
+                ]
+            }
+        }
+
+        tree = parse_fields(['type', 'repo.name', 'payload.commits.sha', 'public'])
+        expected = {
+            'type': 'PushEvent',
+            'repo': {'name': 'valeriocos/GrimoireELK'},
+            'payload': {
+                'commits': [{'sha': 'abc'}, {'sha': 'def'}]
+            }
+        }
+        self.assertDictEqual(project(event, tree), expected)
+
+        # The object is not modified
+        self.assertEqual(len(event['payload']['commits'][0]), 2)
+
+    def test_repo_fields(self):
+        """Test whether the fields of repo_data are extracted"""
+
+        self.assertListEqual(repo_fields(['type', 'repo_data.name', 'repo_data.owner.login']),
+                             ['name', 'owner.login'])
+        self.assertIsNone(repo_fields(['type', 'repo_data', 'repo_data.name']))
+        self.assertListEqual(repo_fields(['type', 'repo.name']), [])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
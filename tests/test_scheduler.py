@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import os
+import threading
+import time
+import unittest
+
+import requests
+
+from ghubby.scheduler import (HIGH_PRIORITY,
+                              LOW_PRIORITY,
+                              PRIMARY_RATE_LIMIT,
+                              SECONDARY_RATE_LIMIT,
+                              RateLimitScheduler,
+                              rate_limit_kind,
+                              retry_after)
+from ghubby.tokens import TokenPool
+
+
+def read_file(filename, mode='r'):
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           filename),
+              mode) as f:
+        content = f.read()
+    return content
+
+
+def build_response(status=200, headers=None, body=''):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = body.encode('utf-8')
+
+    return response
+
+
+def build_pool(remaining, seconds_to_reset):
+    """Build a pool whose token spends `remaining` requests in `seconds_to_reset`"""
+
+    pool = TokenPool(['aaa'], min_rate_to_sleep=0)
+    pool.update('aaa', build_response(headers={
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(int(time.time() + seconds_to_reset))
+    }))
+
+    return pool
+
+
+class TestRateLimitKind(unittest.TestCase):
+    """rate_limit_kind and retry_after tests"""
+
+    def test_rate_limit_kind(self):
+        """Test whether the rate limits are told from other errors"""
+
+        abuse = read_file('data/abuse_rate_limit')
+
+        self.assertIsNone(rate_limit_kind(build_response(200)))
+        self.assertIsNone(rate_limit_kind(build_response(404)))
+        self.assertIsNone(rate_limit_kind(build_response(403, body='{"message": "Forbidden"}')))
+        self.assertEqual(rate_limit_kind(build_response(403, body=abuse)), SECONDARY_RATE_LIMIT)
+        self.assertEqual(rate_limit_kind(build_response(429, headers={'Retry-After': '30'})),
+                         SECONDARY_RATE_LIMIT)
+        self.assertEqual(rate_limit_kind(build_response(403, headers={'X-RateLimit-Remaining': '0'})),
+                         PRIMARY_RATE_LIMIT)
+
+    def test_retry_after(self):
+        """Test whether the Retry-After header is parsed"""
+
+        self.assertIsNone(retry_after(build_response(403)))
+        self.assertIsNone(retry_after(build_response(403, headers={'Retry-After': 'soon'})))
+        self.assertEqual(retry_after(build_response(403, headers={'Retry-After': '30'})), 30)
+        self.assertEqual(retry_after(build_response(403, headers={'Retry-After': '-1'})), 0)
+
+        date = build_response(403, headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(retry_after(date), 0)
+
+
+class TestRateLimitScheduler(unittest.TestCase):
+    """RateLimitScheduler tests"""
+
+    def test_invalid_burst(self):
+        """Test whether an error is raised with an invalid burst"""
+
+        with self.assertRaises(ValueError):
+            RateLimitScheduler(TokenPool(['aaa']), burst=0)
+
+    def test_unknown_rate(self):
+        """Test whether requests are not paced while the rate limit is unknown"""
+
+        scheduler = RateLimitScheduler(TokenPool(['aaa']), burst=1)
+
+        start = time.monotonic()
+        for _ in range(20):
+            scheduler.acquire()
+
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_pacing(self):
+        """Test whether requests are spread after the burst"""
+
+        # 10 requests per second
+        scheduler = RateLimitScheduler(build_pool(1000, 100), burst=2, pace_below=None)
+
+        start = time.monotonic()
+        waits = [scheduler.acquire() for _ in range(5)]
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 0.25)
+        self.assertLess(elapsed, 1)
+
+        # the waits are reported however short they are
+        self.assertListEqual(waits[:2], [0, 0])
+        self.assertTrue(all(0 < wait < 0.5 for wait in waits[2:]))
+        self.assertGreaterEqual(sum(waits), 0.25)
+
+    def test_pace_below(self):
+        """Test whether requests are paced only when the remaining requests are low"""
+
+        scheduler = RateLimitScheduler(build_pool(5000, 100), burst=1, pace_below=1000)
+
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(scheduler.acquire(), 0)
+
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        # 9 requests per second
+        scheduler = RateLimitScheduler(build_pool(900, 100), burst=1, pace_below=1000)
+
+        start = time.monotonic()
+        for _ in range(3):
+            scheduler.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_no_pacing(self):
+        """Test whether requests are not spread when pacing is disabled"""
+
+        scheduler = RateLimitScheduler(build_pool(100, 100), burst=1, pace=False)
+
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(scheduler.acquire(), 0)
+
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_backoff(self):
+        """Test whether requests are held after a backoff"""
+
+        scheduler = RateLimitScheduler(TokenPool(['aaa']), backoff_factor=0.1, max_backoff=0.3)
+
+        self.assertEqual(scheduler.backoff(), 0.1)
+        self.assertEqual(scheduler.backoff(), 0.2)
+        self.assertEqual(scheduler.backoff(), 0.3)
+        self.assertEqual(scheduler.backoffs, 3)
+
+        waited = scheduler.acquire()
+        self.assertGreaterEqual(waited, 0.25)
+
+        scheduler.succeeded()
+        self.assertEqual(scheduler.backoffs, 0)
+
+        # Retry-After is honored as given
+        self.assertEqual(scheduler.backoff(0.05), 0.05)
+        self.assertGreaterEqual(scheduler.acquire(), 0.04)
+
+    def test_priority(self):
+        """Test whether waiting requests are served by priority"""
+
+        # 20 requests per second
+        scheduler = RateLimitScheduler(build_pool(2000, 100), burst=1, pace_below=None)
+        scheduler.acquire()
+
+        order = []
+
+        def request(name, priority):
+            scheduler.acquire(priority)
+            order.append(name)
+
+        threads = [threading.Thread(target=request, args=('bulk-%i' % i, LOW_PRIORITY))
+                   for i in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+
+        thread = threading.Thread(target=request, args=('interactive', HIGH_PRIORITY))
+        thread.start()
+        threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order[-1], 'bulk-2')
+        self.assertLess(order.index('interactive'), 2)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
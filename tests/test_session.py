@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+import unittest.mock
+
+import httpretty
+import requests
+
+from ghubby.session import TimeoutHTTPAdapter, create_session
+
+
+GITHUB_RATE_LIMIT = "https://api.github.com/rate_limit"
+
+
+class TestCreateSession(unittest.TestCase):
+    """create_session tests"""
+
+    def test_session(self):
+        """Test whether the session is set up with a pooled adapter"""
+
+        session = create_session(pool_size=25, timeout=5, max_retries=3)
+
+        adapter = session.get_adapter('https://api.github.com')
+        self.assertIsInstance(adapter, TimeoutHTTPAdapter)
+        self.assertIs(session.get_adapter('http://example.com'), adapter)
+        self.assertEqual(adapter.timeout, 5)
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(adapter.max_retries.total, 3)
+
+        self.assertIn('User-Agent', session.headers)
+        self.assertNotIn('Authorization', session.headers)
+
+    @httpretty.activate
+    def test_timeout(self):
+        """Test whether the default timeout is used only when none is given"""
+
+        httpretty.register_uri(httpretty.GET, GITHUB_RATE_LIMIT, body='{}', status=200)
+
+        session = create_session(timeout=(1, 2))
+
+        with unittest.mock.patch.object(requests.adapters.HTTPAdapter, 'send',
+                                        autospec=True,
+                                        side_effect=requests.adapters.HTTPAdapter.send) as send:
+            session.get(GITHUB_RATE_LIMIT)
+            self.assertEqual(send.call_args[1]['timeout'], (1, 2))
+
+            session.get(GITHUB_RATE_LIMIT, timeout=7)
+            self.assertEqual(send.call_args[1]['timeout'], 7)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
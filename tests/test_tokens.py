@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import unittest
+import unittest.mock
+
+import requests
+from perceval.errors import RateLimitError
+
+from ghubby.tokens import TokenPool
+
+
+def build_response(remaining, reset):
+    """Build a response with rate limit headers"""
+
+    response = requests.Response()
+    response.headers['X-RateLimit-Remaining'] = str(remaining)
+    response.headers['X-RateLimit-Reset'] = str(reset)
+
+    return response
+
+
+class TestTokenPool(unittest.TestCase):
+    """TokenPool tests"""
+
+    def test_initialization(self):
+        """Test whether attributes are initializated"""
+
+        pool = TokenPool(['aaa', 'bbb', 'aaa'])
+
+        self.assertListEqual(pool.tokens, ['aaa', 'bbb'])
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.min_rate_to_sleep, 10)
+        self.assertTrue(pool.sleep_for_rate)
+
+    def test_no_tokens(self):
+        """Test whether an error is raised when no tokens are given"""
+
+        with self.assertRaises(ValueError):
+            TokenPool([])
+
+    @unittest.mock.patch('ghubby.tokens.time.time')
+    def test_select(self, mock_time):
+        """Test whether the token with more remaining requests is selected"""
+
+        mock_time.return_value = 100
+        pool = TokenPool(['aaa', 'bbb', 'ccc'])
+
+        self.assertEqual(pool.select(), 'aaa')
+        pool.update('aaa', build_response(50, 200))
+
+        self.assertEqual(pool.select(), 'bbb')
+        pool.update('bbb', build_response(70, 200))
+
+        self.assertEqual(pool.select(), 'ccc')
+        pool.update('ccc', build_response(60, 200))
+
+        self.assertEqual(pool.select(), 'bbb')
+
+        # Reset tokens are available again
+        mock_time.return_value = 201
+        self.assertEqual(pool.select(), 'aaa')
+
+    @unittest.mock.patch('ghubby.tokens.time.sleep')
+    @unittest.mock.patch('ghubby.tokens.time.time')
+    def test_select_sleep(self, mock_time, mock_sleep):
+        """Test whether the pool sleeps only when all the tokens are exhausted"""
+
+        def sleep(seconds):
+            mock_time.return_value += seconds
+
+        mock_time.return_value = 100
+        mock_sleep.side_effect = sleep
+
+        pool = TokenPool(['aaa', 'bbb'])
+        pool.update('aaa', build_response(5, 200))
+        pool.update('bbb', build_response(20, 150))
+
+        self.assertEqual(pool.select(), 'bbb')
+        mock_sleep.assert_not_called()
+
+        pool.update('bbb', build_response(3, 150))
+        self.assertEqual(pool.select(), 'bbb')
+        mock_sleep.assert_called_once_with(51)
+
+        # both tokens exhausted, aaa is reset first
+        pool.update('bbb', build_response(3, 250))
+        self.assertTupleEqual(pool.take(), ('aaa', 50))
+
+        pool.update('aaa', build_response(20, 300))
+        self.assertTupleEqual(pool.take(), ('aaa', 0))
+
+    @unittest.mock.patch('ghubby.tokens.time.time')
+    def test_select_rate_limit_error(self, mock_time):
+        """Test whether an error is raised when tokens are exhausted and sleep is disabled"""
+
+        mock_time.return_value = 100
+
+        pool = TokenPool(['aaa'], sleep_for_rate=False)
+        pool.update('aaa', build_response(5, 200))
+
+        with self.assertRaises(RateLimitError):
+            pool.select()
+
+    def test_update_resource(self):
+        """Test whether the rate limit of other resources is ignored"""
+
+        pool = TokenPool(['aaa'])
+        pool.update('aaa', build_response(50, 200))
+
+        response = build_response(4000, 300)
+        response.headers['X-RateLimit-Resource'] = 'graphql'
+        pool.update('aaa', response)
+
+        self.assertDictEqual(pool.usage()['aaa'], {'requests': 0, 'remaining': 50, 'reset': 200})
+
+        response = build_response(40, 200)
+        response.headers['X-RateLimit-Resource'] = 'core'
+        pool.update('aaa', response)
+
+        self.assertEqual(pool.usage()['aaa']['remaining'], 40)
+
+    @unittest.mock.patch('ghubby.tokens.time.time')
+    def test_rate(self, mock_time):
+        """Test whether the rate spreads the remaining requests until the reset"""
+
+        mock_time.return_value = 100
+
+        pool = TokenPool(['aaa', 'bbb'])
+        self.assertIsNone(pool.rate())
+
+        pool.update('aaa', build_response(110, 200))
+        self.assertIsNone(pool.rate())
+
+        pool.update('bbb', build_response(60, 150))
+        self.assertEqual(pool.rate(), 2.0)
+
+        pool.update('bbb', build_response(5, 150))
+        self.assertEqual(pool.rate(), 1.0)
+
+        # The rate limit of a reset token is unknown
+        mock_time.return_value = 160
+        self.assertIsNone(pool.rate())
+
+    @unittest.mock.patch('ghubby.tokens.time.time')
+    def test_remaining(self, mock_time):
+        """Test whether the remaining requests of the tokens are added up"""
+
+        mock_time.return_value = 100
+
+        pool = TokenPool(['aaa', 'bbb'])
+        self.assertIsNone(pool.remaining())
+
+        pool.update('aaa', build_response(110, 200))
+        self.assertIsNone(pool.remaining())
+
+        pool.update('bbb', build_response(5, 150))
+        self.assertEqual(pool.remaining(), 100)
+
+        # The rate limit of a reset token is unknown
+        mock_time.return_value = 160
+        self.assertIsNone(pool.remaining())
+
+    def test_usage(self):
+        """Test whether the usage of the tokens is returned"""
+
+        pool = TokenPool(['abcdefgh', None])
+        pool.select()
+        pool.update('abcdefgh', build_response(4000, 200))
+
+        expected = {
+            '****efgh': {'requests': 1, 'remaining': 4000, 'reset': 200},
+            'anonymous': {'requests': 0, 'remaining': None, 'reset': None}
+        }
+        self.assertDictEqual(pool.usage(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import datetime
+import sys
+import unittest
+import unittest.mock
+
+from grimoirelab.toolkit.datetime import InvalidDateError
+
+from ghubby.utils import (DEFAULT_DATETIME,
+                          datetime_to_utc,
+                          str_to_datetime,
+                          urijoin)
+
+
+class TestUtils(unittest.TestCase):
+    """Utils tests"""
+
+    def test_urijoin(self):
+        """Test whether URIs are joined"""
+
+        self.assertEqual(urijoin('https://api.github.com/', '/repos/', 'chaoss/grimoirelab'),
+                         'https://api.github.com/repos/chaoss/grimoirelab')
+        self.assertEqual(urijoin('users', 'valeriocos', 'events', 'public'),
+                         'users/valeriocos/events/public')
+        self.assertEqual(urijoin('issues', 42), 'issues/42')
+
+    def test_str_to_datetime(self):
+        """Test whether GitHub dates and other formats are parsed"""
+
+        expected = datetime.datetime(2018, 4, 13, 16, 52, 56, tzinfo=datetime.timezone.utc)
+
+        self.assertEqual(str_to_datetime('2018-04-13T16:52:56Z'), expected)
+        self.assertEqual(str_to_datetime('2018-04-13T18:52:56+02:00'), expected)
+        self.assertEqual(str_to_datetime('2018-04-13 16:52:56'), expected)
+        self.assertEqual(str_to_datetime('2018-04-13'),
+                         datetime.datetime(2018, 4, 13, tzinfo=datetime.timezone.utc))
+
+        with self.assertRaises(InvalidDateError):
+            str_to_datetime('2018-13-45T16:52:56Z')
+
+    def test_str_to_datetime_no_toolkit(self):
+        """Test whether ISO dates, like the default of --from-date, do not load the toolkit"""
+
+        with unittest.mock.patch.dict(sys.modules, {'grimoirelab.toolkit.datetime': None}):
+            self.assertEqual(str_to_datetime('1970-01-01'), DEFAULT_DATETIME)
+            self.assertEqual(str_to_datetime('2018-04-13T18:52:56+02:00'),
+                             datetime.datetime(2018, 4, 13, 16, 52, 56, tzinfo=datetime.timezone.utc))
+
+    def test_datetime_to_utc(self):
+        """Test whether datetimes are converted to UTC"""
+
+        expected = datetime.datetime(2018, 4, 13, 16, 52, 56, tzinfo=datetime.timezone.utc)
+        tz = datetime.timezone(datetime.timedelta(hours=2))
+
+        self.assertEqual(datetime_to_utc(datetime.datetime(2018, 4, 13, 16, 52, 56)), expected)
+        self.assertEqual(datetime_to_utc(datetime.datetime(2018, 4, 13, 18, 52, 56, tzinfo=tz)), expected)
+
+        with self.assertRaises(InvalidDateError):
+            datetime_to_utc('2018-04-13')
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')